@@ -1,13 +1,42 @@
+import re
+
 from django.contrib import admin
-from .models import Vehicle, EntryExitLog
+from django.db.models import DurationField, ExpressionWrapper, F
+from .models import Vehicle, EntryExitLog, UploadJob
+from .pagination import EstimatedCountPaginator
+from .snapshots import snapshots_for_logs
 from django.utils.html import format_html
 from django.urls import reverse
 
 
+def plate_prefix_filter(field, search_term):
+    """Match plates starting with the normalized ``search_term`` as a range
+    on ``field``, so the unique plate index is used (``icontains`` can't)."""
+    prefix = re.sub(r"[^A-Z0-9]", "", search_term.upper())
+    if not prefix:
+        return {}
+    # Plates are [A-Z0-9] only and "[" sorts right after "Z".
+    return {f"{field}__gte": prefix, f"{field}__lt": prefix + "["}
+
+
+class PlateSearchMixin:
+    plate_field = "license_plate"
+
+    def get_search_results(self, request, queryset, search_term):
+        lookup = plate_prefix_filter(self.plate_field, search_term)
+        if lookup:
+            queryset = queryset.filter(**lookup)
+        return queryset, False
+
+
 @admin.register(Vehicle)
-class VehicleAdmin(admin.ModelAdmin):
+class VehicleAdmin(PlateSearchMixin, admin.ModelAdmin):
     change_list_template = "admin/parking/vehicle/change_list.html"
     list_display = ("license_plate", "view_history_link")
+    search_fields = ("license_plate",)
+    search_help_text = "Plate, or the start of one"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def view_history_link(self, obj):
         url = reverse("vehicle_detail", args=[obj.license_plate])
@@ -28,13 +57,24 @@ class VehicleAdmin(admin.ModelAdmin):
 
 
 @admin.register(EntryExitLog)
-class EntryExitLogAdmin(admin.ModelAdmin):
+class EntryExitLogAdmin(PlateSearchMixin, admin.ModelAdmin):
     change_list_template = "admin/parking/vehicle/change_list.html"
     list_display = ("vehicle", "entry_time", "exit_time", "get_duration_readable", "get_entry_image", "get_exit_image")
+    list_select_related = ("vehicle",)
+    date_hierarchy = "entry_time"
+    search_fields = ("vehicle__license_plate",)
+    search_help_text = "Plate, or the start of one"
+    plate_field = "vehicle__license_plate"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        duration = ExpressionWrapper(F("exit_time") - F("entry_time"), output_field=DurationField())
+        return super().get_queryset(request).annotate(stay=duration)
 
     def get_duration_readable(self, obj):
-        if obj.exit_time and obj.entry_time:
-            duration = obj.exit_time - obj.entry_time
+        duration = obj.stay if hasattr(obj, "stay") else obj.duration()
+        if duration is not None:
             total_seconds = int(duration.total_seconds())
             minutes, seconds = divmod(total_seconds, 60)
             hours, minutes = divmod(minutes, 60)
@@ -44,100 +84,58 @@ class EntryExitLogAdmin(admin.ModelAdmin):
         return "-"
 
     get_duration_readable.short_description = "Duration"
-    
+    get_duration_readable.admin_order_field = "stay"
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        # Resolve the images for the whole page with one indexed query
+        # instead of one lookup per cell.
+        snapshots = snapshots_for_logs(changelist.result_list)
+        for obj in changelist.result_list:
+            obj.snapshots = snapshots.get(obj.pk, (None, None))
+        return changelist
+
+    def _snapshots(self, obj):
+        if not hasattr(obj, "snapshots"):
+            obj.snapshots = snapshots_for_logs([obj]).get(obj.pk, (None, None))
+        return obj.snapshots
+
+    def _thumbnail(self, image, title=""):
+        # ``image`` is a Snapshot (link to the full image, show the thumbnail)
+        # or a plain URL.
+        url = getattr(image, "url", image)
+        thumbnail_url = getattr(image, "thumbnail_url", url)
+        return format_html(
+            '<a href="{}" target="_blank"><img src="{}" style="height:32px;width:auto;" loading="lazy" title="{}" /></a>',
+            url, thumbnail_url, title
+        )
+
     def get_entry_image(self, obj):
-        import os
-        from django.conf import settings
-        
-        license_plate = obj.vehicle.license_plate.strip().upper()
-        
-        entry_timestamp = obj.entry_time.strftime('%Y%m%d_%H%M%S')
-        
-        entries_dir = os.path.join(settings.BASE_DIR, 'entries')
-        if os.path.exists(entries_dir):
-            entry_image_prefix = f"{license_plate}_{entry_timestamp[:8]}"  # Match the date part
-            
-            for filename in os.listdir(entries_dir):
-                if filename.startswith(license_plate) and entry_timestamp[:8] in filename:
-                    image_url = f"/entries/{filename}"
-                    return format_html(
-                        '<a href="{}" target="_blank"><img src="{}" style="height:32px;width:auto;" title="{}" /></a>',
-                        image_url, image_url, filename
-                    )
-        
+        entry_snapshot, _ = self._snapshots(obj)
+        if entry_snapshot:
+            return self._thumbnail(entry_snapshot, entry_snapshot.name)
+
         if obj.image and not obj.exit_time:
-            return format_html(
-                '<a href="{}" target="_blank"><img src="{}" style="height:32px;width:auto;"/></a>',
-                obj.image.url, obj.image.url
-            )
-            
+            return self._thumbnail(obj.image.url)
+
         return "-"
-    
+
     get_entry_image.short_description = "Entry Image"
     get_entry_image.allow_tags = True
 
     def get_exit_image(self, obj):
-        import os
-        from django.conf import settings
-        import datetime
-        
         if not obj.exit_time:
             return "-"
-            
-        license_plate = obj.vehicle.license_plate.strip().upper()
-        
-        entry_time = obj.entry_time
-        exit_time = obj.exit_time
-        
-        buffer_before = exit_time - datetime.timedelta(minutes=5)
-        buffer_after = exit_time + datetime.timedelta(minutes=5)
-        
-        entry_timestamp_str = entry_time.strftime('%Y%m%d_%H%M%S')
-        
-        entries_dir = os.path.join(settings.BASE_DIR, 'entries')
-        if os.path.exists(entries_dir):
-            matching_files = []
-            for filename in os.listdir(entries_dir):
-                if filename.startswith(license_plate):
-                    try:
-                        parts = filename.split('_')
-                        if len(parts) >= 3:
-                            timestamp_str = f"{parts[1]}_{parts[2].split('.')[0]}"
-                            
-                            if timestamp_str <= entry_timestamp_str:
-                                continue
-                                
-                            matching_files.append((filename, timestamp_str))
-                    except Exception as e:
-                        print(f"Error parsing filename {filename}: {e}")
-                        continue
-            
-            if matching_files:
-                matching_files.sort(key=lambda x: x[1], reverse=True)
-                
-                exit_filename, _ = matching_files[0]
-                image_url = f"/entries/{exit_filename}"
-                return format_html(
-                    '<a href="{}" target="_blank"><img src="{}" style="height:32px;width:auto;" title="{}" /></a>',
-                    image_url, image_url, exit_filename
-                )
-        
-        if obj.image:
-            try:
-                image_name = os.path.basename(obj.image.name)
-                entry_image_html = self.get_entry_image(obj)
-                if entry_image_html != "-" and image_name in entry_image_html:
-                    return "-" 
-                
-                return format_html(
-                    '<a href="{}" target="_blank"><img src="{}" style="height:32px;width:auto;"/></a>',
-                    obj.image.url, obj.image.url
-                )
-            except:
-                pass
-            
+
+        entry_snapshot, exit_snapshot = self._snapshots(obj)
+        if exit_snapshot:
+            return self._thumbnail(exit_snapshot, exit_snapshot.name)
+
+        if obj.image and not entry_snapshot:
+            return self._thumbnail(obj.image.url)
+
         return "-"
-    
+
     get_exit_image.short_description = "Exit Image"
     get_exit_image.allow_tags = True
 
@@ -147,3 +145,25 @@ class EntryExitLogAdmin(admin.ModelAdmin):
         extra_context["show_analytics_button"] = True
         extra_context["analytics_url"] = reverse("analytics")
         return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(UploadJob)
+class UploadJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "file_count", "plate_count", "created_at", "started_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = (
+        "status", "files", "output", "plates", "created_at", "started_at", "finished_at", "owner", "heartbeat_at"
+    )
+
+    def file_count(self, obj):
+        return len(obj.files)
+
+    file_count.short_description = "Files"
+
+    def plate_count(self, obj):
+        return len(obj.plates)
+
+    plate_count.short_description = "Plates"
+
+    def has_add_permission(self, request):
+        return False
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ParkingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "parking"
+
+    def ready(self):
+        if getattr(settings, "RECOGNITION_WARMUP", False):
+            from .recognition import warm_up_in_background
+
+            warm_up_in_background()
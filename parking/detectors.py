@@ -0,0 +1,204 @@
+import glob
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+
+class TorchDetector:
+    """The original path: ``ultralytics.YOLO`` running ``best.pt`` on PyTorch."""
+
+    def __init__(self, model_path, imgsz=640, threads=0):
+        from ultralytics import YOLO
+
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+        self.model = YOLO(model_path)
+        self.imgsz = imgsz
+
+    def predict(self, images):
+        """Return a list of ``(x1, y1, x2, y2, conf)`` boxes per image."""
+        results = self.model(list(images), imgsz=self.imgsz, verbose=False)
+        return [
+            [(*map(int, xyxy), conf) for xyxy, conf in zip(r.boxes.xyxy.tolist(), r.boxes.conf.tolist())]
+            for r in results
+        ]
+
+
+class ExportedDetector:
+    """Shared pre- and post-processing for YOLOv8 graphs exported by ultralytics.
+
+    Images are letterboxed to the graph's input size (``imgsz`` x ``imgsz``
+    if the graph takes any size); the raw ``(batch, 4 + classes, anchors)``
+    output is filtered at ``conf`` and reduced with NMS, matching the
+    defaults ``ultralytics.YOLO`` applies on the PyTorch path. A graph with a
+    dynamic batch dimension gets every image of a ``predict`` call in one
+    tensor; a fixed one gets chunks of its batch size.
+    """
+
+    def __init__(self, imgsz=640, conf=0.25, iou=0.7):
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.input_size = (imgsz, imgsz)
+        self.batch = 1
+
+    def _use_input_shape(self, shape):
+        """Adopt the graph's ``(batch, 3, height, width)``; ``None`` marks a dynamic dimension."""
+        batch, _, height, width = shape
+        if height and width and (height, width) != (self.imgsz, self.imgsz):
+            logger.warning("Detector graph was exported for %dx%d input; ignoring imgsz=%d", width, height, self.imgsz)
+        self.input_size = (height or self.imgsz, width or self.imgsz)
+        self.batch = batch
+
+    def _infer(self, blob):
+        raise NotImplementedError
+
+    def predict(self, images):
+        prepared = [self._letterbox(image) for image in images]
+        step = self.batch or max(len(prepared), 1)
+        results = []
+        for start in range(0, len(prepared), step):
+            chunk = prepared[start:start + step]
+            blob = np.stack([blob for blob, _ in chunk])
+            if len(chunk) < step and self.batch:
+                blob = np.concatenate([blob, np.zeros((step - len(chunk), *blob.shape[1:]), dtype=blob.dtype)])
+            outputs = np.asarray(self._infer(blob))
+            results.extend(self._boxes(output.T, geometry) for output, (_, geometry) in zip(outputs, chunk))
+        return results
+
+    def _letterbox(self, image):
+        import cv2
+
+        input_height, input_width = self.input_size
+        height, width = image.shape[:2]
+        scale = min(input_height / height, input_width / width)
+        resized = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR)
+        pad_y = (input_height - resized.shape[0]) // 2
+        pad_x = (input_width - resized.shape[1]) // 2
+        canvas = np.full((input_height, input_width, 3), 114, dtype=np.uint8)
+        canvas[pad_y:pad_y + resized.shape[0], pad_x:pad_x + resized.shape[1]] = resized
+        blob = np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1), dtype=np.float32) / 255.0
+        return blob, (height, width, scale, pad_x, pad_y)
+
+    def _boxes(self, output, geometry):
+        import cv2
+
+        height, width, scale, pad_x, pad_y = geometry
+        scores = output[:, 4:].max(axis=1)
+        keep = scores >= self.conf
+        output, scores = output[keep], scores[keep]
+        if not len(output):
+            return []
+
+        cx, cy, w, h = output[:, 0], output[:, 1], output[:, 2], output[:, 3]
+        xywh = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+        indices = cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), self.conf, self.iou)
+
+        boxes = []
+        for i in np.array(indices).flatten():
+            x, y, w, h = xywh[i]
+            x1 = int(np.clip((x - pad_x) / scale, 0, width))
+            y1 = int(np.clip((y - pad_y) / scale, 0, height))
+            x2 = int(np.clip((x + w - pad_x) / scale, 0, width))
+            y2 = int(np.clip((y + h - pad_y) / scale, 0, height))
+            boxes.append((x1, y1, x2, y2, float(scores[i])))
+        boxes.sort(key=lambda box: box[4], reverse=True)
+        return boxes
+
+
+class OnnxDetector(ExportedDetector):
+    """An exported ``.onnx`` graph on ONNX Runtime's CPU provider."""
+
+    def __init__(self, model_path, imgsz=640, threads=0):
+        import onnxruntime as ort
+
+        super().__init__(imgsz)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        graph_input = self.session.get_inputs()[0]
+        self.input_name = graph_input.name
+        # Dynamic dimensions are named ("batch") or missing.
+        self._use_input_shape([dim if isinstance(dim, int) and dim > 0 else None for dim in graph_input.shape])
+
+    def _infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoDetector(ExportedDetector):
+    """An exported OpenVINO IR (``best_openvino_model/``) compiled for the CPU."""
+
+    def __init__(self, model_path, imgsz=640, threads=0):
+        import openvino as ov
+
+        super().__init__(imgsz)
+        if os.path.isdir(model_path):
+            model_path = glob.glob(os.path.join(model_path, "*.xml"))[0]
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        core = ov.Core()
+        self.compiled = core.compile_model(core.read_model(model_path), "CPU", config)
+        self.output = self.compiled.output(0)
+        shape = self.compiled.input(0).get_partial_shape()
+        self._use_input_shape([dim.get_length() if dim.is_static else None for dim in shape])
+
+    def _infer(self, blob):
+        return self.compiled(blob)[self.output]
+
+
+DETECTORS = {"torch": TorchDetector, "onnx": OnnxDetector, "openvino": OpenVinoDetector}
+
+
+def load_detector(backend, model_path, imgsz=640, threads=0):
+    if backend not in DETECTORS:
+        raise ValueError(f"Unknown detector backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return DETECTORS[backend](str(model_path), imgsz=imgsz, threads=threads)
+
+
+def exported_path(model_path, backend, int8=False):
+    """Where ``export`` puts the ``backend`` version of ``model_path``."""
+    model_path = str(model_path)
+    if backend == "torch":
+        return model_path
+    stem = os.path.splitext(model_path)[0]
+    suffix = "_int8" if int8 else ""
+    if backend == "onnx":
+        return f"{stem}{suffix}.onnx"
+    return f"{stem}{suffix}_openvino_model"
+
+
+def export(model_path, backend, imgsz=640, int8=False, data=None):
+    """Export ``best.pt`` for ``backend``; returns the exported model's path.
+
+    Graphs are exported with a dynamic batch dimension, so ``detect_batch``
+    runs one inference per batch. OpenVINO INT8 is calibrated by ultralytics
+    on ``data`` (a dataset YAML); ONNX INT8 uses ONNX Runtime's dynamic weight
+    quantization.
+    """
+    from ultralytics import YOLO
+
+    model = YOLO(str(model_path))
+    if backend == "openvino":
+        return str(model.export(format="openvino", imgsz=imgsz, int8=int8, data=data, dynamic=True))
+    if backend != "onnx":
+        raise ValueError(f"Cannot export to {backend!r}")
+
+    path = str(model.export(format="onnx", imgsz=imgsz, simplify=True, dynamic=True))
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized = exported_path(model_path, "onnx", int8=True)
+        quantize_dynamic(path, quantized, weight_type=QuantType.QUInt8)
+        logger.info("Quantized %s to %s", path, quantized)
+        path = quantized
+    return path
@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EventClient:
+    """Sends plate events to the backend from a background thread.
+
+    ``submit`` never blocks: events go onto a bounded queue and a single
+    sender thread posts them in order, up to ``batch_size`` at a time, to the
+    bulk log endpoint over one keep-alive session, with a timeout per request
+    and exponential backoff between retries. Events that still fail, or that
+    arrive while earlier ones are waiting on disk, are appended to a
+    JSON-lines spool file and replayed once the backend answers again, so
+    nothing is lost across outages or restarts. A replay first renames the
+    spool to ``<spool>.replaying`` and removes it only once its events are
+    delivered or back in the spool; a leftover one is replayed first.
+    """
+
+    def __init__(
+        self,
+        url,
+        spool_path,
+        timeout=5.0,
+        max_retries=4,
+        backoff=0.5,
+        max_backoff=30.0,
+        batch_size=50,
+        flush_interval=0.5,
+        queue_size=1000,
+        pool_size=4,
+    ):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = url
+        self.spool_path = str(spool_path)
+        self.replay_path = self.spool_path + ".replaying"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.sent = 0
+        self.failed = 0
+        self.spooled = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._spool_lock = threading.Lock()
+        self._closing = threading.Event()
+        self._next_spool_attempt = 0.0
+        self._spool_delay = backoff
+        self._thread = threading.Thread(target=self._run, name="event-client", daemon=True)
+        self._thread.start()
+
+    def submit(self, plate, lane=None, timestamp=None, image=None, correlation_id=None, trace=None):
+        """Queue an event. ``correlation_id`` (a new one by default) ends up on the
+        log row; ``trace`` holds stage timings for the backend's metrics."""
+        event = {
+            "plate": plate,
+            "timestamp": (timestamp or timezone.now()).isoformat(),
+            "lane": lane,
+            "image": image,
+            "correlation_id": correlation_id or metrics.correlation_id.get() or metrics.new_correlation_id(),
+        }
+        if trace:
+            event["trace"] = trace
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._spool([event])
+        return event
+
+    def flush(self, timeout=None):
+        """Wait until everything submitted so far has been sent or spooled."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout=10.0):
+        self.flush(timeout)
+        self._closing.set()
+        self._thread.join(timeout)
+        self.session.close()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "spooled": self.spooled,
+            "spool_pending": self._spool_size(),
+        }
+
+    def _run(self):
+        while not self._closing.is_set():
+            batch = self._next_batch()
+            try:
+                if batch:
+                    if self._spool_size():
+                        self._spool(batch)
+                    else:
+                        self._deliver_or_spool(batch)
+                if self._spool_size() and time.monotonic() >= self._next_spool_attempt:
+                    self._replay_spool()
+            except Exception as e:
+                logger.exception("Event client error: %s", e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _next_batch(self):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver_or_spool(self, batch, front=False):
+        for start in range(0, len(batch), self.batch_size):
+            if not self._send(batch[start:start + self.batch_size]):
+                self._spool(batch[start:], front=front)
+                return False
+        return True
+
+    def _send(self, events):
+        """Post one batch, retrying with backoff. Returns False if the backend is unreachable."""
+        import requests
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.span("event_send"):
+                    response = self.session.post(self.url, json={"events": events}, timeout=self.timeout)
+                if response.status_code == 200:
+                    try:
+                        results = response.json()["results"]
+                        rejected = [
+                            (events[result["index"]], result["error"]) for result in results if "error" in result
+                        ]
+                    except (ValueError, KeyError, TypeError, IndexError):
+                        # Not the bulk endpoint's answer (a proxy page, an older backend).
+                        self.failed += len(events)
+                        logger.warning("Unexpected response for %d events: %.200s", len(events), response.text)
+                        return True
+                    for event, error in rejected:
+                        logger.warning("Backend rejected %s: %s", event, error)
+                    self.failed += len(rejected)
+                    self.sent += len(results) - len(rejected)
+                    return True
+                if response.status_code < 500:
+                    # The backend rejected the batch itself; retrying won't help.
+                    self.failed += len(events)
+                    logger.warning("Backend rejected %d events: %s", len(events), response.text)
+                    return True
+                logger.warning("Backend error for %d events: %s", len(events), response.status_code)
+            except requests.RequestException as e:
+                logger.warning("Error sending %d events: %s", len(events), e)
+            if attempt < self.max_retries:
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+        return False
+
+    def _spool(self, events, front=False):
+        """Append ``events`` to the spool, or put them ahead of it when ``front``
+        is set so replayed events stay older than anything spooled meanwhile."""
+        lines = [json.dumps(event) + "\n" for event in events]
+        with self._spool_lock:
+            os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+            if front and os.path.exists(self.spool_path):
+                with open(self.spool_path) as f:
+                    lines.extend(f.readlines())
+            # Rewrites go through a temporary file so a crash can't truncate the spool.
+            path = self.spool_path + ".tmp" if front else self.spool_path
+            with open(path, "w" if front else "a") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            if front:
+                os.replace(path, self.spool_path)
+            self.spooled += len(events)
+
+    def _spool_size(self):
+        size = 0
+        for path in (self.replay_path, self.spool_path):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def _replay_spool(self):
+        with self._spool_lock:
+            # A file left by an interrupted replay holds the oldest events.
+            if not os.path.exists(self.replay_path):
+                os.replace(self.spool_path, self.replay_path)
+            events = []
+            with open(self.replay_path) as f:
+                for line in f:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        # A line cut short by a crash mid-append.
+                        if line.strip():
+                            logger.warning("Skipping unreadable spooled event: %.200s", line)
+
+        logger.info("Replaying %d spooled events", len(events))
+        delivered = self._deliver_or_spool(events, front=True)
+        # Sent, or what wasn't is back at the front of the spool.
+        os.remove(self.replay_path)
+        if delivered:
+            self._spool_delay = self.backoff
+        else:
+            self._spool_delay = min(self.max_backoff, self._spool_delay * 2)
+        self._next_spool_attempt = time.monotonic() + self._spool_delay
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_event_client():
+    """Return the process-wide event client, starting it on first call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = EventClient(
+                    settings.PARKING_BULK_LOG_URL,
+                    settings.EVENT_SPOOL_PATH,
+                    timeout=settings.EVENT_TIMEOUT,
+                    max_retries=settings.EVENT_MAX_RETRIES,
+                    batch_size=settings.EVENT_BATCH_SIZE,
+                )
+    return _client
@@ -0,0 +1,283 @@
+import logging
+import multiprocessing as mp
+import time
+import weakref
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# What crosses process boundaries instead of the frame itself.
+FrameRef = namedtuple("FrameRef", ["seq", "slot", "captured_at"])
+
+# Per-slot header fields, stored as int64/float64 in front of the frames.
+_SEQ, _PINS = 0, 1
+_WRITING = -1
+
+
+class PinnedFrame(np.ndarray):
+    """Marks views handed out by ``FrameRing.view``.
+
+    NumPy collapses a view-of-a-view onto the array that owns the memory,
+    unless the types differ; with this subclass every crop keeps a reference
+    to the pinned view, so the pin lasts as long as any of them.
+    """
+
+
+class FrameRing:
+    """A ring of equally sized frames in shared memory.
+
+    The producer claims a slot, writes a frame into it in place (or has the
+    camera decode straight into it) and publishes it under a sequence number.
+    Consumers take the newest published frame as a ``FrameRef`` and map it to
+    a NumPy view of the slot, so frames are never pickled or copied between
+    processes. A slot stays pinned while any view of it, or a crop of that
+    view, is alive; the producer only reuses unpinned slots and drops the
+    frame when every slot is in use, so a slow consumer makes frames stale
+    rather than corrupting the one it is reading.
+
+    ``lock`` guards the slot headers and must be shared by every process
+    attached to the ring.
+    """
+
+    def __init__(self, shape, dtype=np.uint8, slots=6, name=None, lock=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.lock = lock or mp.Lock()
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        header_bytes = 8 * (2 * slots + 1) + 8 * slots
+        size = header_bytes + self.frame_bytes * slots
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = _attach(name)
+        self.name = self.shm.name
+
+        buf = self.shm.buf
+        self._headers = np.ndarray((slots, 2), dtype=np.int64, buffer=buf)
+        self._latest = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=16 * slots)
+        self._times = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=16 * slots + 8)
+        self._frames = np.ndarray((slots, *self.shape), dtype=self.dtype, buffer=buf, offset=header_bytes)
+        if self.owner:
+            self._headers[:] = 0
+            self._latest[0] = 0
+
+    def spec(self):
+        """Everything another process needs to ``FrameRing(**spec, lock=...)``."""
+        return {"shape": self.shape, "dtype": self.dtype.str, "slots": self.slots, "name": self.name}
+
+    # Producer side.
+
+    def claim(self):
+        """Reserve the oldest unpinned slot for writing; ``None`` if all are in use."""
+        with self.lock:
+            free = [i for i in range(self.slots) if self._headers[i, _PINS] == 0 and self._headers[i, _SEQ] != _WRITING]
+            if not free:
+                return None
+            slot = min(free, key=lambda i: self._headers[i, _SEQ])
+            self._headers[slot, _SEQ] = _WRITING
+        return slot
+
+    def buffer(self, slot):
+        """The writable frame array of a claimed slot."""
+        return self._frames[slot]
+
+    def publish(self, slot, captured_at=None):
+        with self.lock:
+            seq = int(self._latest[0]) + 1
+            self._times[slot] = time.monotonic() if captured_at is None else captured_at
+            self._headers[slot, _SEQ] = seq
+            self._latest[0] = seq
+        return seq
+
+    def abandon(self, slot):
+        """Give back a claimed slot without publishing it."""
+        with self.lock:
+            self._headers[slot, _SEQ] = 0
+
+    def write(self, frame, captured_at=None):
+        """Copy ``frame`` into a free slot and publish it; returns its seq, or ``None`` if dropped."""
+        slot = self.claim()
+        if slot is None:
+            return None
+        np.copyto(self._frames[slot], frame)
+        return self.publish(slot, captured_at)
+
+    # Consumer side.
+
+    @property
+    def latest_seq(self):
+        return int(self._latest[0]) if self._latest is not None else self._final_seq
+
+    def acquire_latest(self, after=0):
+        """Pin and return a ``FrameRef`` to the newest frame newer than ``after``, or ``None``."""
+        if self.latest_seq <= after:
+            return None
+        with self.lock:
+            seqs = self._headers[:, _SEQ]
+            slot = int(np.argmax(seqs))
+            seq = int(seqs[slot])
+            if seq <= after:
+                return None
+            self._headers[slot, _PINS] += 1
+            return FrameRef(seq, slot, float(self._times[slot]))
+
+    def release(self, ref):
+        if self._headers is None:
+            return
+        with self.lock:
+            if self._headers[ref.slot, _PINS] > 0:
+                self._headers[ref.slot, _PINS] -= 1
+
+    def view(self, ref):
+        """A read-only view of the pinned frame; the pin is released when the
+        view and everything derived from it are garbage-collected."""
+        view = self._frames[ref.slot].view(PinnedFrame)
+        view.flags.writeable = False
+        weakref.finalize(view, self.release, ref)
+        return view
+
+    def close(self):
+        self._final_seq = self.latest_seq
+        self._headers = self._latest = self._times = self._frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Frames handed out are still referenced; the mapping goes away
+            # with them (or with the process).
+            pass
+        if self.owner:
+            self.shm.unlink()
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block with this
+        # process's resource tracker, which would unlink it when we exit.
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _capture_main(source, conn, lock, stop, finished, slots, target_fps):
+    """Child process: read ``source`` straight into the ring until stopped."""
+    from .pipeline import VideoSource, _throttle
+
+    capture = VideoSource(source)
+    try:
+        frame = None
+        while frame is None and not stop.is_set() and not capture.exhausted:
+            ok, frame = capture.read()
+            if not ok:
+                time.sleep(0.05)
+        if frame is None:
+            conn.send(None)
+            return
+        conn.send((frame.shape, frame.dtype.str, capture.fps, capture.is_file))
+        spec = conn.recv()
+        if capture.is_file and not target_fps:
+            # Play recordings back at their own frame rate, like a live camera.
+            target_fps = capture.fps
+        ring = FrameRing(**spec, lock=lock)
+        ring.write(frame)
+
+        while not stop.is_set():
+            started = time.perf_counter()
+            slot = ring.claim()
+            if slot is None:
+                # Every slot is pinned by a consumer: read and drop the frame.
+                capture.read()
+                _throttle(started, target_fps)
+                continue
+            target = ring.buffer(slot)
+            ok, frame = capture.read(out=target)
+            if not ok:
+                ring.abandon(slot)
+                if capture.exhausted:
+                    break
+                time.sleep(0.05)
+                continue
+            if not np.shares_memory(frame, target):
+                if frame.shape != target.shape:
+                    ring.abandon(slot)
+                    logger.warning("Frame size changed to %s; dropping frame", frame.shape)
+                    continue
+                np.copyto(target, frame)
+            ring.publish(slot)
+            _throttle(started, target_fps)
+        ring.close()
+    finally:
+        capture.release()
+        finished.set()
+
+
+class SharedFrameSource:
+    """A ``VideoSource`` whose capture runs in its own process.
+
+    The child process decodes frames directly into a ``FrameRing``; ``read``
+    returns a zero-copy view of the newest frame, skipping any that were
+    overwritten in between. It can stand in for ``VideoSource`` in
+    ``FramePipeline``.
+    """
+
+    def __init__(self, source, slots=6, target_fps=0, wait=0.1):
+        self.source = source
+        self.wait = wait
+        self.last_seq = 0
+        self.last_captured_at = None
+        self.reads = 0
+        self._lock = mp.Lock()
+        self._stop = mp.Event()
+        self._finished = mp.Event()
+        parent, child = mp.Pipe()
+        self._process = mp.Process(
+            target=_capture_main,
+            args=(source, child, self._lock, self._stop, self._finished, slots, target_fps),
+            name=f"capture-{source}",
+            daemon=True,
+        )
+        self._process.start()
+        info = parent.recv()
+        if info is None:
+            self._process.join()
+            raise RuntimeError(f"Could not read a frame from {source}")
+        shape, dtype, self.fps, self.is_file = info
+        self.ring = FrameRing(shape, dtype, slots=slots, lock=self._lock)
+        parent.send(self.ring.spec())
+
+    @property
+    def exhausted(self):
+        return self._finished.is_set() and self.ring.latest_seq <= self.last_seq
+
+    @property
+    def dropped(self):
+        """Frames captured but overwritten before ``read`` got to them."""
+        return max(0, self.ring.latest_seq - self.reads)
+
+    def read(self):
+        deadline = time.monotonic() + self.wait
+        while True:
+            ref = self.ring.acquire_latest(after=self.last_seq)
+            if ref is not None:
+                self.last_seq = ref.seq
+                self.last_captured_at = ref.captured_at
+                self.reads += 1
+                return True, self.ring.view(ref)
+            if self._finished.is_set() or time.monotonic() >= deadline:
+                return False, None
+            time.sleep(0.001)
+
+    def release(self):
+        self._stop.set()
+        self._process.join(timeout=2)
+        if self._process.is_alive():
+            self._process.terminate()
+        self.ring.close()
@@ -0,0 +1,166 @@
+import threading
+from collections import OrderedDict
+
+
+def parse_roi(value):
+    """Parse ``"x1,y1,x2,y2"`` (fractions of the frame) into a tuple, or ``None``."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = [float(part) for part in value.split(",")]
+    if len(value) != 4:
+        raise ValueError("ROI must have four values: x1,y1,x2,y2")
+    return tuple(value)
+
+
+class MotionGate:
+    """Cheap check for whether a frame is worth sending to YOLO.
+
+    The ROI is downscaled to grayscale and compared against a running-average
+    background; the frame passes when more than ``min_area`` of the ROI
+    differs by more than ``threshold`` grey levels. An empty lane or a car
+    parked in front of the camera both stay below that and are skipped.
+    """
+
+    def __init__(self, roi=None, threshold=25, min_area=0.01, width=160, learning_rate=0.05):
+        import cv2
+
+        self._cv2 = cv2
+        self.roi = parse_roi(roi)
+        self.threshold = threshold
+        self.min_area = min_area
+        self.width = width
+        self.learning_rate = learning_rate
+        self.checked = 0
+        self.passed = 0
+        self._background = None
+
+    def _prepare(self, frame):
+        cv2 = self._cv2
+        if self.roi:
+            h, w = frame.shape[:2]
+            x1, y1, x2, y2 = self.roi
+            frame = frame[int(y1 * h):int(y2 * h), int(x1 * w):int(x2 * w)]
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        height = max(1, int(gray.shape[0] * self.width / max(1, gray.shape[1])))
+        small = cv2.resize(gray, (self.width, height), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (5, 5), 0).astype("float32")
+
+    def check(self, frame):
+        cv2 = self._cv2
+        small = self._prepare(frame)
+        self.checked += 1
+        if self._background is None or self._background.shape != small.shape:
+            self._background = small
+            self.passed += 1
+            return True
+
+        diff = cv2.absdiff(small, self._background)
+        changed = float((diff > self.threshold).mean())
+        cv2.accumulateWeighted(small, self._background, self.learning_rate)
+        if changed >= self.min_area:
+            self.passed += 1
+            return True
+        return False
+
+    def stats(self):
+        skipped = self.checked - self.passed
+        return {
+            "checked": self.checked,
+            "passed": self.passed,
+            "skipped": skipped,
+            "skip_rate": round(skipped / self.checked, 3) if self.checked else 0.0,
+        }
+
+
+def dhash(image, size=8):
+    """64-bit difference hash; near-identical crops of the same plate hash the same.
+
+    Too coarse to tell plates one character apart, so ``OcrCache`` only uses
+    it to find the entry to compare against.
+    """
+    import cv2
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def plate_thumbnail(image, height=16):
+    """Grayscale, aspect-preserving, mean-centred thumbnail for ``thumbnail_distance``."""
+    import cv2
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    width = max(8, round(height * gray.shape[1] / gray.shape[0]))
+    small = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA).astype("float32")
+    return small - small.mean()
+
+
+def thumbnail_distance(a, b):
+    """Largest mean grey-level difference over any character-wide strip of two thumbnails.
+
+    One changed character is concentrated in its own strip rather than
+    averaged over the whole plate.
+    """
+    import numpy as np
+
+    if a.shape != b.shape:
+        return float("inf")
+    columns = np.abs(a - b).mean(axis=0)
+    strip = max(1, a.shape[0] // 2)
+    return float(np.convolve(columns, np.ones(strip) / strip, mode="valid").max())
+
+
+class OcrCache:
+    """Thread-safe LRU of plate crop -> OCR result.
+
+    Entries are found by ``dhash`` and only returned when the stored
+    thumbnail is within ``tolerance`` grey levels of the crop's
+    (``thumbnail_distance``); a crop that merely shares the hash is a miss.
+    """
+
+    def __init__(self, maxsize=256, tolerance=8.0):
+        self.maxsize = maxsize
+        self.tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, crop):
+        return dhash(crop), plate_thumbnail(crop)
+
+    def get(self, key):
+        digest, thumbnail = key
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and thumbnail_distance(entry[0], thumbnail) <= self.tolerance:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[1]
+            self.rejected += entry is not None
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        digest, thumbnail = key
+        with self._lock:
+            self._entries[digest] = (thumbnail, value)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,354 @@
+import json
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# A message is a length-prefixed JSON header followed by a length-prefixed
+# body holding the raw bytes of every array the header describes.
+_LENGTHS = struct.Struct("!IQ")
+
+
+class MessageTooLarge(ValueError):
+    pass
+
+
+def parse_address(address):
+    """``"unix:/path"`` or a path -> ``(AF_UNIX, path)``; ``"host:port"`` -> ``(AF_INET, (host, port))``."""
+    address = str(address)
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    if "/" in address or ":" not in address:
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if not n:
+            raise ConnectionError("Connection closed")
+        received += n
+    return buffer
+
+
+def send_message(sock, header, arrays=()):
+    arrays = [np.ascontiguousarray(a) for a in arrays]
+    header = dict(header, arrays=[[list(a.shape), a.dtype.str] for a in arrays])
+    encoded = json.dumps(header, default=float).encode()
+    body_size = sum(a.nbytes for a in arrays)
+    sock.sendall(_LENGTHS.pack(len(encoded), body_size) + encoded)
+    for a in arrays:
+        sock.sendall(memoryview(a).cast("B"))
+
+
+def recv_message(sock, max_size=None):
+    """Read one message; ``MessageTooLarge`` if its lengths add up to more than ``max_size`` bytes.
+
+    The check runs before anything is allocated, so a corrupt or hostile
+    length prefix can't make the reader reserve gigabytes.
+    """
+    header_size, body_size = _LENGTHS.unpack(_recv_exact(sock, _LENGTHS.size))
+    if max_size is not None and header_size + body_size > max_size:
+        raise MessageTooLarge(f"Message of {header_size + body_size} bytes exceeds the {max_size} byte limit")
+    header = json.loads(_recv_exact(sock, header_size))
+    body = _recv_exact(sock, body_size) if body_size else bytearray()
+    arrays = []
+    offset = 0
+    for shape, dtype in header.pop("arrays", []):
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        arrays.append(np.frombuffer(body, dtype=dtype, count=count, offset=offset).reshape(shape))
+        offset += count * dtype.itemsize
+    return header, arrays
+
+
+class _Request:
+    def __init__(self, op, images, min_conf):
+        self.op = op
+        self.images = images
+        self.min_conf = min_conf
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class InferenceServer:
+    """Serves one ``RecognitionEngine`` to many processes over a socket.
+
+    Every connection gets a thread that parses requests and queues them; a
+    single batching thread takes the first waiting request, gathers whatever
+    else arrives within ``max_wait`` seconds (up to ``max_batch`` images) and
+    runs each kind of request as one batched YOLO or OCR call. Clients keep
+    their connections open, so a request costs one round trip.
+    """
+
+    OPS = ("detect", "read", "recognize")
+
+    def __init__(self, engine, address, max_batch=16, max_wait=0.005, max_message_bytes=None):
+        self.engine = engine
+        self.address = address
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_message_bytes = max_message_bytes or getattr(settings, "INFERENCE_MAX_MESSAGE_BYTES", 256 * 1024 ** 2)
+        self.requests = queue.Queue()
+        self.counters = {"requests": 0, "batches": 0, "images": 0}
+        self._stop = threading.Event()
+        self._sock = None
+
+    def serve_forever(self):
+        family, target = parse_address(self.address)
+        if family == socket.AF_UNIX:
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            if os.path.exists(target):
+                os.remove(target)
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(target)
+        self._sock.listen()
+        threading.Thread(target=self._batch_loop, name="inference-batcher", daemon=True).start()
+        logger.info("Inference server listening on %s", self.address)
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn, _ = self._sock.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._handle, args=(conn,), name="inference-conn", daemon=True).start()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._sock is not None:
+            self._sock.close()
+            family, target = parse_address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(target):
+                os.remove(target)
+            self._sock = None
+
+    def stats(self):
+        batches = self.counters["batches"]
+        return {
+            **self.engine.stats(),
+            "model_available": self.engine.model_available,
+            "server": {
+                **self.counters,
+                "mean_batch": round(self.counters["images"] / batches, 2) if batches else 0.0,
+                "queued": self.requests.qsize(),
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+            },
+        }
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    header, arrays = recv_message(conn, self.max_message_bytes)
+                except (ConnectionError, OSError):
+                    return
+                except ValueError as e:
+                    # Oversized or malformed; the stream can't be resynced, so drop the client.
+                    logger.warning("Closing inference connection: %s", e)
+                    return
+                op = header.get("op")
+                if op == "stats":
+                    reply = self.stats()
+                elif op == "warm_up":
+                    reply = {"timings": self.engine.warm_up()}
+                elif op in self.OPS:
+                    request = _Request(op, arrays, float(header.get("min_conf", 0.0)))
+                    self.requests.put(request)
+                    request.done.wait()
+                    reply = {"error": request.error} if request.error else {"results": request.result}
+                else:
+                    reply = {"error": f"Unknown op {op!r}"}
+                try:
+                    send_message(conn, reply)
+                except OSError:
+                    return
+
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            batch = [self.requests.get()]
+            images = len(batch[0].images)
+            deadline = time.monotonic() + self.max_wait
+            while images < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                images += len(request.images)
+
+            groups = defaultdict(list)
+            for request in batch:
+                groups[(request.op, request.min_conf)].append(request)
+            for (op, min_conf), requests in groups.items():
+                self._run(op, min_conf, requests)
+
+    def _run(self, op, min_conf, requests):
+        images = [image for request in requests for image in request.images]
+        start = time.perf_counter()
+        try:
+            if op == "detect":
+                results = self.engine.detect_batch(images, min_conf=min_conf)
+            elif op == "read":
+                results = self.engine.read_text_batch(images)
+            else:
+                results = list(self.engine.recognize_batch(images, min_conf=min_conf, batch_size=self.max_batch))
+            error = None
+        except Exception as e:
+            logger.exception("Batched %s of %d images failed", op, len(images))
+            results, error = None, str(e)
+        metrics.observe(f"server_{op}_batch", time.perf_counter() - start)
+
+        self.counters["requests"] += len(requests)
+        self.counters["batches"] += 1
+        self.counters["images"] += len(images)
+        offset = 0
+        for request in requests:
+            count = len(request.images)
+            if error is None:
+                request.result = results[offset:offset + count]
+                if op == "recognize":
+                    for i, result in enumerate(request.result):
+                        result["index"] = i
+            request.error = error
+            offset += count
+            request.done.set()
+
+
+class RemoteEngine:
+    """A ``RecognitionEngine`` look-alike that runs inference on an ``InferenceServer``.
+
+    Each thread keeps its own persistent connection, so concurrent callers
+    (gate lanes, upload workers) reach the server together and get batched.
+    A dropped connection is re-opened once per call.
+    """
+
+    ocr_cache = None
+
+    def __init__(self, address, timeout=None):
+        self.address = address
+        self.timeout = timeout or getattr(settings, "INFERENCE_TIMEOUT", 30)
+        self.timings = {}
+        self._local = threading.local()
+
+    def _connect(self):
+        family, target = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(target)
+        if family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _call(self, header, arrays=()):
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                send_message(sock, header, arrays)
+                reply, _ = recv_message(sock)
+                break
+            except (ConnectionError, OSError):
+                if sock is not None:
+                    sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise
+        if "error" in reply:
+            raise RuntimeError(f"Inference server error: {reply['error']}")
+        return reply
+
+    def _timed(self, name, header, arrays):
+        start = time.perf_counter()
+        results = self._call(header, arrays)["results"]
+        self.timings[name] = time.perf_counter() - start
+        metrics.observe(name.replace("last_", "remote_"), self.timings[name])
+        return results
+
+    def stats(self):
+        return self._call({"op": "stats"})
+
+    @property
+    def model_available(self):
+        try:
+            return self.stats()["model_available"]
+        except (OSError, RuntimeError):
+            return False
+
+    @property
+    def model_path(self):
+        try:
+            return self.stats()["model_path"]
+        except (OSError, RuntimeError):
+            return f"(inference server at {self.address} unreachable)"
+
+    def warm_up(self):
+        return self._call({"op": "warm_up"})["timings"]
+
+    def detect(self, image, min_conf=0.0):
+        return self.detect_batch([image], min_conf=min_conf)[0]
+
+    def detect_batch(self, images, min_conf=0.0):
+        if not images:
+            return []
+        results = self._timed("last_detect", {"op": "detect", "min_conf": min_conf}, images)
+        return [[tuple(box) for box in boxes] for boxes in results]
+
+    def read_text(self, crop):
+        return self.read_text_batch([crop])[0]
+
+    def read_text_batch(self, crops):
+        crops = list(crops)
+        if not crops:
+            return []
+        return [tuple(result) for result in self._timed("last_ocr", {"op": "read"}, crops)]
+
+    def recognize(self, image, min_conf=0.0):
+        result = next(self.recognize_batch([image], min_conf=min_conf))
+        if not result["plate"]:
+            return "", None
+        conf = next((c["det_conf"] for c in result["candidates"] if c["box"] == result["box"]), 0.0)
+        return result["plate"], (*result["box"], conf)
+
+    def recognize_batch(self, images, min_conf=0.0, batch_size=16):
+        """Yield one result dict per image, in input order, sending ``batch_size`` images per request."""
+        count = 0
+        chunk = []
+        for image in images:
+            chunk.append(image)
+            if len(chunk) == batch_size:
+                yield from self._recognize_chunk(chunk, count, min_conf)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            yield from self._recognize_chunk(chunk, count, min_conf)
+
+    def _recognize_chunk(self, images, offset, min_conf):
+        for result in self._timed("last_recognize", {"op": "recognize", "min_conf": min_conf}, images):
+            result["index"] += offset
+            yield result
@@ -0,0 +1,152 @@
+import logging
+import os
+from collections import namedtuple
+
+from .gating import MotionGate
+from .tracking import PlateTracker, track_frame
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_MODES = ("every", "keyframes", "motion")
+
+VideoInfo = namedtuple("VideoInfo", ["fps", "frames", "duration"])
+
+
+def probe(path):
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {path}")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        capture.release()
+    return VideoInfo(fps, frames, frames / fps)
+
+
+def plan_segments(duration, segment_seconds, overlap=2.0):
+    """Split ``[0, duration)`` into ``(start, end)`` second ranges.
+
+    Each segment runs ``overlap`` seconds into the next one so a plate that
+    passes the camera across a boundary is still seen whole by one of them.
+    """
+    if segment_seconds <= 0 or duration <= segment_seconds:
+        return [(0.0, duration)]
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + segment_seconds)
+        segments.append((start, min(duration, end + overlap)))
+        start = end
+    return segments
+
+
+def sample_frames(path, start, end, mode="every", every=5, interval=1.0, gate=None):
+    """Yield ``(seconds, frame)`` for the sampled frames of ``path`` in ``[start, end)``.
+
+    ``every`` decodes sequentially and keeps every ``every``-th frame.
+    ``keyframes`` seeks ahead ``interval`` seconds at a time, so the decoder
+    restarts from the nearest keyframe instead of decoding everything in
+    between. ``motion`` samples like ``every`` and drops frames in which
+    ``gate`` sees nothing move.
+    """
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        if mode == "keyframes":
+            seconds = start
+            while seconds < end:
+                capture.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield seconds, frame
+                seconds += interval
+            return
+
+        number = int(start * fps)
+        last = int(end * fps)
+        if number:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, number)
+        while number < last and capture.grab():
+            # Sample on absolute frame numbers so overlapping segments pick
+            # the same frames.
+            if number % every == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                if gate is None or gate.check(frame):
+                    yield number / fps, frame
+            number += 1
+    finally:
+        capture.release()
+
+
+def process_segment(path, start, end, options):
+    """Run recognition over one segment; returns its events and counters.
+
+    Event times are seconds from the start of the video. Safe to run in a
+    worker process: the engine is created once per process.
+    """
+    from .recognition import get_engine
+
+    engine = get_engine()
+    gate = None
+    if options["mode"] == "motion":
+        gate = MotionGate(roi=options["roi"], threshold=options["threshold"], min_area=options["min_area"])
+    tracker = PlateTracker(min_reads=options["min_reads"], max_age=options["max_age"], cooldown=options["cooldown"])
+
+    events = []
+    sampled = 0
+    for seconds, frame in sample_frames(path, start, end, options["mode"], options["every"], options["interval"], gate):
+        sampled += 1
+        events.extend(track_frame(engine, tracker, frame, min_conf=options["min_conf"], now=seconds))
+
+    return {
+        "start": start,
+        "end": end,
+        "sampled": sampled,
+        "events": [event._asdict() for event in events],
+        "tracking": tracker.stats(),
+        "motion_gate": gate.stats() if gate else None,
+    }
+
+
+def deduplicate(events, window):
+    """Merge events for the same plate less than ``window`` seconds apart.
+
+    Segments overlap, so a vehicle near a boundary is reported by both.
+    """
+    merged = []
+    latest = {}
+    for event in sorted(events, key=lambda e: e["first_seen"]):
+        previous = latest.get(event["plate"])
+        if previous and event["first_seen"] - previous["last_seen"] < window:
+            previous["last_seen"] = max(previous["last_seen"], event["last_seen"])
+            previous["reads"] = max(previous["reads"], event["reads"])
+            previous["confidence"] = max(previous["confidence"], event["confidence"])
+            continue
+        event = dict(event)
+        merged.append(event)
+        latest[event["plate"]] = event
+    return merged
+
+
+def init_worker(torch_threads=1):
+    """``ProcessPoolExecutor`` initializer: set up Django in spawned workers and
+    keep each worker's torch to its share of the cores."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smarttrack.settings")
+        django.setup()
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(torch_threads)
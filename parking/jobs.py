@@ -0,0 +1,346 @@
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.move import file_move_safe
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import metrics, writer
+from .models import UploadJob
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class SpooledUpload(File):
+    """A spooled upload, usable wherever ``parking.uploads`` expects an upload.
+
+    Like Django's ``TemporaryUploadedFile`` it has a ``temporary_file_path``,
+    so images are decoded straight from disk and ``save_snapshot`` moves the
+    file into the snapshot storage rather than copying it.
+    """
+
+    def __init__(self, path, name, content_type=None):
+        super().__init__(open(path, "rb"), name=name)
+        self.path = path
+        self.content_type = content_type
+
+    def temporary_file_path(self):
+        return self.path
+
+
+_executor = None
+_pending = 0
+_lock = threading.Lock()
+
+# Small uploads stay in memory until their job runs: {job_id: {index: ContentFile}}.
+_held = {}
+
+# Jobs are leased to the process that holds them; see renew() and recover().
+_boot_id = uuid.uuid4().hex[:8]
+_heartbeat_pid = None
+_heartbeat_lock = threading.Lock()
+
+
+def worker_count():
+    return getattr(settings, "UPLOAD_WORKERS", 2)
+
+
+def queue_limit():
+    return getattr(settings, "UPLOAD_QUEUE_LIMIT", 32)
+
+
+def lease_seconds():
+    return getattr(settings, "UPLOAD_JOB_LEASE_SECONDS", 60)
+
+
+def owner():
+    """This server process, as recorded on the jobs it holds."""
+    # The pid is read each time: forked workers share the boot id.
+    return f"{socket.gethostname()[:40]}:{os.getpid()}:{_boot_id}"
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=worker_count(), thread_name_prefix="upload-jobs")
+    return _executor
+
+
+def queue_stats():
+    """Worker and queue figures for this process, plus job counts across all processes."""
+    counts = dict(
+        UploadJob.objects.filter(status__in=[UploadJob.QUEUED, UploadJob.RUNNING])
+        .values_list("status")
+        .annotate(n=Count("id"))
+    )
+    return {
+        "workers": worker_count(),
+        "limit": queue_limit(),
+        "pending": _pending,
+        "queued": counts.get(UploadJob.QUEUED, 0),
+        "running": counts.get(UploadJob.RUNNING, 0),
+    }
+
+
+def _spool(upload, directory, index, held):
+    entry = {"name": upload.name, "path": None, "content_type": getattr(upload, "content_type", None)}
+    if hasattr(upload, "temporary_file_path"):
+        # Already on disk: a rename when the spool is on the same filesystem.
+        os.makedirs(directory, exist_ok=True)
+        entry["path"] = os.path.join(directory, f"{index}{os.path.splitext(upload.name)[1].lower()}")
+        file_move_safe(upload.temporary_file_path(), entry["path"], allow_overwrite=True)
+    else:
+        # Under FILE_UPLOAD_MAX_MEMORY_SIZE: keep it in memory, as the
+        # request did. Django closes the upload with the request, so copy it.
+        upload.seek(0)
+        held[index] = ContentFile(upload.read(), name=upload.name)
+        held[index].content_type = entry["content_type"]
+    return entry
+
+
+def submit(uploads):
+    """Spool ``uploads`` and queue a recognition job for them.
+
+    Returns the ``UploadJob``. Raises ``QueueFull`` when this process already
+    has ``UPLOAD_QUEUE_LIMIT`` jobs waiting or running. With
+    ``UPLOAD_WORKERS = 0`` the job runs before this returns. Uploads Django
+    kept in memory are held in memory for the job; larger ones are moved
+    into ``UPLOAD_JOB_SPOOL_DIR``.
+    """
+    global _pending
+    start_heartbeat()
+    with _lock:
+        if _pending >= queue_limit():
+            raise QueueFull(f"{_pending} uploads are already being processed; try again shortly.")
+        _pending += 1
+
+    job_id = uuid.uuid4()
+    directory = os.path.join(settings.UPLOAD_JOB_SPOOL_DIR, str(job_id))
+    held = {}
+    try:
+        files = [_spool(upload, directory, index, held) for index, upload in enumerate(uploads)]
+        job = UploadJob.objects.create(id=job_id, files=files, owner=owner(), heartbeat_at=timezone.now())
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        _release()
+        raise
+    if held:
+        _held[job.pk] = held
+
+    if worker_count() == 0:
+        try:
+            run_job(job.pk)
+        finally:
+            _release()
+        job.refresh_from_db()
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_run, job.pk))
+    return job
+
+
+def _release():
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def renew():
+    """Extend the lease on the jobs this process holds."""
+    return UploadJob.objects.filter(
+        owner=owner(), status__in=[UploadJob.QUEUED, UploadJob.RUNNING]
+    ).update(heartbeat_at=timezone.now())
+
+
+def recover():
+    """Settle the jobs whose process stopped renewing their lease.
+
+    Such a job's process has died (or been recycled); live processes renew
+    theirs every third of ``UPLOAD_JOB_LEASE_SECONDS``. Each job is claimed
+    first, so only one process settles it. Queued jobs whose files are all
+    still in the spool are queued again here. The rest are marked failed and
+    their spool directories removed: running jobs may already have logged
+    some of their plates, and uploads that were held in memory are gone.
+    Returns ``(requeued, failed)``.
+    """
+    global _pending
+    requeued = failed = 0
+    me = owner()
+    cutoff = timezone.now() - timedelta(seconds=lease_seconds())
+    expired = UploadJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True),
+        status__in=[UploadJob.QUEUED, UploadJob.RUNNING],
+    ).exclude(owner=me)
+    for job in expired:
+        claimed = UploadJob.objects.filter(
+            pk=job.pk, status=job.status, owner=job.owner, heartbeat_at=job.heartbeat_at
+        ).update(owner=me, heartbeat_at=timezone.now())
+        if not claimed:
+            continue
+        on_disk = all(f["path"] and os.path.exists(f["path"]) for f in job.files)
+        if job.status == UploadJob.QUEUED and on_disk and worker_count():
+            with _lock:
+                _pending += 1
+            _get_executor().submit(_run, job.pk)
+            requeued += 1
+            continue
+        job.status = UploadJob.FAILED
+        job.output = "\n".join(filter(None, [job.output, "❌ The server restarted before this job finished; please upload again."]))
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "output", "finished_at"])
+        shutil.rmtree(os.path.join(settings.UPLOAD_JOB_SPOOL_DIR, str(job.pk)), ignore_errors=True)
+        failed += 1
+    if requeued or failed:
+        logger.info("Recovered upload jobs: %d requeued, %d failed", requeued, failed)
+    return requeued, failed
+
+
+def start_heartbeat():
+    """Start this process's lease thread, on first use of the queue."""
+    global _heartbeat_pid
+    with _heartbeat_lock:
+        # Threads don't survive a fork, so a forked worker starts its own.
+        if _heartbeat_pid == os.getpid():
+            return
+        _heartbeat_pid = os.getpid()
+        threading.Thread(target=_heartbeat, name="upload-jobs-heartbeat", daemon=True).start()
+
+
+def _heartbeat():
+    while True:
+        try:
+            renew()
+            if getattr(settings, "UPLOAD_JOB_RECOVERY", True):
+                recover()
+        except DatabaseError as e:
+            logger.warning("Could not renew or recover upload jobs: %s", e)
+        finally:
+            close_old_connections()
+        time.sleep(lease_seconds() / 3)
+
+
+def _run(job_id):
+    try:
+        run_job(job_id)
+    except Exception:
+        logger.exception("Upload job %s crashed", job_id)
+    finally:
+        _release()
+        close_old_connections()
+
+
+def run_job(job_id):
+    job = UploadJob.objects.get(pk=job_id)
+    job.status = UploadJob.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=["status", "started_at"])
+    metrics.observe("upload_job_wait", (job.started_at - job.created_at).total_seconds())
+
+    try:
+        with metrics.span("upload_job"):
+            process(job)
+        job.status = UploadJob.DONE
+    except Exception as e:
+        logger.exception("Upload job %s failed", job.pk)
+        job.output = "\n".join(filter(None, [job.output, f"❌ Job failed: {e}"]))
+        job.status = UploadJob.FAILED
+    finally:
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "output", "plates", "finished_at"])
+        _held.pop(job.pk, None)
+        shutil.rmtree(os.path.join(settings.UPLOAD_JOB_SPOOL_DIR, str(job.pk)), ignore_errors=True)
+
+
+def process(job):
+    """Recognize and log the plates in every file of ``job``, saving progress after each file."""
+    from .recognition import get_engine
+    from .services import record_plate_event
+    from .snapshots import save_frame, save_snapshot
+    from .uploads import decode_image, is_video, recognize_video
+
+    engine = get_engine()
+    output = []
+    held = _held.get(job.pk, {})
+
+    def log(plate, save):
+        with metrics.span("snapshot_save"):
+            snapshot = save()
+        correlation_id = metrics.new_correlation_id()
+        metrics.correlation_id.set(correlation_id)
+        try:
+            api_response = writer.run(record_plate_event, plate, correlation_id=correlation_id)
+            mode = api_response["action"]
+        except IntegrityError:
+            api_response = {"error": "Could not create entry due to a race condition. Please try again."}
+            mode = None
+        job.plates.append({"plate_number": plate, "mode": mode, "image_path": snapshot.url})
+        output.append(f"✅ Plate detected: {plate}\n✅ Mode determined: {mode}\n✅ Image saved as: {snapshot.name}\n✅ API Response: {api_response}")
+
+    for index, spooled in enumerate(job.files):
+        if spooled["path"]:
+            upload = SpooledUpload(spooled["path"], spooled["name"], spooled["content_type"])
+        elif index in held:
+            upload = held[index]
+        else:
+            output.append(f"❌ {spooled['name']} is no longer available.")
+            continue
+        try:
+            start = time.perf_counter()
+            if is_video(upload):
+                with metrics.span("upload_video_recognize"):
+                    found = recognize_video(engine, upload)
+                output.append(f"✅ {upload.name}: {len(found)} plates in {time.perf_counter() - start:.2f}s")
+                for plate, reads, frame in found:
+                    log(plate, lambda: save_frame(frame, plate))
+                if not found:
+                    output.append(f"❌ No license plate detected in {upload.name}.")
+                continue
+
+            with metrics.span("upload_decode"):
+                image = decode_image(upload)
+            if image is None:
+                output.append(f"❌ Could not decode {upload.name}.")
+                continue
+            with metrics.span("upload_recognize"):
+                plate, _ = engine.recognize(image)
+            output.append(f"✅ {upload.name}: recognition time {time.perf_counter() - start:.2f}s")
+            if plate:
+                ext = os.path.splitext(upload.name)[1] or ".jpg"
+                log(plate, lambda: save_snapshot(upload, plate, ext=ext))
+            else:
+                output.append(f"❌ No license plate detected in {upload.name}.")
+        except Exception as e:
+            output.append(f"❌ Error processing {upload.name}: {str(e)}")
+        finally:
+            upload.close()
+            job.output = "\n".join(output)
+            job.save(update_fields=["output", "plates"])
+
+
+def status(job):
+    return {
+        "id": str(job.pk),
+        "status": job.status,
+        "finished": job.finished,
+        "output": job.output,
+        "plates": job.plates,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "queue": queue_stats(),
+    }
@@ -0,0 +1,325 @@
+import json
+import platform
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+import cv2
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from parking import rollups, synthetic
+from parking.management.commands.compare_detectors import latency_summary
+from parking.models import EntryExitLog, VehicleRollup
+from parking.ocr import clean_plate_text
+from parking.recognition import get_engine
+
+SUITES = ("detect", "ocr", "upload", "log_plate", "contention", "views")
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+
+class Command(BaseCommand):
+    help = "Benchmark recognition, plate logging and page rendering on synthetic data; prints JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES), help="What to measure.")
+        parser.add_argument(
+            "--scales",
+            nargs="+",
+            type=int,
+            default=[10000],
+            help="EntryExitLog row counts to render pages at, e.g. 10000 1000000 10000000.",
+        )
+        parser.add_argument("--images", type=int, default=20, help="Synthetic plate images for recognition suites.")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per page.")
+        parser.add_argument("--clients", type=int, default=8, help="Concurrent log_plate clients.")
+        parser.add_argument("--requests", type=int, default=100, help="log_plate requests per client.")
+        parser.add_argument(
+            "--lanes",
+            nargs="+",
+            type=int,
+            default=[1, 2, 4, 8, 16],
+            help="Concurrent gate lanes to measure log_plate throughput at (contention suite).",
+        )
+        parser.add_argument("--events", type=int, default=200, help="log_plate events per lane (contention suite).")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic plates and rows.")
+        parser.add_argument("--output", help="Write the JSON results to this file as well.")
+        parser.add_argument(
+            "--reuse",
+            action="store_true",
+            help="Allow running against a database that already has logs (synthetic rows are added to it).",
+        )
+
+    def handle(self, *args, **options):
+        if EntryExitLog.objects.exists() and not options["reuse"]:
+            raise CommandError(
+                "The database already has logs. Point SMARTTRACK_DB_PATH at a scratch database, or pass --reuse."
+            )
+        self.rng = random.Random(options["seed"])
+        self.client = Client(SERVER_NAME="localhost")
+        results = {
+            "started_at": timezone.now().isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "machine": platform.machine(),
+                "database": connection.vendor,
+                "sqlite_profile": getattr(settings, "SQLITE_PROFILE", None),
+                "detector_backend": settings.DETECTOR_BACKEND,
+                "ocr_backend": settings.OCR_BACKEND,
+            },
+            "suites": {},
+        }
+
+        recognition = [s for s in ("detect", "ocr", "upload") if s in options["suites"]]
+        if recognition:
+            engine = get_engine()
+            if not engine.model_available:
+                for suite in recognition:
+                    results["suites"][suite] = {"skipped": f"YOLO model not found at {engine.model_path}"}
+            else:
+                engine.warm_up()
+                samples = [self.sample() for _ in range(options["images"])]
+                for suite in recognition:
+                    self.stdout.write(f"⏱️  {suite}")
+                    results["suites"][suite] = getattr(self, f"bench_{suite}")(engine, samples)
+
+        if "log_plate" in options["suites"]:
+            self.stdout.write("⏱️  log_plate")
+            results["suites"]["log_plate"] = self.bench_log_plate(options["clients"], options["requests"])
+
+        if "contention" in options["suites"]:
+            self.stdout.write("⏱️  contention")
+            results["suites"]["contention"] = self.bench_contention(options["lanes"], options["events"])
+
+        if "views" in options["suites"]:
+            results["suites"]["views"] = {}
+            for scale in sorted(options["scales"]):
+                self.stdout.write(f"⏱️  views at {scale} rows")
+                results["suites"]["views"][str(scale)] = self.bench_views(scale, options["repeat"], options["seed"])
+
+        results["finished_at"] = timezone.now().isoformat()
+        output = json.dumps(results, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+
+    def sample(self):
+        plate = synthetic.fake_plate(self.rng)
+        image, box = synthetic.plate_image(plate, self.rng)
+        return plate, image, box
+
+    def bench_detect(self, engine, samples):
+        latencies = []
+        found = 0
+        for _, image, _ in samples:
+            start = time.perf_counter()
+            boxes = engine.detect(image)
+            latencies.append(time.perf_counter() - start)
+            found += bool(boxes)
+        return {**latency_summary(latencies), "images": len(samples), "detected": found}
+
+    def bench_ocr(self, engine, samples):
+        crops = [image[y1:y2, x1:x2] for _, image, (x1, y1, x2, y2) in samples]
+        cache, engine.ocr_cache = engine.ocr_cache, None
+        try:
+            latencies = []
+            correct = 0
+            for (plate, _, _), crop in zip(samples, crops):
+                start = time.perf_counter()
+                text, _ = engine.read_text(crop)
+                latencies.append(time.perf_counter() - start)
+                correct += clean_plate_text(text) == plate
+            start = time.perf_counter()
+            engine.read_text_batch(crops)
+            batch_per_crop = (time.perf_counter() - start) / len(crops)
+        finally:
+            engine.ocr_cache = cache
+        return {
+            **latency_summary(latencies),
+            "batch_ms_per_crop": round(batch_per_crop * 1000, 2),
+            "crops": len(crops),
+            "accuracy": round(correct / len(crops), 3),
+        }
+
+    def bench_upload(self, engine, samples):
+        """Time until the upload is accepted, and until its job has finished."""
+        url = reverse("upload_image")
+        accepted = []
+        latencies = []
+        for plate, image, _ in samples:
+            ok, encoded = cv2.imencode(".jpg", image)
+            upload = SimpleUploadedFile(f"{plate}.jpg", encoded.tobytes(), content_type="image/jpeg")
+            start = time.perf_counter()
+            job = self.client.post(url, {"image": upload}, HTTP_ACCEPT="application/json").json()
+            accepted.append(time.perf_counter() - start)
+            status_url = job.get("status_url")
+            while not job.get("finished", True):
+                time.sleep(0.01)
+                job = self.client.get(status_url, HTTP_ACCEPT="application/json").json()
+            latencies.append(time.perf_counter() - start)
+        return {
+            **latency_summary(latencies),
+            "accepted_p50_ms": latency_summary(accepted)["p50_ms"],
+            "uploads": len(samples),
+        }
+
+    def bench_log_plate(self, clients, requests):
+        url = reverse("log_plate")
+        plates = [synthetic.fake_plate(self.rng) for _ in range(clients * 10)]
+        latencies = []
+        errors = []
+        error_samples = []
+        lock = threading.Lock()
+
+        def run():
+            client = Client(SERVER_NAME="localhost")
+            mine = []
+            failed = 0
+            try:
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    response = client.get(url, {"plate": random.choice(plates)})
+                    mine.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        failed += 1
+                        if not error_samples:
+                            error_samples.append(response.content.decode(errors="replace")[:200])
+            finally:
+                close_old_connections()
+                connection.close()
+            with lock:
+                latencies.extend(mine)
+                errors.append(failed)
+
+        threads = [threading.Thread(target=run) for _ in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return {
+            **latency_summary(latencies),
+            "clients": clients,
+            "requests": len(latencies),
+            "errors": sum(errors),
+            "error_sample": error_samples[0] if error_samples else None,
+            "requests_per_sec": round(len(latencies) / elapsed, 1),
+        }
+
+    def bench_contention(self, lanes, events):
+        """Events/sec through ``log_plate`` with 1..N lanes logging at once, per write mode."""
+        results = {}
+        for mode, single_writer in (("direct", False), ("single_writer", True)):
+            results[mode] = {}
+            with override_settings(DATABASE_SINGLE_WRITER=single_writer):
+                for count in sorted(lanes):
+                    results[mode][str(count)] = self.bench_lanes(count, events)
+                    row = results[mode][str(count)]
+                    self.stdout.write(
+                        f"   {mode:>13} {count:>3} lanes: {row['events_per_sec']:>8} events/s, "
+                        f"p95 {row['p95_ms']}ms, {row['errors']} errors"
+                    )
+        return results
+
+    def bench_lanes(self, lanes, events):
+        url = reverse("log_plate")
+        latencies = []
+        errors = []
+        locked = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(lanes)
+        # Each lane sees its own plates, like a separate gate.
+        lane_plates = [[synthetic.fake_plate(self.rng) for _ in range(20)] for _ in range(lanes)]
+
+        def lane(plates):
+            client = Client(SERVER_NAME="localhost")
+            mine = []
+            failed = 0
+            was_locked = 0
+            try:
+                barrier.wait()
+                for i in range(events):
+                    start = time.perf_counter()
+                    response = client.get(url, {"plate": plates[i % len(plates)]})
+                    mine.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        failed += 1
+                        was_locked += b"locked" in response.content
+            finally:
+                close_old_connections()
+                connection.close()
+            with lock:
+                latencies.extend(mine)
+                errors.append(failed)
+                locked.append(was_locked)
+
+        threads = [threading.Thread(target=lane, args=(plates,)) for plates in lane_plates]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return {
+            **latency_summary(latencies),
+            "lanes": lanes,
+            "events": len(latencies),
+            "errors": sum(errors),
+            "locked_errors": sum(locked),
+            "events_per_sec": round((len(latencies) - sum(errors)) / elapsed, 1),
+        }
+
+    def bench_views(self, scale, repeat, seed):
+        existing = EntryExitLog.objects.count()
+        if existing < scale:
+            start = time.perf_counter()
+            synthetic.generate_logs(scale - existing, seed=seed + existing)
+            rollups.rebuild()
+            self.stdout.write(f"   generated {scale - existing} rows in {time.perf_counter() - start:.1f}s")
+
+        top = VehicleRollup.objects.select_related("vehicle").order_by("-visits").first()
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark", defaults={"is_staff": True, "is_superuser": True}
+        )
+        self.client.force_login(user)
+        pages = {
+            "analytics_view": reverse("analytics"),
+            "admin_changelist": reverse("admin:parking_entryexitlog_changelist"),
+        }
+        if top:
+            pages["vehicle_detail"] = reverse("vehicle_detail", args=[top.vehicle.license_plate])
+
+        results = {"rows": EntryExitLog.objects.count()}
+        for name, url in pages.items():
+            self.client.get(url)
+            reset_queries()
+            # Reads may be routed to another alias (the SQLite production profile's reader).
+            with ExitStack() as stack:
+                queries = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+                response = self.client.get(url)
+            results[name] = {
+                **timed(lambda: self.client.get(url), repeat),
+                "status": response.status_code,
+                "queries": sum(len(captured) for captured in queries),
+            }
+        return results
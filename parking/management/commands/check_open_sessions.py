@@ -0,0 +1,37 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from parking import open_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the log_plate open-session cache with the open logs in the database. "
+        "With a per-process (locmem) cache this checks the command's own copy; point "
+        "OPEN_SESSION_CACHE at a shared backend to check what the server sees."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Drop cache entries that disagree with the database.")
+        parser.add_argument("--warm", action="store_true", help="Load every open session into the cache first.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Vehicles compared per cache round trip.")
+
+    def handle(self, *args, **options):
+        if not open_sessions.enabled():
+            raise CommandError("The open-session cache is disabled (OPEN_SESSION_CACHE_ENABLED).")
+        start = time.perf_counter()
+        if options["warm"]:
+            self.stdout.write(f"🚗 Cached {open_sessions.warm_up(options['batch_size'])} open sessions")
+        report = open_sessions.check(fix=options["fix"], batch_size=options["batch_size"])
+        for example in report["examples"]:
+            self.stdout.write(f"❌ {json.dumps(example, default=str)}")
+        summary = (
+            f"{report['checked']} vehicles checked, {report['cached']} cached, {report['stale']} stale "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        if report["stale"] and not options["fix"]:
+            self.stdout.write(f"❌ {summary}; rerun with --fix to drop stale entries")
+        else:
+            self.stdout.write(f"✅ {summary}" + (" (stale entries dropped)" if report["stale"] else ""))
@@ -0,0 +1,140 @@
+import json
+import os
+import statistics
+import time
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from parking.detectors import BACKENDS, exported_path
+from parking.recognition import RecognitionEngine, clean_plate_text, engine_options
+from parking.tracking import iou
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def collect_image_paths(paths):
+    image_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    image_paths.append(os.path.join(path, name))
+        else:
+            image_paths.append(path)
+    return image_paths
+
+
+def latency_summary(samples):
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare a detector backend against the PyTorch model for accuracy and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Image files or directories with plate images.")
+        parser.add_argument("--backend", choices=BACKENDS, default=settings.DETECTOR_BACKEND, help="Backend to test.")
+        parser.add_argument("--model", help="Exported model to test (default: the backend's export of best.pt).")
+        parser.add_argument("--int8", action="store_true", default=settings.DETECTOR_INT8, help="Test the INT8 export.")
+        parser.add_argument("--imgsz", type=int, default=settings.DETECTOR_IMGSZ, help="Input resolution.")
+        parser.add_argument("--threads", type=int, default=settings.DETECTOR_THREADS, help="Inference threads.")
+        parser.add_argument("--min-conf", type=float, default=0.5, help="Minimum confidence for a plate box.")
+        parser.add_argument("--iou", type=float, default=0.5, help="IoU at which two boxes count as the same plate.")
+        parser.add_argument("--output", help="Also write the report to this JSON file.")
+
+    def handle(self, *args, **options):
+        image_paths = collect_image_paths(options["paths"])
+        if not image_paths:
+            raise CommandError("No images found.")
+
+        reference_options = engine_options()
+        reference_options.update(model_path=str(settings.PLATE_MODEL_PATH), backend="torch", imgsz=640)
+        reference = RecognitionEngine(**reference_options)
+        candidate = RecognitionEngine(
+            options["model"] or exported_path(settings.PLATE_MODEL_PATH, options["backend"], options["int8"]),
+            backend=options["backend"],
+            imgsz=options["imgsz"],
+            threads=options["threads"],
+        )
+        for engine in (reference, candidate):
+            if not engine.model_available:
+                raise CommandError(f"Model not found at {engine.model_path}.")
+        # Only the reference engine loads the OCR reader; the candidate just needs
+        # its first forward pass out of the way.
+        reference.warm_up()
+        candidate.detect(np.zeros((640, 640, 3), dtype=np.uint8))
+
+        latencies = {"reference": [], "candidate": []}
+        reference_boxes = candidate_boxes = matched = same_plate = plates = 0
+        ious = []
+        for path in image_paths:
+            image = cv2.imread(path)
+            if image is None:
+                self.stderr.write(f"❌ Could not read image: {path}")
+                continue
+
+            found = {}
+            for name, engine in (("reference", reference), ("candidate", candidate)):
+                start = time.perf_counter()
+                found[name] = engine.detect(image, min_conf=options["min_conf"])
+                latencies[name].append(time.perf_counter() - start)
+            reference_boxes += len(found["reference"])
+            candidate_boxes += len(found["candidate"])
+
+            unmatched = list(found["candidate"])
+            for box in found["reference"]:
+                best = max(unmatched, key=lambda other: iou(box[:4], other[:4]), default=None)
+                if best is not None and iou(box[:4], best[:4]) >= options["iou"]:
+                    matched += 1
+                    ious.append(iou(box[:4], best[:4]))
+                    unmatched.remove(best)
+
+            # Both detectors' crops are read by the same OCR reader, so any
+            # difference in plate text comes from the boxes.
+            texts = [self.read_plate(reference, image, found[name]) for name in ("reference", "candidate")]
+            if texts[0]:
+                plates += 1
+                same_plate += texts[0] == texts[1]
+
+        if not latencies["reference"]:
+            raise CommandError("None of the images could be read.")
+        reference_latency = latency_summary(latencies["reference"])
+        candidate_latency = latency_summary(latencies["candidate"])
+        report = {
+            "images": len(latencies["reference"]),
+            "backend": options["backend"],
+            "model": candidate.model_path,
+            "imgsz": options["imgsz"],
+            "threads": options["threads"],
+            "reference": {**reference_latency, "boxes": reference_boxes},
+            "candidate": {**candidate_latency, "boxes": candidate_boxes},
+            "speedup": round(reference_latency["mean_ms"] / candidate_latency["mean_ms"], 2),
+            "box_recall": round(matched / reference_boxes, 3) if reference_boxes else None,
+            "box_precision": round(matched / candidate_boxes, 3) if candidate_boxes else None,
+            "mean_iou": round(statistics.mean(ious), 3) if ious else None,
+            "plate_agreement": round(same_plate / plates, 3) if plates else None,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+        self.stdout.write(
+            f"✅ {options['backend']}: {candidate_latency['mean_ms']} ms vs torch {reference_latency['mean_ms']} ms "
+            f"({report['speedup']}x), box recall {report['box_recall']}, plate agreement {report['plate_agreement']}"
+        )
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+    def read_plate(self, engine, image, boxes):
+        for x1, y1, x2, y2, _ in boxes:
+            text, _ = engine.read_text(image[y1:y2, x1:x2])
+            plate = clean_plate_text(text)
+            if plate:
+                return plate
+        return ""
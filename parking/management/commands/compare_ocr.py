@@ -0,0 +1,117 @@
+import json
+import os
+import re
+import time
+
+import cv2
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from parking.management.commands.compare_detectors import collect_image_paths, latency_summary
+from parking.ocr import BACKENDS, PlateGrammar, clean_plate_text, load_reader
+from parking.recognition import RecognitionEngine, engine_options
+
+LABEL_RE = re.compile(r"^([A-Z0-9]+)[_.]")
+
+
+class Command(BaseCommand):
+    help = "Compare OCR backends on plate crops for speed, agreement and accuracy."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Image files or directories.")
+        parser.add_argument(
+            "--crops", action="store_true", help="Images are already plate crops (otherwise YOLO crops them first)."
+        )
+        parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS), help="Backends to run.")
+        parser.add_argument(
+            "--formats", nargs="*", default=settings.PLATE_FORMATS, help="Plate formats, e.g. LLLDDDD (default: PLATE_FORMATS)."
+        )
+        parser.add_argument(
+            "--labels-from-names",
+            action="store_true",
+            help="Score accuracy against the plate at the start of each file name (ABC123_....jpg).",
+        )
+        parser.add_argument("--batch-size", type=int, default=16, help="Crops per batched call.")
+        parser.add_argument("--output", help="Also write the report to this JSON file.")
+
+    def handle(self, *args, **options):
+        crops, labels = self.load_crops(options)
+        if not crops:
+            raise CommandError("No plate crops found.")
+        grammar = PlateGrammar(options["formats"]) if options["formats"] else None
+
+        report = {"crops": len(crops), "formats": options["formats"], "backends": {}}
+        reads = {}
+        for backend in options["backends"]:
+            start = time.perf_counter()
+            reader = load_reader(backend, settings.PLATE_OCR_LANGUAGES, options["formats"])
+            load_time = time.perf_counter() - start
+            reader.read(crops[0])
+
+            single = []
+            texts = []
+            for crop in crops:
+                start = time.perf_counter()
+                text, _ = reader.read(crop)
+                single.append(time.perf_counter() - start)
+                texts.append(clean_plate_text(text))
+
+            start = time.perf_counter()
+            for i in range(0, len(crops), options["batch_size"]):
+                reader.read_batch(crops[i:i + options["batch_size"]])
+            batch_per_crop = (time.perf_counter() - start) / len(crops)
+
+            reads[backend] = texts
+            result = {
+                "load_s": round(load_time, 2),
+                "single": latency_summary(single),
+                "batch_ms_per_crop": round(batch_per_crop * 1000, 2),
+                "empty": sum(1 for text in texts if not text),
+            }
+            if grammar is not None:
+                result["valid_format"] = round(sum(grammar.matches(text) for text in texts) / len(texts), 3)
+            if labels:
+                scored = [(text, label) for text, label in zip(texts, labels) if label]
+                result["accuracy"] = round(sum(text == label for text, label in scored) / len(scored), 3)
+            report["backends"][backend] = result
+
+        baseline = options["backends"][0]
+        for backend in options["backends"][1:]:
+            agree = sum(a == b for a, b in zip(reads[baseline], reads[backend]))
+            report["backends"][backend][f"agreement_with_{baseline}"] = round(agree / len(crops), 3)
+
+        self.stdout.write(json.dumps(report, indent=2))
+        for backend, result in report["backends"].items():
+            self.stdout.write(
+                f"✅ {backend}: {result['single']['mean_ms']} ms/crop single, "
+                f"{result['batch_ms_per_crop']} ms/crop batched"
+                + (f", accuracy {result['accuracy']}" if "accuracy" in result else "")
+            )
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+    def load_crops(self, options):
+        detector = None
+        if not options["crops"]:
+            detector = RecognitionEngine(**engine_options())
+            if not detector.model_available:
+                raise CommandError(f"YOLO model not found at {detector.model_path}.")
+
+        crops = []
+        labels = []
+        for path in collect_image_paths(options["paths"]):
+            image = cv2.imread(path)
+            if image is None:
+                self.stderr.write(f"❌ Could not read image: {path}")
+                continue
+            if detector is not None:
+                boxes = detector.detect(image, min_conf=0.5)
+                if not boxes:
+                    continue
+                x1, y1, x2, y2, _ = boxes[0]
+                image = image[y1:y2, x1:x2]
+            crops.append(image)
+            match = LABEL_RE.match(os.path.basename(path).upper())
+            labels.append(match.group(1) if match and options["labels_from_names"] else None)
+        return crops, labels if any(labels) else None
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from parking import detectors
+
+
+class Command(BaseCommand):
+    help = "Export the YOLO plate detector to ONNX or OpenVINO for CPU inference."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=["onnx", "openvino"], default="openvino", help="Target runtime.")
+        parser.add_argument("--model", default=str(settings.PLATE_MODEL_PATH), help="PyTorch weights to export.")
+        parser.add_argument("--imgsz", type=int, default=settings.DETECTOR_IMGSZ, help="Input resolution.")
+        parser.add_argument("--int8", action="store_true", help="Quantize weights to INT8.")
+        parser.add_argument(
+            "--data",
+            default="plate_dataset/data.yaml",
+            help="Dataset YAML used to calibrate OpenVINO INT8 quantization.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            path = detectors.export(
+                options["model"], options["format"], imgsz=options["imgsz"], int8=options["int8"], data=options["data"]
+            )
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"✅ Exported {options['model']} to {path} in {time.perf_counter() - start:.1f}s")
+        self.stdout.write(
+            f"   Set DETECTOR_BACKEND = \"{options['format']}\""
+            + (" and DETECTOR_INT8 = True" if options["int8"] else "")
+            + f" (and DETECTOR_IMGSZ = {options['imgsz']}) to use it."
+        )
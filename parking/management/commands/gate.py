@@ -0,0 +1,182 @@
+import json
+import os
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from parking.events import get_event_client
+from parking.framering import SharedFrameSource
+from parking.gating import MotionGate
+from parking.pipeline import FramePipeline, VideoSource
+from parking.recognition import create_engine_pool
+from parking.tracking import PlateTracker, track_frame
+
+
+def limit_torch_threads(workers):
+    # Each engine runs on its own thread; split the cores between them
+    # instead of letting every engine's intra-op pool claim all of them.
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+def lane_stats(pipeline, tracker):
+    stats = pipeline.stats()
+    stages = stats["stages"]
+    return {
+        "tracking": tracker.stats(),
+        "running": pipeline.running,
+        "camera_fps": stages["capture"]["fps"],
+        "recognition_fps": stages["inference"]["fps"],
+        "recognition_ms": stages["inference"]["avg_ms"],
+        "recognition_max_ms": stages["inference"]["max_ms"],
+        "frame_age_ms": stages["frame_age"]["avg_ms"],
+        "dropped_frames": stats["dropped"]["inference"],
+        "motion_gate": stats["gate"],
+    }
+
+
+class Command(BaseCommand):
+    help = "Run headless plate recognition on one or more camera lanes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "sources",
+            nargs="*",
+            help="Camera indices, stream URLs (rtsp://...) or video files. Defaults to GATE_SOURCES.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=0,
+            help="Recognition engines shared by all lanes (default: one per lane, at most one per CPU).",
+        )
+        parser.add_argument("--fps", type=float, default=settings.STREAM_TARGET_FPS, help="Capture rate cap per lane.")
+        parser.add_argument(
+            "--inference-fps", type=float, default=settings.STREAM_INFERENCE_FPS, help="Recognition rate cap per lane."
+        )
+        parser.add_argument("--min-conf", type=float, default=0.5, help="Minimum YOLO confidence for a plate box.")
+        parser.add_argument(
+            "--min-reads", type=int, default=3, help="OCR reads a plate track needs before it is committed."
+        )
+        parser.add_argument(
+            "--cooldown", type=float, default=30.0, help="Seconds before the same plate can be committed again."
+        )
+        parser.add_argument(
+            "--motion-roi", default=settings.MOTION_GATE_ROI, help="Motion gate region as x1,y1,x2,y2 fractions."
+        )
+        parser.add_argument(
+            "--no-motion-gate",
+            action="store_true",
+            default=not settings.MOTION_GATE_ENABLED,
+            help="Run recognition on every frame, even when nothing moves.",
+        )
+        parser.add_argument(
+            "--shared-memory",
+            action="store_true",
+            default=settings.STREAM_SHARED_MEMORY,
+            help="Capture each lane in its own process, handing frames over through shared memory.",
+        )
+        parser.add_argument("--log", action="store_true", help="Log committed plates to the parking backend.")
+        parser.add_argument("--stats-interval", type=float, default=10.0, help="Seconds between lane stats reports.")
+        parser.add_argument("--status-file", help="Also write the latest lane stats to this JSON file.")
+
+    def handle(self, *args, **options):
+        sources = options["sources"] or getattr(settings, "GATE_SOURCES", [])
+        if not sources:
+            raise CommandError("No camera sources given and GATE_SOURCES is empty.")
+
+        workers = options["workers"] or min(len(sources), os.cpu_count() or 1)
+        limit_torch_threads(workers)
+        pool = create_engine_pool(workers)
+        if not pool.model_available:
+            raise CommandError(f"YOLO model not found at {pool.engines[0].model_path}.")
+        timings = pool.warm_up()
+        self.stdout.write(f"✅ {workers} recognition engine(s) ready: {timings}")
+
+        lanes = []
+        self.lanes = {}
+        self.trackers = {}
+        self.log = options["log"]
+        for index, source in enumerate(sources, 1):
+            name = f"lane{index}"
+            if options["shared_memory"]:
+                capture = SharedFrameSource(source, slots=settings.STREAM_RING_SLOTS, target_fps=options["fps"])
+            else:
+                capture = VideoSource(source)
+            self.trackers[name] = PlateTracker(min_reads=options["min_reads"], cooldown=options["cooldown"])
+            target_fps = options["fps"] or (capture.fps if capture.is_file else 0)
+            lane = FramePipeline(
+                capture,
+                self.make_recognizer(pool, name, options["min_conf"], options["log"]),
+                target_fps=target_fps,
+                inference_fps=options["inference_fps"],
+                name=name,
+                display=False,
+                gate=self.make_gate(options),
+            )
+            self.lanes[name] = lane
+            lanes.append(lane.start())
+            self.stdout.write(f"✅ {name} started on {source}")
+
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        try:
+            while not stopping.wait(options["stats_interval"]):
+                self.report(lanes, pool, options["status_file"])
+                if not any(lane.running for lane in lanes):
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for lane in lanes:
+                lane.stop()
+            if options["log"]:
+                get_event_client().close()
+            self.report(lanes, pool, options["status_file"])
+
+    def make_gate(self, options):
+        if options["no_motion_gate"]:
+            return None
+        return MotionGate(
+            roi=options["motion_roi"],
+            threshold=settings.MOTION_GATE_THRESHOLD,
+            min_area=settings.MOTION_GATE_MIN_AREA,
+        )
+
+    def make_recognizer(self, pool, name, min_conf, log):
+        tracker = self.trackers[name]
+
+        def recognize(frame):
+            with pool.engine() as engine:
+                events = track_frame(engine, tracker, frame, min_conf=min_conf)
+            for event in events:
+                self.stdout.write(f"🚗 {name}: {event.plate} ({event.reads} reads, {event.confidence:.0%} agreement)")
+                if log:
+                    self.log_event(name, event)
+            return events
+
+        return recognize
+
+    def log_event(self, name, event):
+        # Runs on the lane's inference thread, so the event picks up the
+        # correlation ID of the frame that committed it.
+        get_event_client().submit(event.plate, lane=name, trace=self.lanes[name].trace())
+
+    def report(self, lanes, pool, status_file):
+        status = {
+            "lanes": {lane.name: lane_stats(lane, self.trackers[lane.name]) for lane in lanes},
+            "pool": pool.stats(),
+        }
+        if self.log:
+            status["events"] = get_event_client().stats()
+        self.stdout.write(json.dumps(status))
+        if status_file:
+            tmp_path = f"{status_file}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(status, f)
+            os.replace(tmp_path, status_file)
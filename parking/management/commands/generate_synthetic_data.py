@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from parking import rollups, synthetic
+
+
+class Command(BaseCommand):
+    help = "Fill the database with synthetic vehicles and entry/exit logs for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("rows", type=int, help="EntryExitLog rows to add.")
+        parser.add_argument("--vehicles", type=int, help="Distinct plates (default: one per 50 rows).")
+        parser.add_argument("--days", type=int, default=365, help="Days of history to spread the rows over.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk insert.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = synthetic.generate_logs(
+            options["rows"],
+            vehicles=options["vehicles"],
+            days=options["days"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+        )
+        self.stdout.write(f"✅ Wrote {written} logs in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        stats = rollups.rebuild()
+        self.stdout.write(f"✅ Rebuilt rollups ({stats}) in {time.perf_counter() - start:.1f}s")
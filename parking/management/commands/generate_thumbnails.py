@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from parking.models import Snapshot
+from parking.storage import make_thumbnail, snapshot_storage
+
+
+class Command(BaseCommand):
+    help = "Generate admin thumbnails for snapshots that don't have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerate every thumbnail.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        snapshots = Snapshot.objects.all() if options["all"] else Snapshot.objects.filter(thumbnail="")
+        made = 0
+        missing = 0
+        for snapshot in snapshots.only("pk", "name").iterator():
+            if not snapshot_storage.exists(snapshot.name):
+                missing += 1
+                continue
+            Snapshot.objects.filter(pk=snapshot.pk).update(thumbnail=make_thumbnail(snapshot.name))
+            made += 1
+        self.stdout.write(
+            f"✅ Generated {made} thumbnails ({missing} snapshots missing on disk) in {time.perf_counter() - start:.2f}s"
+        )
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from parking import snapshots
+
+
+class Command(BaseCommand):
+    help = "Index existing images in entries/ so the admin can find them without listing the directory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Directory to scan (default: entries/ under BASE_DIR).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per bulk insert.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = snapshots.backfill(options["dir"], batch_size=options["batch_size"])
+        self.stdout.write(f"✅ Scanned {count} snapshot files in {time.perf_counter() - start:.2f}s")
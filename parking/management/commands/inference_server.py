@@ -0,0 +1,60 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from parking.inference import InferenceServer
+from parking.recognition import RecognitionEngine, engine_options
+
+
+class Command(BaseCommand):
+    help = "Hold YOLO and OCR once and serve recognition to every worker, camera and script over a socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--address",
+            default=settings.INFERENCE_SERVER or settings.INFERENCE_SERVER_DEFAULT,
+            help="Unix socket path (or unix:/path) or host:port to listen on.",
+        )
+        parser.add_argument(
+            "--max-batch", type=int, default=settings.INFERENCE_MAX_BATCH, help="Most images per batched model call."
+        )
+        parser.add_argument(
+            "--max-wait-ms",
+            type=float,
+            default=settings.INFERENCE_MAX_WAIT_MS,
+            help="How long the first request of a batch waits for others to join it.",
+        )
+        parser.add_argument("--stats-interval", type=float, default=60.0, help="Seconds between batching reports.")
+
+    def handle(self, *args, **options):
+        engine = RecognitionEngine(**engine_options())
+        if not engine.model_available:
+            raise CommandError(f"YOLO model not found at {engine.model_path}.")
+        timings = engine.warm_up()
+        self.stdout.write(f"✅ Recognition engine ready: {timings}")
+
+        server = InferenceServer(
+            engine, options["address"], max_batch=options["max_batch"], max_wait=options["max_wait_ms"] / 1000
+        )
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            stop.set()
+            server.shutdown()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        def report():
+            while not stop.wait(options["stats_interval"]):
+                self.stdout.write(f"⏱️  {server.stats()['server']}")
+
+        threading.Thread(target=report, name="inference-stats", daemon=True).start()
+        self.stdout.write(
+            f"🚗 Serving recognition on {options['address']} "
+            f"(batches of up to {options['max_batch']}, {options['max_wait_ms']}ms wait). Ctrl+C to stop."
+        )
+        server.serve_forever()
+        self.stdout.write(f"✅ Stopped: {server.stats()['server']}")
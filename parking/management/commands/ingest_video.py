@@ -0,0 +1,137 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from parking import ingest
+from parking.events import get_event_client
+
+# Each worker process loads its own YOLO and EasyOCR models, so the default
+# stays small; raise --workers only as far as RAM/VRAM allow.
+DEFAULT_WORKERS = 2
+
+
+class Command(BaseCommand):
+    help = "Extract timestamped plate events from recorded video files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Video files to ingest.")
+        parser.add_argument(
+            "--sample",
+            choices=ingest.SAMPLING_MODES,
+            default="every",
+            help="every: every Nth frame; keyframes: seek --interval seconds at a time; "
+            "motion: every Nth frame where something moved.",
+        )
+        parser.add_argument("--every", type=int, default=5, help="Keep every Nth frame (every/motion).")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between frames (keyframes).")
+        parser.add_argument("--segment", type=float, default=60.0, help="Seconds of video per worker task.")
+        parser.add_argument("--overlap", type=float, default=2.0, help="Seconds each segment overlaps the next.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=0,
+            help=f"Worker processes, each with its own models (default: {DEFAULT_WORKERS}, 1 runs in-process).",
+        )
+        parser.add_argument("--min-conf", type=float, default=0.5, help="Minimum YOLO confidence for a plate box.")
+        parser.add_argument("--min-reads", type=int, default=2, help="OCR reads a plate track needs.")
+        parser.add_argument(
+            "--cooldown", type=float, default=30.0, help="Seconds of video before the same plate is reported again."
+        )
+        parser.add_argument(
+            "--start-time",
+            help="Wall-clock time the recording started (ISO 8601). Defaults to the file's modification "
+            "time minus its duration.",
+        )
+        parser.add_argument("--lane", help="Lane name for logged events (default: the file name).")
+        parser.add_argument("--log", action="store_true", help="Log plate events to the parking backend.")
+        parser.add_argument("--output", help="Also append events to this JSON-lines file.")
+
+    def handle(self, *args, **options):
+        workers = options["workers"] or min(DEFAULT_WORKERS, os.cpu_count() or 1)
+        pool = None
+        if workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            pool = ProcessPoolExecutor(workers, initializer=ingest.init_worker, initargs=(threads,))
+        try:
+            for path in options["paths"]:
+                self.ingest(path, pool, options)
+        finally:
+            if pool:
+                pool.shutdown()
+            if options["log"]:
+                get_event_client().close()
+
+    def ingest(self, path, pool, options):
+        try:
+            info = ingest.probe(path)
+        except ValueError as e:
+            raise CommandError(str(e))
+        started_at = self.recording_start(path, info, options["start_time"])
+
+        step = options["interval"] if options["sample"] == "keyframes" else options["every"] / info.fps
+        segment_options = {
+            "mode": options["sample"],
+            "every": options["every"],
+            "interval": options["interval"],
+            "min_conf": options["min_conf"],
+            "min_reads": options["min_reads"],
+            "cooldown": options["cooldown"],
+            # Tracks must survive the gap between two sampled frames.
+            "max_age": max(2.0, 3 * step),
+            "roi": settings.MOTION_GATE_ROI,
+            "threshold": settings.MOTION_GATE_THRESHOLD,
+            "min_area": settings.MOTION_GATE_MIN_AREA,
+        }
+        segments = ingest.plan_segments(info.duration, options["segment"], options["overlap"])
+        self.stdout.write(f"✅ {path}: {info.duration:.0f}s at {info.fps:.1f} fps in {len(segments)} segments")
+
+        start = time.perf_counter()
+        if pool:
+            futures = [pool.submit(ingest.process_segment, path, s, e, segment_options) for s, e in segments]
+            results = [future.result() for future in as_completed(futures)]
+        else:
+            results = [ingest.process_segment(path, s, e, segment_options) for s, e in segments]
+        elapsed = time.perf_counter() - start
+
+        events = ingest.deduplicate(
+            [event for result in results for event in result["events"]], options["cooldown"]
+        )
+        lane = options["lane"] or os.path.basename(path)
+        output = open(options["output"], "a") if options["output"] else None
+        try:
+            for event in events:
+                timestamp = started_at + timedelta(seconds=event["first_seen"])
+                self.stdout.write(
+                    f"🚗 {timezone.localtime(timestamp):%Y-%m-%d %H:%M:%S} {event['plate']} "
+                    f"({event['reads']} reads, {event['confidence']:.0%} agreement)"
+                )
+                if options["log"]:
+                    get_event_client().submit(event["plate"], lane=lane, timestamp=timestamp)
+                if output:
+                    output.write(json.dumps({**event, "lane": lane, "timestamp": timestamp.isoformat()}) + "\n")
+        finally:
+            if output:
+                output.close()
+
+        sampled = sum(result["sampled"] for result in results)
+        speed = info.duration / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"✅ {path}: {len(events)} plates from {sampled} sampled frames in {elapsed:.1f}s "
+            f"({speed:.1f}x real time)"
+        )
+
+    def recording_start(self, path, info, start_time):
+        if start_time:
+            started_at = parse_datetime(start_time)
+            if started_at is None:
+                raise CommandError(f"Invalid --start-time: {start_time}")
+            return timezone.make_aware(started_at) if timezone.is_naive(started_at) else started_at
+        modified = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.get_current_timezone())
+        return modified - timedelta(seconds=info.duration)
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from parking import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the analytics rollup tables and lot occupancy from EntryExitLog (for backfills or after manual edits)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per bulk insert.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = rollups.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(
+            f"✅ Rebuilt {counts['traffic_rows']} traffic rows and {counts['vehicle_rows']} vehicle rows "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
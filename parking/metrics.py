@@ -0,0 +1,149 @@
+import contextvars
+import logging
+import math
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The correlation ID of the frame or request being processed on this thread.
+correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+
+def new_correlation_id():
+    return uuid.uuid4().hex[:16]
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+class Histogram:
+    """A Prometheus histogram with labels, kept in process memory."""
+
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(key)} {value}" for key, value in sorted(values.items()))
+        return "\n".join(lines)
+
+
+STAGE_SECONDS = Histogram("smarttrack_stage_seconds", "Time spent in each capture, recognition and logging stage.")
+PLATE_EVENTS = Counter("smarttrack_plate_events_total", "Plate events applied by the backend.")
+OPEN_SESSION_CACHE = Counter("smarttrack_open_session_cache_total", "Open-session cache lookups by result (hit, miss, stale).")
+
+# Stages camera clients may report; traces are untrusted input, so anything
+# else is ignored rather than turned into a new label value.
+CLIENT_STAGES = ("capture", "frame_age", "gate", "inference", "detect", "ocr")
+
+_enabled = None
+
+
+def enabled():
+    global _enabled
+    if _enabled is None:
+        _enabled = getattr(settings, "METRICS_ENABLED", False)
+    return _enabled
+
+
+def observe(stage, seconds):
+    if enabled():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def count_events(action, amount=1):
+    if enabled() and amount:
+        PLATE_EVENTS.inc(amount, action=action)
+
+
+def count_cache(result):
+    if enabled():
+        OPEN_SESSION_CACHE.inc(result=result)
+
+
+@contextmanager
+def span(stage):
+    """Time the block into the ``stage`` histogram; a no-op unless metrics are enabled."""
+    if not enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        logger.debug("[%s] %s took %.2fms", correlation_id.get() or "-", stage, elapsed * 1000)
+
+
+def record_trace(trace):
+    """Fold stage timings measured by a camera client into the histograms.
+
+    ``trace`` maps stage names to seconds; they are recorded as
+    ``client_<stage>`` so they don't mix with the server's own stages.
+    """
+    if not enabled() or not isinstance(trace, dict):
+        return
+    for stage in CLIENT_STAGES:
+        seconds = trace.get(stage)
+        if isinstance(seconds, (int, float)) and seconds >= 0:
+            STAGE_SECONDS.observe(float(seconds), stage=f"client_{stage}")
+
+
+def render():
+    return "\n".join([STAGE_SECONDS.render(), PLATE_EVENTS.render(), OPEN_SESSION_CACHE.render()]) + "\n"
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:17
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    from parking import rollups
+
+    rollups.rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0005_remove_vehicle_vehicle_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrafficRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day'), ('all', 'All time')], max_length=4)),
+                ('period_start', models.DateTimeField()),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('exits', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.DurationField(default=datetime.timedelta)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'period_start'), name='unique_traffic_rollup_period')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VehicleRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('visits', models.PositiveIntegerField(default=0)),
+                ('completed_visits', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.DurationField(default=datetime.timedelta)),
+                ('first_visit', models.DateTimeField(blank=True, null=True)),
+                ('last_visit', models.DateTimeField(blank=True, null=True)),
+                ('vehicle', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup', to='parking.vehicle')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-visits'], name='vehicle_rollup_visits_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:17
+
+from django.db import migrations, models
+
+
+def count_open_logs(apps, schema_editor):
+    EntryExitLog = apps.get_model('parking', 'EntryExitLog')
+    LotOccupancy = apps.get_model('parking', 'LotOccupancy')
+    LotOccupancy.objects.update_or_create(pk=1, defaults={'parked': EntryExitLog.objects.filter(is_open=True).count()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0006_trafficrollup_vehiclerollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parked', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'lot occupancy',
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='entryexitlog',
+            name='unique_open_log_per_vehicle',
+        ),
+        migrations.AddIndex(
+            model_name='entryexitlog',
+            index=models.Index(fields=['vehicle', '-entry_time'], name='log_vehicle_entry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entryexitlog',
+            index=models.Index(fields=['entry_time'], name='log_entry_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entryexitlog',
+            index=models.Index(fields=['exit_time'], name='log_exit_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='entryexitlog',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_open', True)), fields=('vehicle',), name='unique_open_log_per_vehicle'),
+        ),
+        migrations.RunPython(count_open_logs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0007_open_log_partial_unique_lotoccupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Snapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plate', models.CharField(max_length=20)),
+                ('taken_at', models.DateTimeField()),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['plate', 'taken_at'], name='snapshot_plate_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:19
+
+import parking.models
+import parking.storage
+from django.db import migrations, models
+
+
+def move_log_images(apps, schema_editor):
+    # Log images used to live under MEDIA_ROOT; copy them into the snapshot
+    # storage so their names resolve against the new storage.
+    import os
+    from django.conf import settings
+    from django.core.files import File
+    from django.utils import timezone
+
+    EntryExitLog = apps.get_model('parking', 'EntryExitLog')
+    for log in EntryExitLog.objects.exclude(image='').exclude(image__isnull=True).select_related('vehicle'):
+        source = os.path.join(settings.MEDIA_ROOT, log.image.name)
+        if not os.path.exists(source):
+            continue
+        ext = os.path.splitext(source)[1] or '.jpg'
+        target = parking.storage.shard_path(log.vehicle.license_plate, timezone.localtime(log.entry_time), ext)
+        with open(source, 'rb') as f:
+            name = parking.storage.snapshot_storage.save(target, File(f))
+        EntryExitLog.objects.filter(pk=log.pk).update(image=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0008_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snapshot',
+            name='thumbnail',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='entryexitlog',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=parking.storage.get_snapshot_storage, upload_to=parking.models.entry_image_upload_path),
+        ),
+        migrations.RunPython(move_log_images, migrations.RunPython.noop),
+    ]
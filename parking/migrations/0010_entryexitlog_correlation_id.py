@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0009_snapshot_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entryexitlog',
+            name='correlation_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='entryexitlog',
+            name='exit_correlation_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -1,7 +1,11 @@
+from datetime import timedelta
 from django.db import models
 from django.utils import timezone
 import os
 import re
+import uuid
+
+from .storage import get_snapshot_storage, shard_path, snapshot_storage, thumbnail_storage
 
 
 class Vehicle(models.Model):
@@ -24,21 +28,33 @@ class Vehicle(models.Model):
 
 def entry_image_upload_path(instance, filename):
     plate = instance.vehicle.license_plate.replace(' ', '').replace('-', '')
-    entry_time = instance.entry_time.strftime('%Y%m%d_%H%M%S') if instance.entry_time else timezone.now().strftime('%Y%m%d_%H%M%S')
+    entry_time = timezone.localtime(instance.entry_time or timezone.now())
     ext = os.path.splitext(filename)[1] or '.jpg'
-    return f'entries/{plate}_{entry_time}{ext}'
+    return shard_path(plate, entry_time, ext)
 
 
 class EntryExitLog(models.Model):
     vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE)
     entry_time = models.DateTimeField(default=timezone.now)
     exit_time = models.DateTimeField(blank=True, null=True)
-    image = models.ImageField(upload_to=entry_image_upload_path, blank=True, null=True)
+    image = models.ImageField(upload_to=entry_image_upload_path, storage=get_snapshot_storage, blank=True, null=True)
     is_open = models.BooleanField(default=True)
+    # IDs of the frames or requests that produced the entry and exit, for
+    # tracing an event from camera capture to this row.
+    correlation_id = models.CharField(max_length=64, blank=True, default="")
+    exit_correlation_id = models.CharField(max_length=64, blank=True, default="")
 
     class Meta:
         constraints = [
-            models.UniqueConstraint(fields=["vehicle", "is_open"], name="unique_open_log_per_vehicle")
+            # At most one open session per vehicle; closed logs are unrestricted.
+            models.UniqueConstraint(
+                fields=["vehicle"], condition=models.Q(is_open=True), name="unique_open_log_per_vehicle"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["vehicle", "-entry_time"], name="log_vehicle_entry_idx"),
+            models.Index(fields=["entry_time"], name="log_entry_time_idx"),
+            models.Index(fields=["exit_time"], name="log_exit_time_idx"),
         ]
 
     def duration(self):
@@ -62,3 +78,145 @@ class ParkingLog(models.Model):
             hours = duration.total_seconds() / 3600
             return int(hours * 50)
         return 0
+
+
+class TrafficRollup(models.Model):
+    """Entry/exit counts per hour, per day and for all time.
+
+    Kept up to date by ``parking.rollups`` on every logged entry and exit so
+    the analytics page never has to aggregate ``EntryExitLog``. Exits and
+    their durations are counted in the period the vehicle left.
+    """
+
+    HOUR = "hour"
+    DAY = "day"
+    ALL = "all"
+    PERIOD_CHOICES = [(HOUR, "Hour"), (DAY, "Day"), (ALL, "All time")]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    period_start = models.DateTimeField()
+    entries = models.PositiveIntegerField(default=0)
+    exits = models.PositiveIntegerField(default=0)
+    total_duration = models.DurationField(default=timedelta)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "period_start"], name="unique_traffic_rollup_period")
+        ]
+
+    def average_duration(self):
+        if self.exits:
+            return self.total_duration / self.exits
+        return None
+
+    def __str__(self):
+        return f"{self.period} {self.period_start:%Y-%m-%d %H:%M}"
+
+
+class VehicleRollup(models.Model):
+    vehicle = models.OneToOneField(Vehicle, on_delete=models.CASCADE, related_name="rollup")
+    visits = models.PositiveIntegerField(default=0)
+    completed_visits = models.PositiveIntegerField(default=0)
+    total_duration = models.DurationField(default=timedelta)
+    first_visit = models.DateTimeField(null=True, blank=True)
+    last_visit = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["-visits"], name="vehicle_rollup_visits_idx")]
+
+    def average_duration(self):
+        if self.completed_visits:
+            return self.total_duration / self.completed_visits
+        return None
+
+    def __str__(self):
+        return f"{self.vehicle.license_plate}: {self.visits} visits"
+
+
+class LotOccupancy(models.Model):
+    """Single-row count of vehicles currently inside.
+
+    Adjusted in the same transaction as every entry and exit, so reading it is
+    one primary-key lookup instead of counting open logs.
+    """
+
+    parked = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "lot occupancy"
+
+    @classmethod
+    def current(cls):
+        row = cls.objects.filter(pk=1).values_list("parked", flat=True).first()
+        return row or 0
+
+    def __str__(self):
+        return f"{self.parked} parked"
+
+
+class Snapshot(models.Model):
+    """A camera image in the snapshot storage, indexed by plate and capture time.
+
+    Filled in by whatever writes the image (``stream.py``, ``plateLogger.py``,
+    ``upload_image``) and backfilled with ``manage.py index_snapshots``, so the
+    admin can look images up by range query instead of listing the directory.
+    ``thumbnail`` is set once the background thumbnail has been written.
+    """
+
+    plate = models.CharField(max_length=20)
+    taken_at = models.DateTimeField()
+    name = models.CharField(max_length=255, unique=True)
+    thumbnail = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["plate", "taken_at"], name="snapshot_plate_time_idx")]
+
+    @property
+    def url(self):
+        return snapshot_storage.url(self.name)
+
+    @property
+    def thumbnail_url(self):
+        return thumbnail_storage.url(self.thumbnail) if self.thumbnail else self.url
+
+    def __str__(self):
+        return self.name
+
+
+class UploadJob(models.Model):
+    """Images or clips from ``upload_image`` waiting for, or done with, recognition.
+
+    The files are spooled to ``UPLOAD_JOB_SPOOL_DIR`` and processed by the
+    worker pool in ``parking.jobs``; the upload page polls the row for
+    progress. ``plates`` holds one ``{plate_number, mode, image_path}`` dict
+    per logged plate. ``owner`` is the server process holding the job and
+    ``heartbeat_at`` its lease, renewed while that process is alive.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=QUEUED)
+    files = models.JSONField(default=list)
+    output = models.TextField(blank=True)
+    plates = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    owner = models.CharField(max_length=64, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"], name="upload_job_status_idx")]
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
@@ -0,0 +1,183 @@
+import re
+
+import numpy as np
+
+BACKENDS = ("easyocr", "recognizer")
+
+ALPHANUMERIC = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+# Characters OCR confuses with one another, keyed by what was read.
+AS_DIGIT = {"O": "0", "Q": "0", "D": "0", "I": "1", "L": "1", "Z": "2", "A": "4", "S": "5", "G": "6", "T": "7", "B": "8"}
+AS_LETTER = {"0": "O", "1": "I", "2": "Z", "4": "A", "5": "S", "6": "G", "7": "T", "8": "B"}
+
+
+def clean_plate_text(text):
+    return re.sub(r"[^A-Z0-9]", "", text.upper())
+
+
+class PlateGrammar:
+    """Snaps OCR output onto the nearest valid plate format.
+
+    Formats are templates in which ``L`` is a letter, ``D`` a digit and any
+    other character a literal, e.g. ``"LLLDDDD"``. A read is tried against
+    every format of its length, swapping look-alike characters (``0``/``O``,
+    ``1``/``I``, ``8``/``B``, ...) where the format wants the other kind; the
+    format needing the fewest swaps wins. Reads that fit no format are
+    returned unchanged.
+    """
+
+    def __init__(self, formats):
+        self.formats = [f.upper() for f in formats]
+
+    def fit(self, text, fmt):
+        """Return ``(plate, swaps)`` for ``text`` read as ``fmt``, or ``None``."""
+        if len(text) != len(fmt):
+            return None
+        chars = []
+        swaps = 0
+        for char, slot in zip(text, fmt):
+            if slot == "L":
+                if char.isalpha():
+                    chars.append(char)
+                elif char in AS_LETTER:
+                    chars.append(AS_LETTER[char])
+                    swaps += 1
+                else:
+                    return None
+            elif slot == "D":
+                if char.isdigit():
+                    chars.append(char)
+                elif char in AS_DIGIT:
+                    chars.append(AS_DIGIT[char])
+                    swaps += 1
+                else:
+                    return None
+            elif char == slot:
+                chars.append(char)
+            else:
+                return None
+        return "".join(chars), swaps
+
+    def decode(self, text):
+        fits = [fit for fit in (self.fit(text, fmt) for fmt in self.formats) if fit is not None]
+        if not fits:
+            return text
+        return min(fits, key=lambda fit: fit[1])[0]
+
+    def matches(self, text):
+        return any(self.fit(text, fmt) == (text, 0) for fmt in self.formats)
+
+
+class PlateReader:
+    """Base for OCR backends: ``read`` one crop or ``read_batch`` many, each
+    returning ``(text, confidence)`` with ``("", 0.0)`` for no text."""
+
+    def __init__(self, grammar=None):
+        self.grammar = grammar
+
+    def read(self, crop):
+        raise NotImplementedError
+
+    def read_batch(self, crops):
+        return [self.read(crop) for crop in crops]
+
+    def _result(self, text, conf):
+        if self.grammar is not None:
+            text = self.grammar.decode(clean_plate_text(text))
+        return text, float(conf)
+
+
+class EasyOcrReader(PlateReader):
+    """EasyOCR's full pipeline: CRAFT text detection, then recognition of each region."""
+
+    def __init__(self, languages=("en",), grammar=None, width=256, height=64):
+        import easyocr
+
+        super().__init__(grammar)
+        self.reader = easyocr.Reader(list(languages))
+        self.width = width
+        self.height = height
+
+    def read(self, crop):
+        result = self.reader.readtext(crop)
+        return self._result(result[0][1], result[0][2]) if result else ("", 0.0)
+
+    def read_batch(self, crops):
+        """``readtext_batched`` needs equally sized inputs, so every crop is
+        scaled to fit ``width`` x ``height`` with its aspect ratio kept and
+        padded out with its own edge pixels; stretching square or two-line
+        plates to the box would distort the characters."""
+        if not crops:
+            return []
+        results = self.reader.readtext_batched(
+            [self._fit(crop) for crop in crops], n_width=self.width, n_height=self.height, batch_size=len(crops)
+        )
+        return [self._result(r[0][1], r[0][2]) if r else ("", 0.0) for r in results]
+
+    def _fit(self, crop):
+        import cv2
+
+        height, width = crop.shape[:2]
+        scale = min(self.height / max(1, height), self.width / max(1, width))
+        resized = cv2.resize(crop, (max(1, round(width * scale)), max(1, round(height * scale))))
+        pad_y = self.height - resized.shape[0]
+        pad_x = self.width - resized.shape[1]
+        return cv2.copyMakeBorder(
+            resized, pad_y // 2, pad_y - pad_y // 2, pad_x // 2, pad_x - pad_x // 2, cv2.BORDER_REPLICATE
+        )
+
+
+class RecognizerReader(PlateReader):
+    """EasyOCR's recognizer alone.
+
+    YOLO crops are already tight around the plate, so the text detector is
+    never loaded and each crop is read as a single line, restricted to plate
+    characters. Batches are stacked into one image, one crop per row, and
+    recognized in a single call.
+    """
+
+    def __init__(self, languages=("en",), grammar=None, height=64):
+        import easyocr
+
+        super().__init__(grammar)
+        self.reader = easyocr.Reader(list(languages), detector=False)
+        self.height = height
+
+    def read(self, crop):
+        return self.read_batch([crop])[0]
+
+    def read_batch(self, crops):
+        import cv2
+
+        if not crops:
+            return []
+        lines = []
+        for crop in crops:
+            grey = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            width = max(1, round(grey.shape[1] * self.height / max(1, grey.shape[0])))
+            lines.append(cv2.resize(grey, (width, self.height)))
+
+        canvas = np.zeros((self.height * len(lines), max(line.shape[1] for line in lines)), dtype=np.uint8)
+        boxes = []
+        for i, line in enumerate(lines):
+            top = i * self.height
+            canvas[top:top + self.height, :line.shape[1]] = line
+            boxes.append([0, line.shape[1], top, top + self.height])
+
+        results = self.reader.recognize(
+            canvas, horizontal_list=boxes, free_list=[], allowlist=ALPHANUMERIC, batch_size=len(boxes)
+        )
+        texts = [("", 0.0)] * len(crops)
+        for box, text, conf in results:
+            texts[int(box[0][1]) // self.height] = self._result(text, conf)
+        return texts
+
+
+READERS = {"easyocr": EasyOcrReader, "recognizer": RecognizerReader}
+
+
+def load_reader(backend, languages=("en",), plate_formats=()):
+    if backend not in READERS:
+        raise ValueError(f"Unknown OCR backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    grammar = PlateGrammar(plate_formats) if plate_formats else None
+    return READERS[backend](languages, grammar=grammar)
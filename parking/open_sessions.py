@@ -0,0 +1,153 @@
+"""Cache of plate -> (vehicle_id, open_log_id, entry_time) for ``log_plate``.
+
+Entries are written through by ``parking.services`` once the transaction
+that changed them commits, so the usual entry/exit toggle needs no reads:
+an exit is one conditional UPDATE of the cached open log, an entry one
+INSERT. Both double as verification (the UPDATE matches no row, or the
+insert trips the one-open-log-per-vehicle constraint, if the cache was
+stale), in which case the caller falls back to the database path and
+re-caches what it finds. ``open_log_id`` is ``None`` for a known vehicle
+that is not parked.
+
+The backend is the ``OPEN_SESSION_CACHE`` cache alias; locmem keeps one copy
+per process, a shared backend (file, Redis, Memcached) one per machine.
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "parking:open-session:"
+
+_warmed = False
+_warm_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, "OPEN_SESSION_CACHE_ENABLED", False)
+
+
+def _cache():
+    return caches[getattr(settings, "OPEN_SESSION_CACHE", "default")]
+
+
+def _key(plate):
+    return KEY_PREFIX + plate
+
+
+def get(plate):
+    """The cached ``(vehicle_id, open_log_id, entry_time)`` for ``plate``, or ``None``."""
+    if not enabled():
+        return None
+    ensure_warm()
+    session = _cache().get(_key(plate))
+    metrics.count_cache("hit" if session is not None else "miss")
+    return session
+
+
+def remember(plate, vehicle_id, log_id=None, entry_time=None):
+    if enabled():
+        _cache().set(_key(plate), (vehicle_id, log_id, entry_time), None)
+
+
+def remember_many(sessions):
+    """Cache ``{plate: (vehicle_id, log_id, entry_time)}``; a ``None`` session forgets the plate."""
+    if not enabled():
+        return
+    cache = _cache()
+    cache.set_many({_key(plate): session for plate, session in sessions.items() if session is not None}, None)
+    cache.delete_many([_key(plate) for plate, session in sessions.items() if session is None])
+
+
+def forget(plate):
+    if enabled():
+        _cache().delete(_key(plate))
+
+
+def open_sessions():
+    """Yield ``(plate, vehicle_id, log_id, entry_time)`` for every open log in the database."""
+    from .models import EntryExitLog
+
+    return (
+        EntryExitLog.objects.filter(is_open=True)
+        .values_list("vehicle__license_plate", "vehicle_id", "id", "entry_time")
+        .iterator(chunk_size=2000)
+    )
+
+
+def warm_up(batch_size=1000):
+    """Load every open session into the cache; returns how many were cached."""
+    cache = _cache()
+    count = 0
+    batch = {}
+    for plate, vehicle_id, log_id, entry_time in open_sessions():
+        batch[_key(plate)] = (vehicle_id, log_id, entry_time)
+        if len(batch) >= batch_size:
+            cache.set_many(batch, None)
+            count += len(batch)
+            batch = {}
+    cache.set_many(batch, None)
+    count += len(batch)
+    logger.info("Cached %d open sessions", count)
+    return count
+
+
+def ensure_warm():
+    """Warm the cache once per process, on first use."""
+    global _warmed
+    if _warmed or not getattr(settings, "OPEN_SESSION_CACHE_WARMUP", True):
+        return
+    with _warm_lock:
+        if not _warmed:
+            _warmed = True
+            try:
+                warm_up()
+            except Exception as e:
+                logger.warning("Open-session cache warm-up failed: %s", e)
+
+
+def check(fix=False, batch_size=1000):
+    """Compare the cache with the database for every vehicle.
+
+    Returns ``{"checked", "cached", "stale"}`` plus up to 20 ``examples`` of
+    stale plates. Missing entries are not errors (they are filled on the next
+    miss); entries that disagree with the database are. With ``fix``, stale
+    entries are deleted.
+    """
+    from .models import Vehicle
+
+    cache = _cache()
+    open_logs = {plate: (vehicle_id, log_id, entry_time) for plate, vehicle_id, log_id, entry_time in open_sessions()}
+    report = {"checked": 0, "cached": 0, "stale": 0, "examples": []}
+
+    def compare(vehicles):
+        cached = cache.get_many([_key(plate) for plate, _ in vehicles])
+        for plate, vehicle_id in vehicles:
+            report["checked"] += 1
+            session = cached.get(_key(plate))
+            if session is None:
+                continue
+            report["cached"] += 1
+            expected = open_logs.get(plate, (vehicle_id, None, None))
+            if tuple(session) == expected:
+                continue
+            report["stale"] += 1
+            if len(report["examples"]) < 20:
+                report["examples"].append({"plate": plate, "cached": list(session), "database": list(expected)})
+            if fix:
+                cache.delete(_key(plate))
+
+    batch = []
+    for row in Vehicle.objects.values_list("license_plate", "id").iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            compare(batch)
+            batch = []
+    compare(batch)
+    return report
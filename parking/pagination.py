@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+
+def estimated_count(model, using="default"):
+    """A cheap row-count estimate for ``model``'s table.
+
+    PostgreSQL and MySQL keep one in their catalogs, and SQLite in
+    ``sqlite_stat1`` once ``ANALYZE`` (or ``PRAGMA optimize``) has run.
+    Failing that, the largest primary key is read off the primary-key index;
+    it overcounts by every deleted row, so ``EstimatedCountPaginator``
+    counts exactly on the last page.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+            row = cursor.fetchone()
+            if row and row[0] is not None:
+                return row[0]
+        elif connection.vendor == "sqlite":
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                # Each index's stat starts with the table's row count.
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+                counts = [int(stat.split()[0]) for (stat,) in cursor.fetchall() if stat and stat.split()[0].isdigit()]
+                if counts:
+                    return max(counts)
+    return model._default_manager.using(using).aggregate(n=Max("pk"))["n"] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Pages an unfiltered queryset using ``estimated_count`` instead of ``COUNT(*)``.
+
+    Filtered querysets, and tables estimated below
+    ``ADMIN_ESTIMATED_COUNT_THRESHOLD`` rows, are still counted exactly, and
+    so is the last page, where an estimate that is off either way would show
+    missing rows or empty pages.
+    """
+
+    estimated = False
+    corrected = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, "query", None) is not None and not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate >= getattr(settings, "ADMIN_ESTIMATED_COUNT_THRESHOLD", 100_000):
+                self.estimated = True
+                return estimate
+        return super().count
+
+    def validate_number(self, number):
+        if self.estimated:
+            try:
+                last = int(number) >= self.num_pages
+            except (TypeError, ValueError):
+                last = False
+            if last:
+                self.__dict__["count"] = Paginator.count.func(self)
+                self.__dict__.pop("num_pages", None)
+                self.estimated = False
+                self.corrected = True
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Page links were numbered from the estimate; past the real end is the last page.
+            if self.corrected and int(number) > self.num_pages:
+                return self.num_pages
+            raise
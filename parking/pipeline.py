@@ -0,0 +1,263 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+FramePacket = namedtuple("FramePacket", ["seq", "captured_at", "frame", "correlation_id"])
+InferenceResult = namedtuple("InferenceResult", ["packet", "result", "finished_at"])
+
+
+def put_latest(q, item):
+    """Put ``item`` on a bounded queue, discarding the oldest entries if full.
+
+    Returns how many stale items were dropped to make room.
+    """
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+def drain_latest(q):
+    """Empty ``q`` and return the newest item, or ``None`` if it was empty."""
+    item = None
+    while True:
+        try:
+            item = q.get_nowait()
+        except queue.Empty:
+            return item
+
+
+class StageTimer:
+    """Thread-safe latency counter for one pipeline stage.
+
+    With a ``name``, every sample also goes to the ``parking.metrics``
+    histogram for that stage.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+        self.started = time.monotonic()
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.last = seconds
+            self.max = max(self.max, seconds)
+        if self.name:
+            metrics.observe(self.name, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                "count": self.count,
+                "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+                "last_ms": round(self.last * 1000, 2),
+                "max_ms": round(self.max * 1000, 2),
+                "fps": round(self.count / elapsed, 2) if elapsed else 0.0,
+            }
+
+
+def parse_source(source):
+    """Camera indices arrive as strings from the command line; keep URLs and paths as-is."""
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+class VideoSource:
+    """``cv2.VideoCapture`` wrapper for device indices, stream URLs and video files.
+
+    Live sources are reopened after ``reconnect_after`` consecutive failed
+    reads; a video file is marked ``exhausted`` once it runs out of frames so
+    the pipeline reading it can stop.
+    """
+
+    def __init__(self, source, reconnect_after=25):
+        import cv2
+
+        self._cv2 = cv2
+        self.source = parse_source(source)
+        self.is_file = isinstance(self.source, str) and "://" not in self.source
+        self.reconnect_after = reconnect_after
+        self.exhausted = False
+        self._failures = 0
+        self._capture = self._open()
+
+    def _open(self):
+        capture = self._cv2.VideoCapture(self.source)
+        if not self.is_file:
+            capture.set(self._cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+
+    @property
+    def fps(self):
+        return self._capture.get(self._cv2.CAP_PROP_FPS) or 0.0
+
+    def read(self, out=None):
+        """Read the next frame, decoding into ``out`` when it has the frame's shape."""
+        ok, frame = self._capture.read() if out is None else self._capture.read(out)
+        if ok:
+            self._failures = 0
+            return ok, frame
+        if self.is_file:
+            self.exhausted = True
+            return False, None
+        self._failures += 1
+        if self._failures >= self.reconnect_after:
+            logger.warning("Reconnecting to %s", self.source)
+            self._capture.release()
+            self._capture = self._open()
+            self._failures = 0
+        return False, None
+
+    def release(self):
+        self._capture.release()
+
+
+def _throttle(started, fps):
+    if fps:
+        remaining = 1.0 / fps - (time.perf_counter() - started)
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+class FramePipeline:
+    """Capture thread -> inference thread -> consumer, joined by bounded queues.
+
+    The capture thread reads as fast as the camera (or ``target_fps``) allows
+    and always offers the newest frame to both the display queue and the
+    inference queue; whichever side is slower simply skips stale frames
+    instead of letting them pile up. ``recognize`` is called on the inference
+    thread with a frame and its return value is published as the latest
+    result. An optional ``gate`` (see ``parking.gating.MotionGate``) is
+    consulted first so idle frames never reach the models. ``last_packet`` and
+    ``last_result`` keep the newest of each for readers that must not drain
+    the queues.
+    """
+
+    def __init__(
+        self, capture, recognize, target_fps=0, inference_fps=0, queue_size=1, name="stream", display=True, gate=None
+    ):
+        self.capture = capture
+        self.recognize = recognize
+        self.gate = gate
+        self.target_fps = target_fps
+        self.inference_fps = inference_fps
+        self.name = name
+        self.display = display
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.results = queue.Queue(maxsize=queue_size)
+        self.timers = {
+            stage: StageTimer(stage) for stage in ("capture", "inference", "frame_age", "gate", "display")
+        }
+        self.dropped = {"display": 0, "inference": 0}
+        self.last_packet = None
+        self.last_result = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for target, suffix in ((self._capture_loop, "capture"), (self._inference_loop, "inference")):
+            thread = threading.Thread(target=target, name=f"{self.name}-{suffix}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.capture.release()
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    def _capture_loop(self):
+        # Frames are tagged "<run>-<seq>" so an event can be traced back to
+        # the frame it was read from.
+        run_id = uuid.uuid4().hex[:8]
+        seq = 0
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            ok, frame = self.capture.read()
+            if not ok:
+                if getattr(self.capture, "exhausted", False):
+                    logger.info("%s: source finished", self.name)
+                    self._stop.set()
+                    break
+                time.sleep(0.05)
+                continue
+            seq += 1
+            # Sources capturing in another process report when the frame was taken.
+            captured_at = getattr(self.capture, "last_captured_at", None) or time.monotonic()
+            packet = FramePacket(seq, captured_at, frame, f"{run_id}-{seq}")
+            self.last_packet = packet
+            if self.display:
+                self.dropped["display"] += put_latest(self.frames, packet)
+            self.dropped["inference"] += put_latest(self.jobs, packet)
+            self.timers["capture"].record(time.perf_counter() - started)
+            _throttle(started, self.target_fps)
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            try:
+                packet = self.jobs.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            started = time.perf_counter()
+            self.timers["frame_age"].record(time.monotonic() - packet.captured_at)
+            if self.gate is not None:
+                passed = self.gate.check(packet.frame)
+                self.timers["gate"].record(time.perf_counter() - started)
+                if not passed:
+                    continue
+            metrics.correlation_id.set(packet.correlation_id)
+            try:
+                result = self.recognize(packet.frame)
+            except Exception as e:
+                logger.warning("%s: recognition failed: %s", self.name, e)
+                result = None
+            self.timers["inference"].record(time.perf_counter() - started)
+            self.last_result = InferenceResult(packet, result, time.monotonic())
+            put_latest(self.results, self.last_result)
+            _throttle(started, self.inference_fps)
+
+    def latest_frame(self):
+        return drain_latest(self.frames)
+
+    def latest_result(self):
+        return drain_latest(self.results)
+
+    def trace(self):
+        """Latest per-stage timings, in seconds, to send along with an event."""
+        return {stage: self.timers[stage].last for stage in ("capture", "frame_age", "gate", "inference")}
+
+    def stats(self):
+        return {
+            "stages": {name: timer.snapshot() for name, timer in self.timers.items()},
+            "dropped": dict(self.dropped),
+            "gate": self.gate.stats() if self.gate is not None else None,
+        }
@@ -0,0 +1,352 @@
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import metrics
+from .detectors import exported_path, load_detector
+from .gating import OcrCache
+from .ocr import clean_plate_text, load_reader
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionEngine:
+    """Holds one YOLO detector and one OCR reader, loaded on first use.
+
+    Loading is guarded so concurrent requests in the same worker never load
+    the weights twice, and inference is serialized per engine because neither
+    model is safe to call from several threads at once. ``backend`` picks the
+    detector runtime (see ``parking.detectors``); ``model_path`` must point at
+    a model exported for it. ``ocr_backend`` and ``plate_formats`` pick the
+    OCR reader and the plate grammar its output is snapped to (see
+    ``parking.ocr``).
+    """
+
+    def __init__(
+        self,
+        model_path,
+        languages=("en",),
+        ocr_cache_size=0,
+        backend="torch",
+        imgsz=640,
+        threads=0,
+        ocr_backend="easyocr",
+        plate_formats=(),
+    ):
+        self.model_path = str(model_path)
+        self.backend = backend
+        self.imgsz = imgsz
+        self.threads = threads
+        self.ocr_backend = ocr_backend
+        self.plate_formats = list(plate_formats)
+        self.languages = list(languages)
+        self.ocr_cache = OcrCache(ocr_cache_size) if ocr_cache_size else None
+        self.timings = {}
+        self._model = None
+        self._reader = None
+        self._load_lock = threading.Lock()
+        self._infer_lock = threading.Lock()
+
+    @property
+    def model_available(self):
+        return os.path.exists(self.model_path)
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = load_detector(self.backend, self.model_path, self.imgsz, self.threads)
+                    self.timings["model_load"] = time.perf_counter() - start
+                    logger.info(
+                        "YOLO model (%s) loaded from %s in %.2fs", self.backend, self.model_path, self.timings["model_load"]
+                    )
+        return self._model
+
+    @property
+    def reader(self):
+        if self._reader is None:
+            with self._load_lock:
+                if self._reader is None:
+                    start = time.perf_counter()
+                    self._reader = load_reader(self.ocr_backend, self.languages, self.plate_formats)
+                    self.timings["reader_load"] = time.perf_counter() - start
+                    logger.info("OCR reader (%s) loaded in %.2fs", self.ocr_backend, self.timings["reader_load"])
+        return self._reader
+
+    def warm_up(self):
+        """Load both models and push a blank image through them once.
+
+        The first forward pass allocates buffers and picks kernels, so doing it
+        here keeps that cost off the first real request.
+        """
+        import numpy as np
+
+        blank = np.zeros((640, 640, 3), dtype=np.uint8)
+        start = time.perf_counter()
+        if self.model_available:
+            with self._infer_lock:
+                self.model.predict([blank])
+        with self._infer_lock:
+            self.reader.read(blank[:64, :256])
+        self.timings["warm_up"] = time.perf_counter() - start
+        logger.info("Recognition engine warmed up in %.2fs", self.timings["warm_up"])
+        return dict(self.timings)
+
+    def detect(self, image, min_conf=0.0):
+        """Return plate boxes as ``(x1, y1, x2, y2, conf)`` tuples."""
+        start = time.perf_counter()
+        with self._infer_lock:
+            boxes = self.model.predict([image])[0]
+        self.timings["last_detect"] = time.perf_counter() - start
+        metrics.observe("detect", self.timings["last_detect"])
+        return [box for box in boxes if box[4] >= min_conf]
+
+    def read_text(self, crop):
+        """Return ``(raw_text, confidence)`` for the first OCR hit, or ``("", 0.0)``.
+
+        With an OCR cache, a crop that matches one read recently reuses that
+        result instead of running OCR again.
+        """
+        key = None
+        if self.ocr_cache is not None and crop.size:
+            key = self.ocr_cache.key(crop)
+            cached = self.ocr_cache.get(key)
+            if cached is not None:
+                return cached
+
+        start = time.perf_counter()
+        with self._infer_lock:
+            result = self.reader.read(crop)
+        self.timings["last_ocr"] = time.perf_counter() - start
+        metrics.observe("ocr", self.timings["last_ocr"])
+        if key is not None:
+            self.ocr_cache.put(key, result)
+        return result
+
+    def recognize(self, image, min_conf=0.0):
+        """Return ``(plate, box)`` for the first box that reads as a plate."""
+        for box in self.detect(image, min_conf=min_conf):
+            x1, y1, x2, y2, _ = box
+            text, _ = self.read_text(image[y1:y2, x1:x2])
+            plate = clean_plate_text(text)
+            if plate:
+                return plate, box
+        return "", None
+
+    def detect_batch(self, images, min_conf=0.0):
+        """Run YOLO over ``images`` in one call; returns a box list per image."""
+        if not images:
+            return []
+        start = time.perf_counter()
+        with self._infer_lock:
+            results = self.model.predict(images)
+        self.timings["last_detect_batch"] = time.perf_counter() - start
+        metrics.observe("detect_batch", self.timings["last_detect_batch"])
+        return [[box for box in boxes if box[4] >= min_conf] for boxes in results]
+
+    def read_text_batch(self, crops):
+        """OCR many crops in one reader call; returns ``(text, confidence)`` per crop.
+
+        Crops found in the OCR cache are answered from it and left out of the call.
+        """
+        crops = list(crops)
+        results = [None] * len(crops)
+        keys = [None] * len(crops)
+        if self.ocr_cache is not None:
+            for i, crop in enumerate(crops):
+                if crop.size:
+                    keys[i] = self.ocr_cache.key(crop)
+                    results[i] = self.ocr_cache.get(keys[i])
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+
+        start = time.perf_counter()
+        with self._infer_lock:
+            texts = self.reader.read_batch([crops[i] for i in missing])
+        self.timings["last_ocr_batch"] = time.perf_counter() - start
+        metrics.observe("ocr_batch", self.timings["last_ocr_batch"])
+        for i, text in zip(missing, texts):
+            results[i] = text
+            if keys[i] is not None:
+                self.ocr_cache.put(keys[i], text)
+        return results
+
+    def recognize_batch(self, images, min_conf=0.0, batch_size=16):
+        """Yield one result dict per image, in input order.
+
+        Images are processed ``batch_size`` at a time: one YOLO call per chunk,
+        then one OCR call over every plate crop found in that chunk.
+        """
+        start = time.perf_counter()
+        count = 0
+        chunk = []
+        for image in images:
+            chunk.append(image)
+            if len(chunk) == batch_size:
+                yield from self._recognize_chunk(chunk, count, min_conf)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            yield from self._recognize_chunk(chunk, count, min_conf)
+            count += len(chunk)
+
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0.0
+        self.timings["last_batch_rate"] = rate
+        logger.info("Recognized %d images in %.2fs (%.1f images/sec)", count, elapsed, rate)
+
+    def _recognize_chunk(self, images, offset, min_conf):
+        crops = []
+        owners = []
+        batch_boxes = self.detect_batch(images, min_conf=min_conf)
+        for i, (image, boxes) in enumerate(zip(images, batch_boxes)):
+            for box in boxes:
+                x1, y1, x2, y2, _ = box
+                crop = image[y1:y2, x1:x2]
+                if crop.size:
+                    crops.append(crop)
+                    owners.append((i, box))
+
+        reads = [[] for _ in images]
+        for (i, box), (text, conf) in zip(owners, self.read_text_batch(crops)):
+            reads[i].append((box, text, conf))
+
+        for i, image_reads in enumerate(reads):
+            plate, plate_box, candidates = "", None, []
+            for box, text, conf in image_reads:
+                cleaned = clean_plate_text(text)
+                candidates.append({"box": list(box[:4]), "det_conf": box[4], "text": cleaned, "ocr_conf": conf})
+                if cleaned and not plate:
+                    plate, plate_box = cleaned, box
+            yield {
+                "index": offset + i,
+                "plate": plate,
+                "box": list(plate_box[:4]) if plate_box else None,
+                "candidates": candidates,
+            }
+
+    def stats(self):
+        return {
+            "model_path": self.model_path,
+            "backend": self.backend,
+            "ocr_backend": self.ocr_backend,
+            "model_loaded": self._model is not None,
+            "reader_loaded": self._reader is not None,
+            "timings": dict(self.timings),
+            "ocr_cache": self.ocr_cache.stats() if self.ocr_cache is not None else None,
+        }
+
+
+class EnginePool:
+    """A fixed set of engines shared by several lanes.
+
+    Each engine serializes its own inference, so running one per core lets
+    that many frames be recognized in parallel; a lane borrows whichever
+    engine is idle. The engines may also be ``RemoteEngine`` clients of one
+    inference server, which then batches the lanes' frames together.
+    """
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self._idle = queue.Queue()
+        for engine in self.engines:
+            self._idle.put(engine)
+
+    @property
+    def model_available(self):
+        return self.engines[0].model_available
+
+    @contextmanager
+    def engine(self):
+        engine = self._idle.get()
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def warm_up(self):
+        return [engine.warm_up() for engine in self.engines]
+
+    def stats(self):
+        stats = {"size": len(self.engines), "idle": self._idle.qsize()}
+        caches = [engine.ocr_cache.stats() for engine in self.engines if engine.ocr_cache is not None]
+        if caches:
+            hits = sum(c["hits"] for c in caches)
+            lookups = hits + sum(c["misses"] for c in caches)
+            stats["ocr_cache_hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        return stats
+
+
+def engine_options():
+    """``RecognitionEngine`` arguments from settings, with the detector backend
+    resolved to its exported model."""
+    backend = getattr(settings, "DETECTOR_BACKEND", "torch")
+    model_path = getattr(settings, "DETECTOR_MODEL_PATH", None) or exported_path(
+        getattr(settings, "PLATE_MODEL_PATH", os.path.join("runs", "detect", "train3", "weights", "best.pt")),
+        backend,
+        getattr(settings, "DETECTOR_INT8", False),
+    )
+    return {
+        "model_path": model_path,
+        "languages": getattr(settings, "PLATE_OCR_LANGUAGES", ["en"]),
+        "ocr_cache_size": getattr(settings, "OCR_CACHE_SIZE", 0),
+        "backend": backend,
+        "imgsz": getattr(settings, "DETECTOR_IMGSZ", 640),
+        "threads": getattr(settings, "DETECTOR_THREADS", 0),
+        "ocr_backend": getattr(settings, "OCR_BACKEND", "easyocr"),
+        "plate_formats": getattr(settings, "PLATE_FORMATS", []),
+    }
+
+
+def create_engine_pool(size):
+    address = getattr(settings, "INFERENCE_SERVER", "")
+    if address:
+        from .inference import RemoteEngine
+
+        return EnginePool(RemoteEngine(address) for _ in range(max(1, size)))
+    options = engine_options()
+    return EnginePool(RecognitionEngine(**options) for _ in range(max(1, size)))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide engine, creating it on first call.
+
+    With ``INFERENCE_SERVER`` set this is a ``RemoteEngine`` client of the
+    shared ``manage.py inference_server`` process and no models are loaded here.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                address = getattr(settings, "INFERENCE_SERVER", "")
+                if address:
+                    from .inference import RemoteEngine
+
+                    _engine = RemoteEngine(address)
+                else:
+                    _engine = RecognitionEngine(**engine_options())
+    return _engine
+
+
+def warm_up_in_background():
+    def _run():
+        try:
+            get_engine().warm_up()
+        except Exception as e:
+            logger.warning("Recognition warm-up failed: %s", e)
+
+    thread = threading.Thread(target=_run, name="recognition-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,160 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Min, Sum
+from django.db.models.functions import Coalesce, Greatest, Least, TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import EntryExitLog, LotOccupancy, TrafficRollup, VehicleRollup
+
+# period_start of the single all-time TrafficRollup row.
+ALL_TIME = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def period_starts(timestamp):
+    hour = timezone.localtime(timestamp).replace(minute=0, second=0, microsecond=0)
+    return [
+        (TrafficRollup.HOUR, hour),
+        (TrafficRollup.DAY, hour.replace(hour=0)),
+        (TrafficRollup.ALL, ALL_TIME),
+    ]
+
+
+def _increment(model, lookup, **changes):
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup)
+    except IntegrityError:
+        # Another writer created the row first; fall through to the update.
+        pass
+    model.objects.filter(**lookup).update(**changes)
+
+
+def record_activity(entries=(), exits=()):
+    """Fold new entries and exits into the rollup tables.
+
+    ``entries`` holds ``(vehicle_id, entry_time)`` and ``exits`` holds
+    ``(vehicle_id, entry_time, exit_time)``. Call this inside the transaction
+    that wrote the logs so the rollups commit or roll back with them. Deltas
+    are merged first, so a bulk call costs one update per touched row. The
+    lot occupancy counter moves by the net number of vehicles that came in.
+    """
+    traffic = defaultdict(lambda: [0, 0, timedelta()])
+    vehicles = defaultdict(lambda: {"visits": 0, "completed": 0, "duration": timedelta(), "first": None, "last": None})
+    occupancy = 0
+
+    for vehicle_id, entry_time in entries:
+        for key in period_starts(entry_time):
+            traffic[key][0] += 1
+        occupancy += 1
+        vehicle = vehicles[vehicle_id]
+        vehicle["visits"] += 1
+        vehicle["first"] = min(vehicle["first"] or entry_time, entry_time)
+        vehicle["last"] = max(vehicle["last"] or entry_time, entry_time)
+
+    for vehicle_id, entry_time, exit_time in exits:
+        duration = exit_time - entry_time
+        for key in period_starts(exit_time):
+            traffic[key][1] += 1
+            traffic[key][2] += duration
+        occupancy -= 1
+        vehicle = vehicles[vehicle_id]
+        vehicle["completed"] += 1
+        vehicle["duration"] += duration
+
+    if occupancy:
+        _increment(LotOccupancy, {"pk": 1}, parked=F("parked") + occupancy)
+
+    for (period, period_start), (entry_count, exit_count, duration) in traffic.items():
+        _increment(
+            TrafficRollup,
+            {"period": period, "period_start": period_start},
+            entries=F("entries") + entry_count,
+            exits=F("exits") + exit_count,
+            total_duration=F("total_duration") + duration,
+        )
+
+    for vehicle_id, delta in vehicles.items():
+        changes = {
+            "visits": F("visits") + delta["visits"],
+            "completed_visits": F("completed_visits") + delta["completed"],
+            "total_duration": F("total_duration") + delta["duration"],
+        }
+        if delta["first"]:
+            changes["first_visit"] = Least(Coalesce(F("first_visit"), delta["first"]), delta["first"])
+            changes["last_visit"] = Greatest(Coalesce(F("last_visit"), delta["last"]), delta["last"])
+        _increment(VehicleRollup, {"vehicle_id": vehicle_id}, **changes)
+
+
+def rebuild(batch_size=1000, apps=None):
+    """Recompute every rollup and the occupancy counter from ``EntryExitLog``.
+
+    Migrations pass their ``apps`` to work on the historical models; the
+    occupancy counter is left out if that state doesn't have it yet.
+    """
+    Log, Traffic, Vehicles, Occupancy = EntryExitLog, TrafficRollup, VehicleRollup, LotOccupancy
+    if apps is not None:
+        Log = apps.get_model("parking", "EntryExitLog")
+        Traffic = apps.get_model("parking", "TrafficRollup")
+        Vehicles = apps.get_model("parking", "VehicleRollup")
+        try:
+            Occupancy = apps.get_model("parking", "LotOccupancy")
+        except LookupError:
+            Occupancy = None
+    duration = ExpressionWrapper(F("exit_time") - F("entry_time"), output_field=DurationField())
+    completed = Log.objects.filter(exit_time__isnull=False)
+    rows = defaultdict(lambda: {"entries": 0, "exits": 0, "total_duration": timedelta()})
+
+    for period, trunc in ((TrafficRollup.HOUR, TruncHour), (TrafficRollup.DAY, TruncDay)):
+        for row in (
+            Log.objects.annotate(start=trunc("entry_time")).values("start").annotate(n=Count("id")).iterator()
+        ):
+            rows[(period, row["start"])]["entries"] = row["n"]
+        for row in (
+            completed.annotate(start=trunc("exit_time"))
+            .values("start")
+            .annotate(n=Count("id"), total=Sum(duration))
+            .iterator()
+        ):
+            rows[(period, row["start"])]["exits"] = row["n"]
+            rows[(period, row["start"])]["total_duration"] = row["total"] or timedelta()
+
+    totals = rows[(TrafficRollup.ALL, ALL_TIME)]
+    totals["entries"] = Log.objects.count()
+    aggregate = completed.aggregate(n=Count("id"), total=Sum(duration))
+    totals["exits"] = aggregate["n"]
+    totals["total_duration"] = aggregate["total"] or timedelta()
+
+    with transaction.atomic():
+        if Occupancy is not None:
+            Occupancy.objects.update_or_create(pk=1, defaults={"parked": Log.objects.filter(is_open=True).count()})
+        Traffic.objects.all().delete()
+        Vehicles.objects.all().delete()
+        Traffic.objects.bulk_create(
+            [Traffic(period=period, period_start=start, **values) for (period, start), values in rows.items()],
+            batch_size=batch_size,
+        )
+
+        batch = []
+        for row in (
+            Log.objects.values("vehicle_id")
+            .annotate(
+                visits=Count("id"),
+                completed_visits=Count("exit_time"),
+                total_duration=Sum(duration),
+                first_visit=Min("entry_time"),
+                last_visit=Max("entry_time"),
+            )
+            .iterator()
+        ):
+            row["total_duration"] = row["total_duration"] or timedelta()
+            batch.append(Vehicles(**row))
+            if len(batch) >= batch_size:
+                Vehicles.objects.bulk_create(batch)
+                batch = []
+        Vehicles.objects.bulk_create(batch)
+
+    return {"traffic_rows": len(rows), "vehicle_rows": Vehicles.objects.count()}
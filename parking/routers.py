@@ -0,0 +1,25 @@
+from django.db import connections
+
+
+class ReaderRouter:
+    """Sends reads to the query-only ``reader`` alias and everything else to ``default``.
+
+    Both aliases open the same SQLite file; in WAL mode the reader's
+    connections see every committed write and never wait for the writer.
+    Reads made inside a transaction on ``default`` stay there, so they see
+    that transaction's own uncommitted rows.
+    """
+
+    def db_for_read(self, model, **hints):
+        if connections["default"].in_atomic_block:
+            return "default"
+        return "reader"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
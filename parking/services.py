@@ -0,0 +1,237 @@
+import re
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now
+
+from . import metrics, open_sessions, writer
+from .models import Vehicle, EntryExitLog, ParkingLog
+from .rollups import record_activity
+
+
+def normalize_plate(plate):
+    return re.sub(r"[^A-Z0-9]", "", plate.upper().strip())
+
+
+def record_plate_event(plate, image_file=None, correlation_id=""):
+    """Log an entry, or an exit if the vehicle has an open log.
+
+    Returns the JSON payload the ``log_plate`` endpoint responds with.
+    Database errors propagate to the caller. With the open-session cache
+    (``parking.open_sessions``) a known plate costs one write and no reads;
+    if the write shows the cache was stale, the event is applied from the
+    database instead.
+    """
+    plate = normalize_plate(plate)
+    # If this runs in a writer batch whose commit fails, the cached session
+    # may be what broke it.
+    writer.on_failure(lambda: open_sessions.forget(plate))
+    try:
+        with metrics.span("db_transaction"), transaction.atomic():
+            session = open_sessions.get(plate)
+            if session is not None:
+                result = _cached_event(plate, session, image_file, correlation_id)
+                if result is not None:
+                    return result
+                metrics.count_cache("stale")
+
+            vehicle, created = Vehicle.objects.select_for_update().get_or_create(license_plate=plate)
+            open_log = EntryExitLog.objects.filter(vehicle=vehicle, is_open=True).order_by('-entry_time').first()
+            if open_log:
+                result = _log_exit(plate, vehicle.id, open_log.pk, open_log.entry_time, correlation_id)
+                if result is not None:
+                    return result
+                # Closed by a writer that didn't lock the vehicle (a cached
+                # exit); this event is then the next entry.
+            return _log_entry(plate, vehicle, image_file, correlation_id)
+    except Exception:
+        open_sessions.forget(plate)
+        raise
+
+
+def _cached_event(plate, session, image_file, correlation_id):
+    """Apply the event the cached session implies; ``None`` if the cache was stale."""
+    vehicle_id, log_id, entry_time = session
+    if log_id is not None:
+        return _log_exit(plate, vehicle_id, log_id, entry_time, correlation_id)
+    # Foreign keys are only checked at commit (SQLite, PostgreSQL), so a
+    # vehicle deleted since it was cached would fail the whole transaction.
+    if not Vehicle.objects.filter(pk=vehicle_id).exists():
+        return None
+    try:
+        with transaction.atomic():
+            return _log_entry(plate, Vehicle(pk=vehicle_id, license_plate=plate), image_file, correlation_id)
+    except IntegrityError:
+        # The vehicle is parked after all.
+        return None
+
+
+def _log_exit(plate, vehicle_id, log_id, entry_time, correlation_id):
+    """Close open log ``log_id``; ``None`` if it is no longer open."""
+    exit_time = now()
+    closed = EntryExitLog.objects.filter(pk=log_id, vehicle_id=vehicle_id, entry_time=entry_time, is_open=True).update(
+        is_open=False, exit_time=exit_time, exit_correlation_id=correlation_id
+    )
+    if not closed:
+        return None
+    record_activity(exits=[(vehicle_id, entry_time, exit_time)])
+    metrics.count_events("exit")
+    transaction.on_commit(lambda: open_sessions.remember(plate, vehicle_id))
+    return {
+        "action": "exit",
+        "plate": plate,
+        "entry_time": entry_time,
+        "exit_time": exit_time,
+        "duration": str(exit_time - entry_time),
+        "correlation_id": correlation_id,
+        "message": "Exit logged"
+    }
+
+
+def _log_entry(plate, vehicle, image_file, correlation_id):
+    entry_log = EntryExitLog.objects.create(
+        vehicle=vehicle, entry_time=now(), is_open=True, correlation_id=correlation_id
+    )
+    if image_file:
+        entry_log.image.save(image_file.name, image_file)
+        entry_log.save()
+    ParkingLog.objects.create(plate=plate, entry_time=entry_log.entry_time)
+    record_activity(entries=[(vehicle.id, entry_log.entry_time)])
+    metrics.count_events("entry")
+    transaction.on_commit(lambda: open_sessions.remember(plate, vehicle.id, entry_log.pk, entry_log.entry_time))
+    return {
+        "action": "entry",
+        "plate": plate,
+        "entry_time": entry_log.entry_time,
+        "correlation_id": correlation_id,
+        "message": "Entry logged"
+    }
+
+
+def _parse_timestamp(value):
+    if not value:
+        return now()
+    timestamp = parse_datetime(value) if isinstance(value, str) else value
+    if timestamp is None:
+        raise ValueError(f"Invalid timestamp: {value}")
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+def record_plate_events(events):
+    """Apply an ordered list of plate events in one transaction.
+
+    Each event is a dict with ``plate`` and optional ``timestamp`` (ISO 8601),
+    ``lane``, ``image`` (a stored image name), ``correlation_id`` (minted if
+    missing) and ``trace`` (client stage timings, see
+    ``metrics.record_trace``). Events toggle entry/exit in list order with the
+    same open-log rules as ``record_plate_event``, but vehicles and open logs
+    are loaded with one query each and all writes go out through
+    ``bulk_create``/``bulk_update``. Returns one result dict per input event;
+    invalid events, including exits timestamped before their entry, get an
+    ``error`` and are skipped.
+    """
+    parsed = []
+    results = []
+    for index, event in enumerate(events):
+        try:
+            plate = normalize_plate(event.get("plate") or "")
+            if not plate:
+                raise ValueError("Plate not provided")
+            correlation_id = str(event.get("correlation_id") or metrics.new_correlation_id())[:64]
+            parsed.append((index, plate, _parse_timestamp(event.get("timestamp")), event.get("image"), correlation_id))
+            metrics.record_trace(event.get("trace"))
+            results.append(None)
+        except (AttributeError, TypeError, ValueError) as e:
+            results.append({"index": index, "error": str(e)})
+
+    if not parsed:
+        return results
+
+    plates = {plate for _, plate, _, _, _ in parsed}
+    with metrics.span("db_transaction"), transaction.atomic():
+        vehicles = {v.license_plate: v for v in Vehicle.objects.select_for_update().filter(license_plate__in=plates)}
+        missing = plates - vehicles.keys()
+        if missing:
+            Vehicle.objects.bulk_create([Vehicle(license_plate=p) for p in missing], ignore_conflicts=True)
+            vehicles.update(
+                (v.license_plate, v)
+                for v in Vehicle.objects.select_for_update().filter(license_plate__in=missing)
+            )
+
+        open_logs = {}
+        for log in (
+            EntryExitLog.objects.filter(vehicle__in=vehicles.values(), is_open=True).order_by("entry_time")
+        ):
+            open_logs[log.vehicle_id] = log
+
+        to_update = {}
+        to_create = []
+        parking_logs = []
+        entries = []
+        exits = []
+        for index, plate, timestamp, image, correlation_id in parsed:
+            vehicle = vehicles[plate]
+            open_log = open_logs.pop(vehicle.id, None)
+            if open_log and timestamp < open_log.entry_time:
+                # An exit before the entry it would close; leave the session open.
+                open_logs[vehicle.id] = open_log
+                results[index] = {
+                    "index": index,
+                    "error": f"Timestamp {timestamp.isoformat()} is before the open entry at {open_log.entry_time.isoformat()}",
+                }
+                continue
+            if open_log:
+                open_log.is_open = False
+                open_log.exit_time = timestamp
+                open_log.exit_correlation_id = correlation_id
+                if open_log.pk:
+                    to_update[open_log.pk] = open_log
+                exits.append((vehicle.id, open_log.entry_time, timestamp))
+                results[index] = {
+                    "index": index,
+                    "action": "exit",
+                    "plate": plate,
+                    "entry_time": open_log.entry_time,
+                    "exit_time": timestamp,
+                    "duration": str(timestamp - open_log.entry_time),
+                    "correlation_id": correlation_id,
+                }
+                continue
+
+            entry_log = EntryExitLog(
+                vehicle=vehicle, entry_time=timestamp, is_open=True, image=image or None, correlation_id=correlation_id
+            )
+            to_create.append(entry_log)
+            open_logs[vehicle.id] = entry_log
+            parking_logs.append(ParkingLog(plate=plate, entry_time=timestamp))
+            entries.append((vehicle.id, timestamp))
+            results[index] = {
+                "index": index,
+                "action": "entry",
+                "plate": plate,
+                "entry_time": timestamp,
+                "correlation_id": correlation_id,
+            }
+
+        # Close existing sessions before inserting new ones so the open-log
+        # constraint never sees two open logs for the same vehicle.
+        EntryExitLog.objects.bulk_update(to_update.values(), ["is_open", "exit_time", "exit_correlation_id"])
+        EntryExitLog.objects.bulk_create(to_create)
+        ParkingLog.objects.bulk_create(parking_logs)
+        record_activity(entries, exits)
+        metrics.count_events("entry", len(entries))
+        metrics.count_events("exit", len(exits))
+
+        sessions = {}
+        for plate, vehicle in vehicles.items():
+            log = open_logs.get(vehicle.id)
+            if log is None:
+                sessions[plate] = (vehicle.id, None, None)
+            else:
+                sessions[plate] = (vehicle.id, log.pk, log.entry_time) if log.pk else None
+        transaction.on_commit(lambda: open_sessions.remember_many(sessions))
+
+    return results
@@ -0,0 +1,152 @@
+import os
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Snapshot
+from .storage import schedule_thumbnail, shard_path, snapshot_storage
+
+SNAPSHOT_NAME_RE = re.compile(r"^(?P<plate>[A-Z0-9]+)_(?P<date>\d{8})_(?P<time>\d{6})")
+
+# How far after the exit an exit snapshot may have been taken.
+EXIT_GRACE = timedelta(minutes=5)
+
+
+def entries_dir():
+    return str(settings.SNAPSHOT_ROOT)
+
+
+def parse_snapshot_name(name):
+    """Return ``(plate, taken_at)`` for ``PLATE_YYYYmmdd_HHMMSS.jpg`` names, else ``None``.
+
+    The timestamp in the name is the capturing machine's local time.
+    """
+    match = SNAPSHOT_NAME_RE.match(os.path.basename(name))
+    if not match:
+        return None
+    try:
+        taken_at = datetime.strptime(match["date"] + match["time"], "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+    return match["plate"], timezone.make_aware(taken_at)
+
+
+def save_snapshot(content, plate, taken_at=None, ext=".jpg"):
+    """Store an image file in the snapshot storage and index it.
+
+    ``content`` is a Django ``File``. The image lands in a
+    ``YYYY/MM/DD/PLATE/`` shard under a content-hash name, and its thumbnail
+    is generated in the background.
+    """
+    taken_at = taken_at or timezone.now()
+    name = snapshot_storage.save(shard_path(plate, timezone.localtime(taken_at), ext), content)
+    snapshot, _ = Snapshot.objects.get_or_create(name=name, defaults={"plate": plate, "taken_at": taken_at})
+    if not snapshot.thumbnail:
+        schedule_thumbnail(snapshot.pk, name)
+    return snapshot
+
+
+def save_frame(frame, plate, taken_at=None):
+    """JPEG-encode an OpenCV frame in memory and store it with ``save_snapshot``."""
+    import cv2
+    from django.core.files.base import ContentFile
+
+    ok, encoded = cv2.imencode(".jpg", frame)
+    if not ok:
+        raise ValueError("Could not encode frame as JPEG")
+    return save_snapshot(ContentFile(encoded.tobytes()), plate, taken_at)
+
+
+def register_snapshot(name, plate=None, taken_at=None):
+    """Record an image that was written under ``entries/`` without ``save_snapshot``.
+
+    ``plate`` and ``taken_at`` default to what the file name encodes.
+    """
+    parsed = parse_snapshot_name(name)
+    if plate is None or taken_at is None:
+        if parsed is None:
+            return None
+        plate = plate or parsed[0]
+        taken_at = taken_at or parsed[1]
+    snapshot, _ = Snapshot.objects.update_or_create(name=name, defaults={"plate": plate, "taken_at": taken_at})
+    return snapshot
+
+
+def backfill(directory=None, batch_size=1000):
+    """Index every snapshot file in ``directory`` that isn't indexed yet."""
+    directory = directory or entries_dir()
+    batch = []
+    indexed = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            parsed = parse_snapshot_name(entry.name)
+            if parsed is None:
+                continue
+            batch.append(Snapshot(name=entry.name, plate=parsed[0], taken_at=parsed[1]))
+            if len(batch) >= batch_size:
+                Snapshot.objects.bulk_create(batch, ignore_conflicts=True)
+                indexed += len(batch)
+                batch = []
+    Snapshot.objects.bulk_create(batch, ignore_conflicts=True)
+    return indexed + len(batch)
+
+
+def _closest(snapshots, times, target, lower=None):
+    """The snapshot nearest ``target`` among those taken after ``lower``."""
+    start = bisect_left(times, lower) if lower is not None else 0
+    index = bisect_left(times, target, lo=start)
+    candidates = [i for i in (index - 1, index) if start <= i < len(snapshots)]
+    if lower is not None:
+        candidates = [i for i in candidates if times[i] > lower]
+    if not candidates:
+        return None
+    return snapshots[min(candidates, key=lambda i: abs(times[i] - target))]
+
+
+def snapshots_for_logs(logs):
+    """Resolve entry and exit snapshots for many logs with one indexed query.
+
+    Returns ``{log.pk: (entry_snapshot, exit_snapshot)}``. The entry image is
+    the one taken closest to the entry on the same day; the exit image is the
+    one closest to the exit among those taken after the entry image.
+    """
+    logs = list(logs)
+    if not logs:
+        return {}
+
+    plates = {log.vehicle.license_plate for log in logs}
+    lowest = min(log.entry_time for log in logs)
+    lowest = timezone.localtime(lowest).replace(hour=0, minute=0, second=0, microsecond=0)
+    highest = max(log.exit_time or log.entry_time for log in logs) + timedelta(days=1)
+
+    by_plate = defaultdict(list)
+    for snapshot in Snapshot.objects.filter(plate__in=plates, taken_at__range=(lowest, highest)).order_by(
+        "plate", "taken_at"
+    ):
+        by_plate[snapshot.plate].append(snapshot)
+
+    times_by_plate = {plate: [s.taken_at for s in snapshots] for plate, snapshots in by_plate.items()}
+    resolved = {}
+    for log in logs:
+        snapshots = by_plate.get(log.vehicle.license_plate, [])
+        times = times_by_plate.get(log.vehicle.license_plate, [])
+
+        entry = _closest(snapshots, times, log.entry_time)
+        if entry and timezone.localtime(entry.taken_at).date() != timezone.localtime(log.entry_time).date():
+            entry = None
+
+        exit_snapshot = None
+        if log.exit_time:
+            after = entry.taken_at if entry else log.entry_time
+            exit_snapshot = _closest(snapshots, times, log.exit_time, lower=after)
+            if exit_snapshot and exit_snapshot.taken_at > log.exit_time + EXIT_GRACE:
+                exit_snapshot = None
+
+        resolved[log.pk] = (entry, exit_snapshot)
+    return resolved
@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import LazyObject
+
+logger = logging.getLogger(__name__)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that names files after a hash of their content.
+
+    The directory part of the requested name is kept (callers shard by date
+    and plate, e.g. ``2025/05/12/ABC123/``) and the file name becomes the
+    content hash, so saving the same image twice stores it once and no
+    directory ever has to be listed to find a free name.
+    """
+
+    hash_length = 20
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in _save.
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, "seek"):
+            content.seek(0)
+
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower() or ".jpg"
+        name = os.path.join(directory, digest.hexdigest()[: self.hash_length] + ext).replace("\\", "/")
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+class SnapshotStorage(LazyObject):
+    def _setup(self):
+        self._wrapped = ContentAddressedStorage(location=settings.SNAPSHOT_ROOT, base_url=settings.SNAPSHOT_URL)
+
+
+class ThumbnailStorage(LazyObject):
+    def _setup(self):
+        self._wrapped = FileSystemStorage(
+            location=os.path.join(settings.SNAPSHOT_ROOT, "thumbs"),
+            base_url=settings.SNAPSHOT_URL.rstrip("/") + "/thumbs/",
+        )
+
+
+snapshot_storage = SnapshotStorage()
+thumbnail_storage = ThumbnailStorage()
+
+
+def get_snapshot_storage():
+    return snapshot_storage
+
+
+def shard_path(plate, taken_at, ext=".jpg"):
+    """``YYYY/MM/DD/PLATE/snapshot.jpg``; the storage replaces the file name with a hash."""
+    return f"{taken_at:%Y/%m/%d}/{plate or 'UNKNOWN'}/snapshot{ext}"
+
+
+def make_thumbnail(name, height=None):
+    """Write a small JPEG of snapshot ``name`` to the thumbnail storage; returns its name."""
+    from io import BytesIO
+
+    from django.core.files.base import ContentFile
+    from PIL import Image
+
+    height = height or settings.SNAPSHOT_THUMBNAIL_HEIGHT
+    with snapshot_storage.open(name) as f:
+        image = Image.open(f)
+        image.thumbnail((height * 4, height))
+        buffer = BytesIO()
+        image.convert("RGB").save(buffer, "JPEG", quality=80)
+
+    thumb_name = os.path.splitext(name)[0] + ".jpg"
+    if thumbnail_storage.exists(thumb_name):
+        thumbnail_storage.delete(thumb_name)
+    return thumbnail_storage.save(thumb_name, ContentFile(buffer.getvalue()))
+
+
+# Thumbnails are made on a background thread so saving a snapshot (and the
+# request or camera loop doing it) never waits on the resize.
+_thumbnail_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
+
+
+def schedule_thumbnail(snapshot_id, name):
+    def _run():
+        from django.db import close_old_connections
+
+        from .models import Snapshot
+
+        try:
+            Snapshot.objects.filter(pk=snapshot_id).update(thumbnail=make_thumbnail(name))
+        except Exception as e:
+            logger.warning("Could not make thumbnail for %s: %s", name, e)
+        finally:
+            close_old_connections()
+
+    return _thumbnail_executor.submit(_run)
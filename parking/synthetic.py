@@ -0,0 +1,88 @@
+import random
+import string
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .models import EntryExitLog, Vehicle
+
+
+def fake_plate(rng, fmt="LLLDDDD"):
+    return "".join(
+        rng.choice(string.ascii_uppercase) if slot == "L" else rng.choice(string.digits) if slot == "D" else slot
+        for slot in fmt
+    )
+
+
+def plate_image(plate, rng, width=640, height=480):
+    """A synthetic car photo: noisy background, a car-coloured block and a
+    white plate with ``plate`` in black. Returns ``(image, plate_box)``."""
+    import cv2
+
+    seed = rng.randrange(2 ** 32)
+    noise = np.random.default_rng(seed)
+    image = noise.integers(40, 90, size=(height, width, 3), dtype=np.uint8)
+    car_colour = tuple(int(c) for c in noise.integers(0, 255, size=3))
+    cv2.rectangle(image, (width // 8, height // 4), (width * 7 // 8, height * 7 // 8), car_colour, -1)
+
+    plate_w, plate_h = width // 3, height // 10
+    x1 = (width - plate_w) // 2 + rng.randint(-width // 20, width // 20)
+    y1 = height * 2 // 3 + rng.randint(-height // 20, height // 40)
+    x2, y2 = x1 + plate_w, y1 + plate_h
+    cv2.rectangle(image, (x1, y1), (x2, y2), (245, 245, 245), -1)
+    cv2.rectangle(image, (x1, y1), (x2, y2), (20, 20, 20), 2)
+    scale = plate_h / 30
+    (text_w, text_h), _ = cv2.getTextSize(plate, cv2.FONT_HERSHEY_SIMPLEX, scale, 2)
+    origin = (x1 + (plate_w - text_w) // 2, y1 + (plate_h + text_h) // 2)
+    cv2.putText(image, plate, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, (10, 10, 10), 2, cv2.LINE_AA)
+    return image, (x1, y1, x2, y2)
+
+
+def generate_logs(rows, vehicles=None, days=365, open_share=0.05, batch_size=5000, seed=0, fmt="LLLDDDD"):
+    """Insert ``rows`` synthetic ``EntryExitLog`` rows spread over ``days``.
+
+    Visits are dealt round-robin to ``vehicles`` plates and never overlap per
+    vehicle; the last visit of ``open_share`` of the vehicles is left open.
+    Rows go in with ``bulk_create`` in ``batch_size`` chunks, so millions of
+    rows stream through bounded memory. Rollups are not updated; run
+    ``parking.rollups.rebuild`` afterwards. Returns the number of rows written.
+    """
+    rng = random.Random(seed)
+    vehicles = vehicles or max(1, rows // 50)
+    plates = set()
+    while len(plates) < vehicles:
+        plates.add(fake_plate(rng, fmt))
+    Vehicle.objects.bulk_create([Vehicle(license_plate=p) for p in plates], batch_size=batch_size, ignore_conflicts=True)
+    plates = sorted(plates)
+    vehicle_ids = []
+    for i in range(0, len(plates), 500):
+        vehicle_ids.extend(Vehicle.objects.filter(license_plate__in=plates[i:i + 500]).values_list("id", flat=True))
+
+    # Vehicles that already have an open log must not get another one.
+    already_open = set(EntryExitLog.objects.filter(is_open=True).values_list("vehicle_id", flat=True).iterator())
+    per_vehicle = -(-rows // len(vehicle_ids))
+    slot = timedelta(days=days) / per_vehicle
+    start = timezone.now() - timedelta(days=days)
+
+    written = 0
+    batch = []
+    for visit in range(per_vehicle):
+        for vehicle_id in vehicle_ids:
+            if written + len(batch) >= rows:
+                break
+            entry_time = start + slot * visit + timedelta(seconds=rng.uniform(0, slot.total_seconds() / 2))
+            last = visit == per_vehicle - 1 or written + len(batch) + len(vehicle_ids) >= rows
+            is_open = last and vehicle_id not in already_open and rng.random() < open_share
+            exit_time = None
+            if not is_open:
+                exit_time = entry_time + timedelta(seconds=rng.uniform(300, min(slot.total_seconds() / 2, 36000)))
+            batch.append(
+                EntryExitLog(vehicle_id=vehicle_id, entry_time=entry_time, exit_time=exit_time, is_open=is_open)
+            )
+            if len(batch) >= batch_size:
+                EntryExitLog.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+    EntryExitLog.objects.bulk_create(batch)
+    return written + len(batch)
@@ -0,0 +1,446 @@
+import json
+import os
+import random
+import socket
+import string
+import struct
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+import cv2
+import numpy as np
+from django.db import IntegrityError
+from django.db.models import Count
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import open_sessions, rollups, synthetic, writer
+from .events import EventClient
+from .gating import OcrCache
+from .inference import InferenceServer, MessageTooLarge, recv_message, send_message
+from .models import EntryExitLog, LotOccupancy, ParkingLog, TrafficRollup, Vehicle, VehicleRollup
+from .services import record_plate_event, record_plate_events
+from .views import format_cursor, keyset_page, parse_cursor
+
+
+class OpenSessionCacheTests(TransactionTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        open_sessions.forget("DEL1")
+
+    def log_after_delete(self):
+        self.assertEqual(writer.run(record_plate_event, "DEL1")["action"], "entry")
+        self.assertEqual(writer.run(record_plate_event, "DEL1")["action"], "exit")
+        self.assertIsNotNone(open_sessions.get("DEL1"))
+        Vehicle.objects.filter(license_plate="DEL1").delete()
+
+        self.assertEqual(writer.run(record_plate_event, "DEL1")["action"], "entry")
+        vehicle = Vehicle.objects.get(license_plate="DEL1")
+        self.assertEqual(EntryExitLog.objects.get(is_open=True).vehicle, vehicle)
+        self.assertEqual(open_sessions.get("DEL1")[0], vehicle.pk)
+        self.assertEqual(writer.run(record_plate_event, "DEL1")["action"], "exit")
+
+    @override_settings(OPEN_SESSION_CACHE_ENABLED=True, DATABASE_SINGLE_WRITER=False)
+    def test_deleted_vehicle_is_recreated(self):
+        self.log_after_delete()
+
+    @override_settings(OPEN_SESSION_CACHE_ENABLED=True, DATABASE_SINGLE_WRITER=True)
+    def test_deleted_vehicle_is_recreated_through_writer(self):
+        self.log_after_delete()
+
+
+class InferenceProtocolTests(SimpleTestCase):
+    def setUp(self):
+        self.client_sock, self.server_sock = socket.socketpair()
+        self.addCleanup(self.client_sock.close)
+        self.addCleanup(self.server_sock.close)
+
+    def test_round_trip_within_limit(self):
+        image = np.arange(24, dtype=np.uint8).reshape(2, 4, 3)
+        send_message(self.client_sock, {"op": "detect"}, [image])
+        header, arrays = recv_message(self.server_sock, max_size=1024)
+        self.assertEqual(header, {"op": "detect"})
+        np.testing.assert_array_equal(arrays[0], image)
+
+    def test_oversized_prefix_is_rejected_before_reading(self):
+        self.client_sock.sendall(struct.pack("!IQ", 16, 2 ** 63))
+        with self.assertRaises(MessageTooLarge):
+            recv_message(self.server_sock, max_size=1024)
+
+    def test_server_drops_oversized_client(self):
+        server = InferenceServer(engine=None, address="unused", max_message_bytes=1024)
+        handler = threading.Thread(target=server._handle, args=(self.server_sock,))
+        with self.assertLogs("parking.inference", "WARNING"):
+            handler.start()
+            self.client_sock.sendall(struct.pack("!IQ", 16, 10 ** 12))
+            handler.join(5)
+        self.assertFalse(handler.is_alive())
+        self.assertEqual(self.client_sock.recv(1), b"")
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.vehicle = Vehicle.objects.create(license_plate="KEY001")
+        start = timezone.now().replace(microsecond=0) - timedelta(days=1)
+        # Three logs share each entry_time, so paging has to tie-break on id.
+        for minutes in (0, 0, 0, 10, 10, 10, 20):
+            entry_time = start + timedelta(minutes=minutes)
+            EntryExitLog.objects.create(
+                vehicle=self.vehicle,
+                entry_time=entry_time,
+                exit_time=entry_time + timedelta(minutes=5),
+                is_open=False,
+            )
+        self.logs = EntryExitLog.objects.filter(vehicle=self.vehicle)
+        self.newest_first = list(self.logs.order_by("-entry_time", "-id"))
+
+    def test_cursor_round_trip(self):
+        for log in self.newest_first:
+            self.assertEqual(parse_cursor(format_cursor(log)), (log.entry_time, log.pk))
+        # Cursors travel in query strings, where an unencoded "+" would be a space.
+        cursor = QueryDict(f"before={format_cursor(self.newest_first[0])}".replace("+", "%2B"))["before"]
+        self.assertEqual(parse_cursor(cursor), (self.newest_first[0].entry_time, self.newest_first[0].pk))
+
+    def test_malformed_cursors(self):
+        malformed = [
+            None, "", "5", ",5", "yesterday,5", "2026-13-45T00:00:00,5",
+            "2026-01-01T00:00:00,", "2026-01-01T00:00:00,x", "2026-01-01T00:00:00,-1",
+        ]
+        for value in malformed:
+            with self.subTest(value=value):
+                self.assertIsNone(parse_cursor(value))
+
+    def test_pages_tie_break_on_id(self):
+        pages = []
+        page, has_older, has_newer = keyset_page(self.logs, size=3)
+        self.assertFalse(has_newer)
+        pages.append(page)
+        while has_older:
+            page, has_older, has_newer = keyset_page(self.logs, before=parse_cursor(format_cursor(page[-1])), size=3)
+            self.assertTrue(has_newer)
+            pages.append(page)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        self.assertEqual([log for p in pages for log in p], self.newest_first)
+
+        # Walking back with "after" returns the same pages.
+        for expected in reversed(pages[:-1]):
+            page, has_older, has_newer = keyset_page(self.logs, after=parse_cursor(format_cursor(page[0])), size=3)
+            self.assertEqual(page, expected)
+            self.assertTrue(has_older)
+        self.assertFalse(has_newer)
+
+    @override_settings(VEHICLE_HISTORY_PAGE_SIZE=3)
+    def test_vehicle_detail_pages(self):
+        url = reverse("vehicle_detail", args=["KEY001"])
+        seen = []
+        query = ""
+        while True:
+            response = self.client.get(f"{url}?{query}")
+            self.assertEqual(response.status_code, 200)
+            seen += [log["entry_time"] for log in response.context["logs"]]
+            query = response.context["older_query"]
+            if not query:
+                break
+        self.assertEqual(seen, [log.entry_time for log in self.newest_first])
+
+        response = self.client.get(url, {"before": "garbage", "after": "2026-01-01T00:00:00,x"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["logs"]), 3)
+        self.assertEqual(response.context["newer_query"], "")
+
+
+class EventClientTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool_path = os.path.join(directory.name, "events.jsonl")
+        self.posted = []
+        self.responses = []
+        patcher = mock.patch("requests.Session.post", side_effect=self.post)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, url, json=None, timeout=None):
+        response = self.responses.pop(0) if self.responses else None
+        if isinstance(response, Exception):
+            raise response
+        self.posted.append([event["plate"] for event in json["events"]])
+        if response is None:
+            response = mock.Mock(status_code=200)
+            response.json.return_value = {"results": [{"index": i} for i in range(len(json["events"]))]}
+        return response
+
+    def start_client(self):
+        """A client with a fast sender loop, once it has worked through the spool."""
+        client = EventClient(
+            "http://backend/log/bulk/", self.spool_path, max_retries=0, backoff=0.01, flush_interval=0.01
+        )
+        self.addCleanup(client.close, 1.0)
+        deadline = time.monotonic() + 5
+        while client._spool_size() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return client
+
+    def write(self, path, plates):
+        with open(path, "w") as f:
+            f.writelines(json.dumps({"plate": plate}) + "\n" for plate in plates)
+
+    def test_interrupted_replay_is_sent_first(self):
+        self.write(self.spool_path + ".replaying", ["OLD1", "OLD2"])
+        self.write(self.spool_path, ["NEW1"])
+        client = self.start_client()
+        self.assertEqual(self.posted, [["OLD1", "OLD2"], ["NEW1"]])
+        self.assertEqual(client._spool_size(), 0)
+        self.assertFalse(os.path.exists(self.spool_path + ".replaying"))
+
+    def test_replay_that_crashes_keeps_its_events(self):
+        self.write(self.spool_path, ["OLD1", "OLD2"])
+        self.responses = [RuntimeError("killed mid-replay")]
+        with self.assertLogs("parking.events", "ERROR"):
+            self.start_client()
+        self.assertEqual(self.posted, [["OLD1", "OLD2"]])
+
+    def test_unexpected_response_counts_as_failed(self):
+        response = mock.Mock(status_code=200, text="<html>proxy login</html>")
+        response.json.side_effect = ValueError("not JSON")
+        self.responses = [response]
+        client = self.start_client()
+        with self.assertLogs("parking.events", "WARNING"):
+            client.submit("ABC123")
+            client.submit("ABC124")
+            client.flush(5)
+        self.assertEqual((client.sent, client.failed, client._spool_size()), (0, 2, 0))
+
+
+class OcrCacheTests(SimpleTestCase):
+    plate = "ABC1234"
+
+    def crop(self, plate, seed=0):
+        image, (x1, y1, x2, y2) = synthetic.plate_image(plate, random.Random(seed))
+        return image[y1:y2, x1:x2]
+
+    def test_one_character_variants_miss(self):
+        for seed in range(3):
+            cache = OcrCache()
+            digest, thumbnail = cache.key(self.crop(self.plate, seed))
+            cache.put((digest, thumbnail), (self.plate, 0.9))
+            for i, original in enumerate(self.plate):
+                for char in string.ascii_uppercase + string.digits:
+                    if char == original:
+                        continue
+                    variant = self.plate[:i] + char + self.plate[i + 1:]
+                    _, variant_thumbnail = cache.key(self.crop(variant, seed))
+                    with self.subTest(seed=seed, variant=variant):
+                        # As if the variant's dhash collided with the plate's.
+                        self.assertIsNone(cache.get((digest, variant_thumbnail)))
+            self.assertEqual(cache.rejected, 7 * 35)
+
+    def test_recompressed_crop_hits(self):
+        crop = self.crop(self.plate)
+        cache = OcrCache()
+        cache.put(cache.key(crop), (self.plate, 0.9))
+        _, encoded = cv2.imencode(".jpg", crop, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        self.assertEqual(cache.get(cache.key(cv2.imdecode(encoded, cv2.IMREAD_COLOR))), (self.plate, 0.9))
+
+
+class BulkEventTests(TestCase):
+
+    def setUp(self):
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+
+    def at(self, minutes):
+        return (self.start + timedelta(minutes=minutes)).isoformat()
+
+    def assertOneOpenLogPerVehicle(self):
+        counts = EntryExitLog.objects.filter(is_open=True).values("vehicle").annotate(n=Count("id"))
+        self.assertTrue(all(row["n"] == 1 for row in counts))
+
+    def test_toggles_in_order_within_a_batch(self):
+        results = record_plate_events([
+            {"plate": "blk 001", "timestamp": self.at(0)},
+            {"plate": "BLK001", "timestamp": self.at(10)},
+            {"plate": "BLK001", "timestamp": self.at(20)},
+        ])
+        self.assertEqual([r["action"] for r in results], ["entry", "exit", "entry"])
+        self.assertEqual([r["index"] for r in results], [0, 1, 2])
+        self.assertEqual(results[1]["duration"], "0:10:00")
+
+        closed, reopened = EntryExitLog.objects.filter(vehicle__license_plate="BLK001").order_by("entry_time")
+        self.assertFalse(closed.is_open)
+        self.assertEqual(closed.exit_time, self.start + timedelta(minutes=10))
+        self.assertTrue(reopened.is_open)
+        self.assertEqual(ParkingLog.objects.filter(plate="BLK001").count(), 2)
+        self.assertOneOpenLogPerVehicle()
+
+    def test_exit_before_entry_is_rejected(self):
+        record_plate_events([{"plate": "BLK002", "timestamp": self.at(30)}])
+        results = record_plate_events([
+            {"plate": "BLK002", "timestamp": self.at(10)},
+            {"plate": "BLK002", "timestamp": self.at(40)},
+        ])
+        self.assertEqual(results[0]["index"], 0)
+        self.assertIn("before the open entry", results[0]["error"])
+        self.assertEqual(results[1]["action"], "exit")
+        self.assertEqual(results[1]["exit_time"], self.start + timedelta(minutes=40))
+
+        results = record_plate_events([{"plate": "BLK002", "timestamp": self.at(35)}])
+        self.assertEqual(results[0]["action"], "entry")
+        results = record_plate_events([{"plate": "BLK002", "timestamp": self.at(0)}])
+        self.assertIn("error", results[0])
+        self.assertTrue(EntryExitLog.objects.get(vehicle__license_plate="BLK002", is_open=True))
+
+    def test_invalid_events_are_reported_at_their_index(self):
+        results = record_plate_events([
+            {"plate": ""},
+            "BLK003",
+            {"plate": "BLK003", "timestamp": "yesterday"},
+            {"plate": "BLK003", "timestamp": self.at(0)},
+            {"timestamp": self.at(1)},
+        ])
+        self.assertEqual([r["index"] for r in results], [0, 1, 2, 3, 4])
+        self.assertEqual([("error" in r) for r in results], [True, True, True, False, True])
+        self.assertEqual(results[3]["action"], "entry")
+        self.assertEqual(EntryExitLog.objects.filter(vehicle__license_plate="BLK003").count(), 1)
+
+    def test_open_log_constraint_holds_across_batches(self):
+        plates = ["BLK010", "BLK011", "BLK012"]
+        record_plate_events([{"plate": p, "timestamp": self.at(0)} for p in plates])
+        # Close each existing session and open the next one in the same batch.
+        record_plate_events(
+            [{"plate": p, "timestamp": self.at(minutes)} for minutes in (5, 6, 7) for p in plates]
+        )
+        self.assertOneOpenLogPerVehicle()
+        self.assertEqual(EntryExitLog.objects.filter(is_open=True).count(), 0)
+        self.assertEqual(EntryExitLog.objects.count(), 6)
+
+        response = self.client.post(
+            reverse("log_plate_bulk"),
+            json.dumps({"events": [{"plate": p, "timestamp": self.at(8)} for p in plates + plates[:1]]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        actions = [r["action"] for r in response.json()["results"]]
+        self.assertEqual(actions, ["entry", "entry", "entry", "exit"])
+        self.assertOneOpenLogPerVehicle()
+
+    def test_bulk_view_rejects_malformed_bodies(self):
+        response = self.client.post(reverse("log_plate_bulk"), "[]", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse("log_plate_bulk"), '{"events": {}}', content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class RollupTests(TestCase):
+    plates = ["ROL001", "ROL002", "ROL003", "ROL004"]
+
+    def setUp(self):
+        for plate in self.plates:
+            open_sessions.forget(plate)
+
+    def snapshot(self):
+        return (
+            sorted(TrafficRollup.objects.values_list("period", "period_start", "entries", "exits", "total_duration")),
+            sorted(
+                VehicleRollup.objects.values_list(
+                    "vehicle_id", "visits", "completed_visits", "total_duration", "first_visit", "last_visit"
+                )
+            ),
+            LotOccupancy.current(),
+        )
+
+    def test_incremental_updates_match_rebuild(self):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=2)
+        events = []
+        for hours, plates in ((0, self.plates), (1, self.plates[:2]), (5, self.plates[:3]), (26, self.plates[1:])):
+            for minutes, plate in enumerate(plates):
+                timestamp = start + timedelta(hours=hours, minutes=minutes * 7)
+                events.append({"plate": plate, "timestamp": timestamp.isoformat()})
+        # Rejected: before ROL004's open entry.
+        events.append({"plate": "ROL004", "timestamp": start.isoformat()})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record_plate_events(events)
+        # Through the session cache filled by the on-commit hooks, then from the database.
+        for plate in self.plates:
+            with self.captureOnCommitCallbacks(execute=True):
+                record_plate_event(plate)
+        for plate in self.plates[:2]:
+            open_sessions.forget(plate)
+            record_plate_event(plate)
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental[2], EntryExitLog.objects.filter(is_open=True).count())
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+
+class WriterTests(TransactionTestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        # A private writer that waits long enough to batch the writes below.
+        self.writer = writer.Writer(max_batch=8, max_wait=0.5)
+        patcher = mock.patch.object(writer, "_writer", self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_together(self, *funcs):
+        """Call each of ``funcs`` through the writer from its own thread; returns results or exceptions."""
+        outcomes = [None] * len(funcs)
+
+        def call(i, func):
+            try:
+                outcomes[i] = self.writer.run(func)
+            except Exception as e:
+                outcomes[i] = e
+
+        threads = [threading.Thread(target=call, args=(i, func)) for i, func in enumerate(funcs)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_failing_write_rolls_back_alone(self):
+        def fail():
+            Vehicle.objects.create(license_plate="WRT002")
+            raise ValueError("boom")
+
+        outcomes = self.run_together(
+            lambda: Vehicle.objects.create(license_plate="WRT001").pk,
+            fail,
+            lambda: Vehicle.objects.create(license_plate="WRT003").pk,
+        )
+        self.assertIsInstance(outcomes[1], ValueError)
+        self.assertEqual(
+            sorted(Vehicle.objects.values_list("license_plate", flat=True)), ["WRT001", "WRT003"]
+        )
+        self.assertEqual(self.writer.counters, {"writes": 3, "batches": 1, "failed_batches": 0})
+
+    def test_failed_commit_runs_failure_callbacks_and_retries_alone(self):
+        failed = []
+
+        def create():
+            writer.on_failure(lambda: failed.append("WRT010"))
+            return Vehicle.objects.create(license_plate="WRT010").pk
+
+        def dangling():
+            # Foreign keys are checked at commit, so this fails the whole batch.
+            return EntryExitLog.objects.create(vehicle_id=999999, entry_time=timezone.now()).pk
+
+        with self.assertLogs("parking.writer", "ERROR") as logs:
+            outcomes = self.run_together(create, dangling)
+        self.assertIn("Write batch of 2 failed", logs.output[0])
+        self.assertEqual(failed, ["WRT010"])
+        self.assertEqual(outcomes[0], Vehicle.objects.get(license_plate="WRT010").pk)
+        self.assertIsInstance(outcomes[1], IntegrityError)
+        self.assertFalse(EntryExitLog.objects.exists())
+        self.assertEqual(self.writer.counters["batches"], 1)
+        self.assertEqual(self.writer.counters["failed_batches"], 2)
@@ -0,0 +1,168 @@
+import itertools
+import time
+from collections import defaultdict, namedtuple
+
+from .recognition import clean_plate_text
+
+PlateEvent = namedtuple("PlateEvent", ["plate", "confidence", "reads", "first_seen", "last_seen", "track_id"])
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    if not inter:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+class PlateTrack:
+    """One plate box followed across frames, with its accumulated OCR votes.
+
+    Reads of different lengths are kept apart: the winning length is the one
+    with the most confidence behind it, then each position takes the
+    character with the most confidence at that length.
+    """
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.reads = 0
+        self.committed = False
+        self._length_votes = defaultdict(float)
+        self._char_votes = defaultdict(lambda: defaultdict(float))
+
+    def update(self, box, now):
+        self.box = box
+        self.last_seen = now
+        self.hits += 1
+
+    def add_read(self, text, conf):
+        plate = clean_plate_text(text)
+        if not plate:
+            return
+        self.reads += 1
+        self._length_votes[len(plate)] += conf
+        for position, char in enumerate(plate):
+            self._char_votes[(len(plate), position)][char] += conf
+
+    def consensus(self):
+        """Return ``(plate, confidence)``; confidence is the mean per-character vote share."""
+        if not self._length_votes:
+            return "", 0.0
+        length = max(self._length_votes, key=self._length_votes.get)
+        chars = []
+        shares = []
+        for position in range(length):
+            votes = self._char_votes[(length, position)]
+            char = max(votes, key=votes.get)
+            chars.append(char)
+            shares.append(votes[char] / sum(votes.values()))
+        return "".join(chars), sum(shares) / length
+
+
+class PlateTracker:
+    """Per-lane tracker that turns noisy per-frame reads into one event per vehicle pass.
+
+    Boxes are matched to existing tracks by IoU. A track is committed once it
+    has ``min_reads`` OCR reads and a consensus of at least ``min_agreement``;
+    after that its boxes no longer need OCR. Tracks unseen for ``max_age``
+    seconds are closed, and a plate committed again within ``cooldown``
+    seconds (a car that stopped and was re-acquired) is suppressed.
+    """
+
+    def __init__(self, iou_threshold=0.3, min_reads=3, min_agreement=0.6, max_age=2.0, cooldown=30.0):
+        self.iou_threshold = iou_threshold
+        self.min_reads = min_reads
+        self.min_agreement = min_agreement
+        self.max_age = max_age
+        self.cooldown = cooldown
+        self.tracks = []
+        self.ocr_calls = 0
+        self.ocr_skipped = 0
+        self._ids = itertools.count(1)
+        self._recent = {}
+
+    def update(self, boxes, now=None):
+        """Match ``boxes`` to tracks and return the track for each box, in order."""
+        now = time.monotonic() if now is None else now
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age]
+
+        assigned = []
+        free = list(self.tracks)
+        for box in boxes:
+            best, best_iou = None, self.iou_threshold
+            for track in free:
+                overlap = iou(track.box, box)
+                if overlap >= best_iou:
+                    best, best_iou = track, overlap
+            if best is None:
+                best = PlateTrack(next(self._ids), box, now)
+                self.tracks.append(best)
+            else:
+                best.update(box, now)
+                free.remove(best)
+            assigned.append(best)
+        return assigned
+
+    def needs_ocr(self, track):
+        if track.committed:
+            self.ocr_skipped += 1
+            return False
+        self.ocr_calls += 1
+        return True
+
+    def commit_ready(self, now=None):
+        """Return events for tracks that just reached a confident consensus."""
+        now = time.monotonic() if now is None else now
+        events = []
+        for track in self.tracks:
+            if track.committed or track.reads < self.min_reads:
+                continue
+            plate, confidence = track.consensus()
+            if confidence < self.min_agreement:
+                continue
+            track.committed = True
+            last_commit = self._recent.get(plate)
+            self._recent[plate] = now
+            if last_commit is not None and now - last_commit < self.cooldown:
+                continue
+            events.append(PlateEvent(plate, confidence, track.reads, track.first_seen, track.last_seen, track.track_id))
+
+        self._recent = {p: t for p, t in self._recent.items() if now - t < self.cooldown}
+        return events
+
+    def best_reading(self):
+        """Consensus of the most-read live track, for display."""
+        tracks = [t for t in self.tracks if t.reads]
+        if not tracks:
+            return "", 0.0
+        return max(tracks, key=lambda t: t.reads).consensus()
+
+    def stats(self):
+        total = self.ocr_calls + self.ocr_skipped
+        return {
+            "tracks": len(self.tracks),
+            "ocr_calls": self.ocr_calls,
+            "ocr_skipped": self.ocr_skipped,
+            "ocr_skip_rate": round(self.ocr_skipped / total, 3) if total else 0.0,
+        }
+
+
+def track_frame(engine, tracker, frame, min_conf=0.5, now=None):
+    """Detect, OCR only the uncommitted tracks, and return newly committed events."""
+    now = time.monotonic() if now is None else now
+    boxes = engine.detect(frame, min_conf=min_conf)
+    tracks = tracker.update([box[:4] for box in boxes], now)
+    for track in tracks:
+        if not tracker.needs_ocr(track):
+            continue
+        x1, y1, x2, y2 = track.box
+        text, conf = engine.read_text(frame[y1:y2, x1:x2])
+        track.add_read(text, conf)
+    return tracker.commit_ready(now)
@@ -0,0 +1,114 @@
+import logging
+import os
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+
+
+def is_video(upload):
+    content_type = getattr(upload, "content_type", None) or ""
+    return content_type.startswith("video/") or upload.name.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def decode_image(upload):
+    """Decode an uploaded image without writing it anywhere.
+
+    Uploads under ``FILE_UPLOAD_MAX_MEMORY_SIZE`` are held in memory and
+    decoded from that buffer; larger ones were already streamed to a temporary
+    file by Django's upload handler and are decoded straight from it.
+    """
+    import cv2
+
+    if hasattr(upload, "temporary_file_path"):
+        return cv2.imread(upload.temporary_file_path())
+    upload.seek(0)
+    data = upload.file.getbuffer() if hasattr(upload.file, "getbuffer") else upload.read()
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+@contextmanager
+def upload_path(upload):
+    """A file path OpenCV can open for ``upload``.
+
+    Large uploads already have one; small in-memory ones are written to a
+    temporary file for the duration of the block.
+    """
+    if hasattr(upload, "temporary_file_path"):
+        yield upload.temporary_file_path()
+        return
+
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(upload.name)[1], dir=settings.FILE_UPLOAD_TEMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
+        yield path
+    finally:
+        os.remove(path)
+
+
+def iter_video_frames(upload, step=None, max_frames=None):
+    """Yield ``(frame_number, frame)`` for every ``step``-th frame of an uploaded clip."""
+    import cv2
+
+    step = step or settings.UPLOAD_VIDEO_FRAME_STEP
+    max_frames = max_frames or settings.UPLOAD_VIDEO_MAX_FRAMES
+    with upload_path(upload) as path:
+        capture = cv2.VideoCapture(path)
+        try:
+            number = 0
+            sampled = 0
+            while sampled < max_frames and capture.grab():
+                if number % step == 0:
+                    ok, frame = capture.retrieve()
+                    if not ok:
+                        break
+                    yield number, frame
+                    sampled += 1
+                number += 1
+        finally:
+            capture.release()
+
+
+def recognize_video(engine, upload, batch_size=None, min_reads=None):
+    """Read plates from an uploaded clip.
+
+    Returns ``[(plate, reads, frame)]`` for every plate read in at least
+    ``min_reads`` sampled frames, most-read first, with the frame the plate was
+    detected in most confidently. Frames are decoded lazily and batched through
+    the engine, so only the batch in flight and one frame per plate are held
+    in memory.
+    """
+    batch_size = batch_size or settings.RECOGNITION_BATCH_SIZE
+    min_reads = min_reads or settings.UPLOAD_VIDEO_MIN_READS
+    pending = {}
+
+    def frames():
+        for index, (_, frame) in enumerate(iter_video_frames(upload)):
+            pending[index] = frame
+            yield frame
+
+    reads = Counter()
+    best = {}
+    sampled = 0
+    for result in engine.recognize_batch(frames(), batch_size=batch_size):
+        frame = pending.pop(result["index"])
+        sampled += 1
+        plate = result["plate"]
+        if not plate:
+            continue
+        reads[plate] += 1
+        conf = max((c["det_conf"] for c in result["candidates"] if c["text"] == plate), default=0.0)
+        if plate not in best or conf > best[plate][0]:
+            best[plate] = (conf, frame)
+
+    logger.info("Read %d plates from %d frames of %s", len(reads), sampled, upload.name)
+    min_reads = min(min_reads, max(sampled, 1))
+    return [(plate, count, best[plate][1]) for plate, count in reads.most_common() if count >= min_reads]
@@ -1,11 +1,18 @@
 from django.urls import path
 from . import views
-from .views import analytics_view, vehicle_detail, log_plate, launch_stream, upload_image
+from .views import (
+    analytics_view, vehicle_detail, vehicle_export, log_plate, log_plate_bulk, launch_stream, upload_image, upload_job, recognize_batch, metrics_view
+)
 
 urlpatterns = [
     path("log/", log_plate, name="log_plate"),
+    path("log/bulk/", log_plate_bulk, name="log_plate_bulk"),
     path("analytics/", analytics_view, name="analytics"),
     path("vehicle/<str:plate>/", vehicle_detail, name="vehicle_detail"),
+    path("vehicle/<str:plate>/export/", vehicle_export, name="vehicle_export"),
     path("launch-stream/", launch_stream, name="launch_stream"),
     path("upload-image/", upload_image, name="upload_image"),
+    path("upload-image/jobs/<uuid:job_id>/", upload_job, name="upload_job"),
+    path("recognize-batch/", recognize_batch, name="recognize_batch"),
+    path("metrics/", metrics_view, name="metrics"),
 ]
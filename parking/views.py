@@ -1,11 +1,22 @@
+import itertools
 import re
-from datetime import timedelta
+from collections import deque
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.timezone import now
-from django.http import JsonResponse
-from .models import Vehicle, EntryExitLog, ParkingLog
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.conf import settings
+from . import metrics, writer
+from .models import Vehicle, EntryExitLog, ParkingLog, LotOccupancy, TrafficRollup, UploadJob, VehicleRollup
+from .services import record_plate_event, record_plate_events
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Count, Avg, DurationField, ExpressionWrapper, F
+from django.urls import reverse
+from django.db.models import Count, Avg, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
 from django.db import transaction, IntegrityError
 
 
@@ -22,44 +33,31 @@ def format_duration(duration):
     return f"{hours}h {minutes}m {seconds}s" if hours else f"{minutes}m {seconds}s"
 
 
+def request_correlation_id(request):
+    """The caller's ``X-Correlation-ID`` header or ``correlation_id`` parameter, else a new ID."""
+    correlation_id = (
+        request.headers.get("X-Correlation-ID")
+        or request.GET.get("correlation_id")
+        or request.POST.get("correlation_id")
+        or metrics.new_correlation_id()
+    )
+    return correlation_id[:64]
+
+
 def log_plate(request):
     plate = request.GET.get("plate") if request.method == "GET" else request.POST.get("plate")
     if not plate:
         return JsonResponse({"error": "Plate not provided"}, status=400)
 
-    plate = re.sub(r"[^A-Z0-9]", "", plate.upper().strip())
     image_file = request.FILES.get("image") if request.method == "POST" else None
+    correlation_id = request_correlation_id(request)
+    metrics.correlation_id.set(correlation_id)
 
     try:
-        with transaction.atomic():
-            vehicle, created = Vehicle.objects.select_for_update().get_or_create(license_plate=plate)
-
-            open_log = EntryExitLog.objects.filter(vehicle=vehicle, is_open=True).order_by('-entry_time').first()
-            if open_log:
-                open_log.is_open = False
-                open_log.exit_time = now()
-                open_log.save()
-                duration = open_log.exit_time - open_log.entry_time
-                return JsonResponse({
-                    "action": "exit",
-                    "plate": plate,
-                    "entry_time": open_log.entry_time,
-                    "exit_time": open_log.exit_time,
-                    "duration": str(duration),
-                    "message": "Exit logged"
-                })
-
-            entry_log = EntryExitLog.objects.create(vehicle=vehicle, entry_time=now(), is_open=True)
-            if image_file:
-                entry_log.image.save(image_file.name, image_file)
-                entry_log.save()
-            ParkingLog.objects.create(plate=plate, entry_time=entry_log.entry_time)
-            return JsonResponse({
-                "action": "entry",
-                "plate": plate,
-                "entry_time": entry_log.entry_time,
-                "message": "Entry logged"
-            })
+        with metrics.span("log_plate_request"):
+            response = JsonResponse(writer.run(record_plate_event, plate, image_file, correlation_id))
+        response["X-Correlation-ID"] = correlation_id
+        return response
     except IntegrityError as e:
         return JsonResponse({
             "error": "Could not create entry due to a race condition. Please try again."
@@ -70,23 +68,55 @@ def log_plate(request):
         }, status=500)
 
 
-def analytics_view(request):
-    total_logs = EntryExitLog.objects.count()
-    currently_parked = EntryExitLog.objects.filter(exit_time__isnull=True).count()
+@csrf_exempt
+@require_POST
+def log_plate_bulk(request):
+    import json
 
-    durations = EntryExitLog.objects.exclude(exit_time__isnull=True).annotate(
-        duration=ExpressionWrapper(
-            F("exit_time") - F("entry_time"), output_field=DurationField()
-        )
-    )
-    avg_duration = durations.aggregate(avg=Avg("duration"))["avg"]
-    avg_duration_readable = format_duration(avg_duration)
+    try:
+        events = json.loads(request.body)["events"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": 'Expected a JSON body like {"events": [...]}'}, status=400)
+    if not isinstance(events, list):
+        return JsonResponse({"error": "events must be a list"}, status=400)
 
-    top_vehicles = (
-        EntryExitLog.objects.values("vehicle__license_plate")
-        .annotate(count=Count("id"))
-        .order_by("-count")[:5]
-    )
+    max_events = getattr(settings, "BULK_LOG_MAX_EVENTS", 5000)
+    if len(events) > max_events:
+        return JsonResponse({"error": f"At most {max_events} events per request"}, status=400)
+
+    try:
+        with metrics.span("log_plate_bulk_request"):
+            results = writer.run(record_plate_events, events)
+    except IntegrityError:
+        return JsonResponse({
+            "error": "Could not apply events due to a race condition. Please try again."
+        }, status=500)
+    except Exception as e:
+        return JsonResponse({
+            "error": f"Unexpected error: {e}"
+        }, status=500)
+    return JsonResponse({"results": results})
+
+
+def metrics_view(request):
+    """Stage latency histograms and event counters in Prometheus text format."""
+    if not metrics.enabled():
+        raise Http404("Metrics are disabled; set METRICS_ENABLED.")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def analytics_view(request):
+    # Everything here comes from the rollup tables maintained by
+    # parking.rollups, so the page cost doesn't grow with EntryExitLog.
+    totals = TrafficRollup.objects.filter(period=TrafficRollup.ALL).first() or TrafficRollup()
+    total_logs = totals.entries
+    currently_parked = LotOccupancy.current()
+    avg_duration_readable = format_duration(totals.average_duration())
+
+    top_vehicles = [
+        {"vehicle__license_plate": rollup.vehicle.license_plate, "count": rollup.visits}
+        for rollup in VehicleRollup.objects.select_related("vehicle").order_by("-visits")[:5]
+    ]
 
     context = {
         "total_logs": total_logs,
@@ -98,52 +128,169 @@ def analytics_view(request):
     return render(request, "parking/analytics.html", context)
 
 
+def day_start(value):
+    """Midnight at the start of the ``YYYY-MM-DD`` date ``value`` or ``None``."""
+    try:
+        day = parse_date(value or "")
+    except ValueError:
+        return None
+    return timezone.make_aware(datetime.combine(day, datetime.min.time())) if day else None
+
+
+def history_logs(request, vehicle):
+    """A vehicle's logs, narrowed to the ``from``/``to`` dates (inclusive) in the query string."""
+    logs = EntryExitLog.objects.filter(vehicle=vehicle)
+    start = day_start(request.GET.get("from"))
+    end = day_start(request.GET.get("to"))
+    if start:
+        logs = logs.filter(entry_time__gte=start)
+    if end:
+        logs = logs.filter(entry_time__lt=end + timedelta(days=1))
+    return logs, bool(start or end)
+
+
+def parse_cursor(value):
+    """``"<entry_time iso>,<id>"`` -> ``(entry_time, id)``, or ``None`` if malformed."""
+    timestamp, _, pk = (value or "").rpartition(",")
+    try:
+        entry_time = parse_datetime(timestamp)
+    except ValueError:
+        return None
+    if entry_time is None or not pk.isdigit():
+        return None
+    return entry_time, int(pk)
+
+
+def format_cursor(log):
+    return f"{log.entry_time.isoformat()},{log.pk}"
+
+
+def keyset_page(logs, before=None, after=None, size=50):
+    """One page of ``logs``, newest first, located by the ``(entry_time, id)`` keyset.
+
+    Seeking on the indexed columns instead of using OFFSET keeps every page
+    as cheap as the first. Returns ``(page, has_older, has_newer)``.
+    """
+    if after:
+        entry_time, pk = after
+        rows = list(
+            logs.filter(Q(entry_time__gt=entry_time) | Q(entry_time=entry_time, pk__gt=pk))
+            .order_by("entry_time", "id")[:size + 1]
+        )
+        has_newer = len(rows) > size
+        return rows[:size][::-1], True, has_newer
+
+    if before:
+        entry_time, pk = before
+        logs = logs.filter(Q(entry_time__lt=entry_time) | Q(entry_time=entry_time, pk__lt=pk))
+    rows = list(logs.order_by("-entry_time", "-id")[:size + 1])
+    return rows[:size], len(rows) > size, before is not None
+
+
+def history_stats(vehicle, logs, filtered):
+    """Visit totals computed by the database; all-time totals come from the rollup."""
+    rollup = None if filtered else VehicleRollup.objects.filter(vehicle=vehicle).first()
+    if rollup:
+        visits, total_time, avg_duration = rollup.visits, rollup.total_duration, rollup.average_duration()
+    else:
+        duration = ExpressionWrapper(F("exit_time") - F("entry_time"), output_field=DurationField())
+        totals = logs.aggregate(visits=Count("id"), completed=Count("exit_time"), total=Sum(duration))
+        visits, total_time = totals["visits"], totals["total"] or timedelta()
+        avg_duration = total_time / totals["completed"] if totals["completed"] else None
+
+    days_visited = (
+        logs.annotate(day=TruncDate("entry_time", tzinfo=timezone.get_current_timezone()))
+        .values("day")
+        .distinct()
+        .count()
+    )
+    return {
+        "total_visits": visits,
+        "total_time": format_duration(total_time),
+        "avg_duration": format_duration(avg_duration),
+        "days_visited": days_visited,
+    }
+
+
 def vehicle_detail(request, plate):
     vehicle = get_object_or_404(Vehicle, license_plate=plate.upper())
-    logs = EntryExitLog.objects.filter(vehicle=vehicle).order_by("entry_time")
-
-    total_visits = logs.count()
-    total_time = timedelta()
-    currently_parked = False
-    days_visited = set()
-    log_data = []
-
-    completed_visits = 0
-
-    for log in logs:
-        duration = None
-        if log.exit_time:
-            duration = log.exit_time - log.entry_time
-            total_time += duration
-            completed_visits += 1
-        else:
-            currently_parked = True
-
-        days_visited.add(log.entry_time.date())
-
-        log_data.append(
-            {
-                "entry_time": log.entry_time,
-                "exit_time": log.exit_time,
-                "duration": format_duration(duration),
-            }
-        )
+    logs, filtered = history_logs(request, vehicle)
+    page_size = getattr(settings, "VEHICLE_HISTORY_PAGE_SIZE", 50)
+    page, has_older, has_newer = keyset_page(
+        logs,
+        before=parse_cursor(request.GET.get("before")),
+        after=parse_cursor(request.GET.get("after")),
+        size=page_size,
+    )
 
-    avg_duration = total_time / completed_visits if completed_visits else None
+    log_data = [
+        {
+            "entry_time": log.entry_time,
+            "exit_time": log.exit_time,
+            "duration": format_duration(log.duration()) if log.exit_time else None,
+        }
+        for log in page
+    ]
 
+    filters = {key: request.GET[key] for key in ("from", "to") if request.GET.get(key)}
     context = {
         "vehicle": vehicle,
         "logs": log_data,
-        "total_visits": total_visits,
-        "total_time": format_duration(total_time),
-        "avg_duration": format_duration(avg_duration),
-        "days_visited": len(days_visited),
-        "currently_parked": currently_parked,
+        **history_stats(vehicle, logs, filtered),
+        "currently_parked": EntryExitLog.objects.filter(vehicle=vehicle, is_open=True).exists(),
+        "filters": filters,
+        "filter_query": urlencode(filters),
+        "older_query": urlencode({**filters, "before": format_cursor(page[-1])}) if has_older and page else "",
+        "newer_query": urlencode({**filters, "after": format_cursor(page[0])}) if has_newer and page else "",
     }
 
     return render(request, "parking/vehicle_detail.html", context)
 
 
+class Echo:
+    """A file-like object whose ``write`` hands back the line, for streaming ``csv.writer`` output."""
+
+    def write(self, value):
+        return value
+
+
+def vehicle_export(request, plate):
+    """Stream a vehicle's (optionally date-filtered) history as CSV or JSON lines.
+
+    Rows are read with ``.iterator()`` and written as they arrive, so memory
+    stays flat however long the history is.
+    """
+    import csv
+    import json
+
+    vehicle = get_object_or_404(Vehicle, license_plate=plate.upper())
+    logs, _ = history_logs(request, vehicle)
+    fmt = request.GET.get("format", "csv")
+    if fmt not in ("csv", "json"):
+        return JsonResponse({"error": "format must be csv or json"}, status=400)
+
+    rows = logs.order_by("entry_time", "id").values_list("entry_time", "exit_time", "image", "correlation_id")
+    fields = ["entry_time", "exit_time", "duration_seconds", "image", "correlation_id"]
+
+    def records():
+        for entry_time, exit_time, image, correlation_id in rows.iterator(chunk_size=2000):
+            duration = (exit_time - entry_time).total_seconds() if exit_time else None
+            yield [entry_time.isoformat(), exit_time.isoformat() if exit_time else None, duration, image or "", correlation_id]
+
+    if fmt == "csv":
+        writer = csv.writer(Echo())
+        stream = (writer.writerow(row) for row in itertools.chain([fields], records()))
+        content_type = "text/csv"
+    else:
+        stream = (json.dumps(dict(zip(fields, row))) + "\n" for row in records())
+        content_type = "application/x-ndjson"
+
+    extension = "csv" if fmt == "csv" else "jsonl"
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{vehicle.license_plate}-history.{extension}"'
+    return response
+
+
 def launch_stream(request):
     import subprocess
     import os
@@ -159,10 +306,13 @@ def launch_stream(request):
         if not os.path.exists(entries_dir):
             os.makedirs(entries_dir)
         
+        # CREATE_NEW_CONSOLE only exists on Windows; elsewhere the camera
+        # window is simply started as a detached child process.
         subprocess.Popen(
             [python_exe, stream_script_path],
             cwd=project_dir,
-            creationflags=subprocess.CREATE_NEW_CONSOLE
+            creationflags=getattr(subprocess, "CREATE_NEW_CONSOLE", 0),
+            start_new_session=os.name != "nt",
         )
         
         print(f"Camera launched with: {python_exe} {stream_script_path}")
@@ -174,104 +324,93 @@ def launch_stream(request):
 
 
 def upload_image(request):
-    import subprocess
-    import os
-    import tempfile
-    import shutil
-    from django.shortcuts import render, redirect
-    from .models import Vehicle, EntryExitLog
-    
-    if request.method == 'POST' and request.FILES.get('image'):
-        project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        
-        entries_dir = os.path.join(project_dir, 'entries')
-        if not os.path.exists(entries_dir):
-            os.makedirs(entries_dir)
-            
-        uploaded_image = request.FILES['image']
-        
-        temp_path = os.path.join(entries_dir, f'temp_{uploaded_image.name}')
-        with open(temp_path, 'wb+') as destination:
-            for chunk in uploaded_image.chunks():
-                destination.write(chunk)
-        
+    from django.shortcuts import redirect, render
+    from . import jobs
+
+    uploads = request.FILES.getlist('image')
+    if request.method == 'POST' and uploads:
+        # Recognition runs on the upload worker pool; the request only spools
+        # the files and hands back the job to poll.
         try:
-            import sys
-            sys.path.append(project_dir)
-            from ultralytics import YOLO
-            import easyocr
-            import re
-            import cv2
-            import datetime
-            
-            model = YOLO(os.path.join(project_dir, "runs/detect/train3/weights/best.pt"))
-            reader = easyocr.Reader(["en"])
-            image = cv2.imread(temp_path)
-            
-            results = model(image)
-            
-            plate_text = ""
-            for box in results[0].boxes.xyxy:
-                x1, y1, x2, y2 = map(int, box)
-                cropped = image[y1:y2, x1:x2]
-                ocr_result = reader.readtext(cropped)
-                if ocr_result:
-                    plate_text = ocr_result[0][1]
-                    break
-            
-            cleaned_plate_text = re.sub(r"[^A-Z0-9]", "", plate_text.upper())
-            
-            if cleaned_plate_text:
-                try:
-                    vehicle = Vehicle.objects.get(license_plate=cleaned_plate_text)
-                    open_log = EntryExitLog.objects.filter(vehicle=vehicle, is_open=True).first()
-                    if open_log:
-                        mode = "exit"
-                    else:
-                        mode = "entry"
-                except Vehicle.DoesNotExist:
-                    mode = "entry"
-                
-                timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                final_filename = f"{cleaned_plate_text}_{timestamp}.jpg"
-                final_path = os.path.join(entries_dir, final_filename)
-                
-                if os.path.exists(final_path):
-                    os.remove(final_path)
-                    
-                shutil.move(temp_path, final_path)
-                
-                log_url = f"http://127.0.0.1:8000/parking/log/?plate={cleaned_plate_text}"
-                import requests
-                response = requests.get(log_url)
-                api_response = response.json() if response.status_code == 200 else {"error": response.text}
-                
-                context = {
-                    'success': True,
-                    'output': f"✅ Plate detected: {cleaned_plate_text}\n✅ Mode determined: {mode}\n✅ Image saved as: {final_path}\n✅ API Response: {api_response}",
-                    'plate_number': cleaned_plate_text,
-                    'mode': mode,
-                    'image_path': f'/entries/{final_filename}'
-                }
-            else:
-                context = {
-                    'success': False,
-                    'output': "❌ No license plate detected in the image.",
-                    'plate_number': None,
-                    'mode': None
-                }
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-        except Exception as e:
-            context = {
-                'success': False,
-                'output': f"❌ Error processing image: {str(e)}",
-                'plate_number': None,
-                'mode': None
-            }
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-        
-        return render(request, 'parking/upload_result.html', context)
-    
+            job = jobs.submit(uploads)
+        except jobs.QueueFull as e:
+            if wants_json(request):
+                return JsonResponse({"error": str(e), "queue": jobs.queue_stats()}, status=503)
+            return render(request, 'parking/upload_image.html', {'error': str(e)}, status=503)
+        if wants_json(request):
+            return JsonResponse(
+                {**jobs.status(job), "status_url": reverse("upload_job", args=[job.pk])}, status=202
+            )
+        return redirect("upload_job", job_id=job.pk)
+
     return render(request, 'parking/upload_image.html', {})
+
+
+def wants_json(request):
+    return request.GET.get("format") == "json" or "application/json" in request.headers.get("Accept", "")
+
+
+def upload_job(request, job_id):
+    """Progress and results of an upload job; JSON for polling clients."""
+    from . import jobs
+
+    job = get_object_or_404(UploadJob, pk=job_id)
+    if wants_json(request):
+        return JsonResponse(jobs.status(job))
+
+    first = job.plates[0] if job.plates else {}
+    context = {
+        'job': job,
+        'queue': jobs.queue_stats(),
+        'success': bool(job.plates),
+        'output': job.output,
+        'plates': job.plates,
+        'plate_number': first.get('plate_number'),
+        'mode': first.get('mode'),
+        'image_path': first.get('image_path'),
+    }
+    return render(request, 'parking/upload_result.html', context)
+
+
+@csrf_exempt
+@require_POST
+def recognize_batch(request):
+    import json
+    from .recognition import get_engine
+    from .uploads import decode_image
+
+    uploads = request.FILES.getlist("images")
+    if not uploads:
+        return JsonResponse({"error": "No images provided"}, status=400)
+
+    engine = get_engine()
+    batch_size = getattr(settings, "RECOGNITION_BATCH_SIZE", 16)
+    # Images are decoded as the engine asks for them, so only the chunk in
+    # flight is held in memory.
+    positions = []
+    failed = deque()
+
+    def images():
+        for index, upload in enumerate(uploads):
+            image = decode_image(upload)
+            if image is None:
+                failed.append(index)
+                continue
+            positions.append(index)
+            yield image
+
+    def decode_error(index):
+        return json.dumps({"index": index, "name": uploads[index].name, "error": "Could not decode image"}) + "\n"
+
+    def results():
+        for result in engine.recognize_batch(images(), batch_size=batch_size):
+            index = positions[result["index"]]
+            while failed and failed[0] < index:
+                yield decode_error(failed.popleft())
+            result["index"] = index
+            result["name"] = uploads[index].name
+            yield json.dumps(result) + "\n"
+        while failed:
+            yield decode_error(failed.popleft())
+
+    return StreamingHttpResponse(results(), content_type="application/x-ndjson")
@@ -0,0 +1,163 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Write:
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        # Run with the caller's context so correlation IDs follow the event.
+        self.context = contextvars.copy_context()
+        self.queued_at = time.perf_counter()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class Writer:
+    """Runs database writes from many threads on one thread, several per commit.
+
+    SQLite allows a single writer at a time; rather than have every request
+    thread queue on the file lock (and eventually fail with "database is
+    locked"), callers hand their write function to this thread and wait for
+    it. The thread takes the first waiting write plus everything queued
+    behind it, and any that arrive within ``max_wait`` seconds (up to
+    ``max_batch`` writes), and runs them in order in one transaction, each
+    in its own savepoint so a failing write is rolled back alone and
+    re-raised to its caller. If the commit itself fails, the batch is
+    retried one write per transaction.
+    """
+
+    def __init__(self, max_batch=64, max_wait=0.0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.counters = {"writes": 0, "batches": 0, "failed_batches": 0}
+        self._failure_callbacks = None
+        self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def run(self, func, *args, **kwargs):
+        """Call ``func(*args, **kwargs)`` on the writer thread and return its result."""
+        if threading.current_thread() is self._thread or connection.in_atomic_block:
+            # Already on the writer, or inside the caller's own transaction,
+            # which another thread couldn't join.
+            return func(*args, **kwargs)
+        write = _Write(func, args, kwargs)
+        self.requests.put(write)
+        write.done.wait()
+        if write.error is not None:
+            raise write.error
+        return write.result
+
+    def stats(self):
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "mean_batch": round(self.counters["writes"] / batches, 2) if batches else 0.0,
+            "queued": self.requests.qsize(),
+        }
+
+    def _loop(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                # Past the deadline, still take whatever queued up while
+                # the last batch was being written.
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            self._apply(batch)
+
+    def _apply(self, batch):
+        close_old_connections()
+        start = time.perf_counter()
+        for write in batch:
+            metrics.observe("db_write_wait", start - write.queued_at)
+        if not self._commit(batch) and len(batch) > 1:
+            # Nothing was written; retry one write per commit so only the
+            # write that broke the batch fails.
+            for write in batch:
+                write.result = write.error = None
+                self._commit([write])
+        metrics.observe("db_write_batch", time.perf_counter() - start)
+        self.counters["writes"] += len(batch)
+        self.counters["batches"] += 1
+        for write in batch:
+            write.done.set()
+
+    def _commit(self, writes):
+        """Run ``writes`` in one transaction; ``False`` if the transaction failed."""
+        self._failure_callbacks = []
+        try:
+            with transaction.atomic():
+                for write in writes:
+                    try:
+                        with transaction.atomic():
+                            write.result = write.context.run(write.func, *write.args, **write.kwargs)
+                    except Exception as e:
+                        write.error = e
+            return True
+        except Exception as e:
+            logger.exception("Write batch of %d failed", len(writes))
+            self.counters["failed_batches"] += 1
+            for write in writes:
+                write.error = write.error or e
+            for callback in self._failure_callbacks:
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("Write failure callback failed")
+            return False
+        finally:
+            self._failure_callbacks = None
+
+
+_writer = None
+_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, "DATABASE_SINGLE_WRITER", False)
+
+
+def get_writer():
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = Writer(
+                max_batch=getattr(settings, "DATABASE_WRITER_MAX_BATCH", 64),
+                max_wait=getattr(settings, "DATABASE_WRITER_MAX_WAIT_MS", 0) / 1000,
+            )
+    return _writer
+
+
+def on_failure(callback):
+    """Call ``callback`` if the writer batch running this code fails to commit.
+
+    Changes made inline are the caller's to handle; this only covers a write
+    running on the writer thread, whose commit happens after it returns.
+    """
+    if _writer is not None and threading.current_thread() is _writer._thread and _writer._failure_callbacks is not None:
+        _writer._failure_callbacks.append(callback)
+
+
+def run(func, *args, **kwargs):
+    """``func(*args, **kwargs)`` on this process's writer thread, or inline if ``DATABASE_SINGLE_WRITER`` is off."""
+    if not enabled():
+        return func(*args, **kwargs)
+    return get_writer().run(func, *args, **kwargs)
@@ -1,24 +1,90 @@
-from ultralytics import YOLO
 import matplotlib.pyplot as plt
-import easyocr
-import requests
 import argparse
 import cv2
-import re
-import datetime
+import os
+import sys
+import time
 
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smarttrack.settings")
+import django
 
-def clean_plate_text(plate_text):
-    return re.sub(r"[^A-Z0-9]", "", plate_text.upper())
+django.setup()
 
+from parking.recognition import get_engine, clean_plate_text
+from parking.events import get_event_client
+from django.core.files import File
+from parking.snapshots import save_frame, save_snapshot
+
+engine = get_engine()
+event_client = get_event_client()
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def collect_image_paths(paths):
+    image_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    image_paths.append(os.path.join(path, name))
+        else:
+            image_paths.append(path)
+    return image_paths
+
+
+def run_batch(paths, lane, batch_size):
+    image_paths = collect_image_paths(paths)
+    readable = []
+
+    def load_images():
+        for path in image_paths:
+            img = cv2.imread(path)
+            if img is None:
+                print(f"❌ Could not read image: {path}")
+                continue
+            readable.append(path)
+            yield img
+
+    start = time.perf_counter()
+    detected = 0
+    for result in engine.recognize_batch(load_images(), batch_size=batch_size):
+        source_path = readable[result["index"]]
+        plate = result["plate"]
+        if not plate:
+            print(f"❌ No plate detected: {source_path}")
+            continue
+        detected += 1
+        print(f"✅ {source_path}: {plate}")
+
+        with open(source_path, "rb") as f:
+            snapshot = save_snapshot(File(f), plate, ext=os.path.splitext(source_path)[1] or ".jpg")
+
+        event_client.submit(plate, lane=lane, image=snapshot.name)
+
+    elapsed = time.perf_counter() - start
+    rate = len(readable) / elapsed if elapsed else 0.0
+    print(f"✅ Processed {len(readable)} images ({detected} plates) in {elapsed:.2f}s — {rate:.1f} images/sec")
+    event_client.close()
+    print(f"✅ Backend events: {event_client.stats()}")
 
-model = YOLO("runs/detect/train3/weights/best.pt")
 
 parser = argparse.ArgumentParser()
-parser.add_argument("--mode", default="entry", choices=["entry", "exit"])
+parser.add_argument("--lane", default="plateLogger", help="Lane name sent with each plate event")
+parser.add_argument(
+    "--mode",
+    choices=["entry", "exit"],
+    help="Ignored: the backend logs an exit when the vehicle has an open entry, and an entry otherwise",
+)
 parser.add_argument("--image", help="Path to the image file to process")
+parser.add_argument("--batch", nargs="+", metavar="PATH", help="Image files or directories to process in batches")
+parser.add_argument("--batch-size", type=int, default=16, help="Images per YOLO call in batch mode")
 args = parser.parse_args()
 
+if args.batch:
+    run_batch(args.batch, args.lane, args.batch_size)
+    sys.exit(0)
+
 if args.image:
     image_path = args.image
 else:
@@ -26,42 +92,21 @@ else:
 
 image = cv2.imread(image_path)
 
-reader = easyocr.Reader(["en"])
-
-results = model(image_path)
-
-for box in results[0].boxes.xyxy:
-    x1, y1, x2, y2 = map(int, box)
+for x1, y1, x2, y2, _ in engine.detect(image):
     cropped = image[y1:y2, x1:x2]
 
-    result = reader.readtext(cropped)
-
-    plate_text = ""
-    if result:
-        plate_text = result[0][1] 
+    plate_text, _ = engine.read_text(cropped)
 
     cleaned_plate_text = clean_plate_text(plate_text)
 
     print("✅ Final Detected Plate:", cleaned_plate_text)
 
-    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    image_filename = f"{cleaned_plate_text}_{timestamp}.jpg"
-    image_path_save = f"entries/{image_filename}"
-    cv2.imwrite(image_path_save, image)
-    print(f"✅ Full car image saved as: {image_path_save}")
+    snapshot = save_frame(image, cleaned_plate_text)
+    print(f"✅ Full car image saved as: {snapshot.name}")
 
-    url = f"http://127.0.0.1:8000/parking/log/?plate={cleaned_plate_text}&mode={args.mode}"
-
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            print("✅ Logged to backend:", response.json())
-        else:
-            print("❌ Failed to log:", response.text)
-            
-        print(f"✅ Image saved locally as: {image_path_save}")
-    except Exception as e:
-        print("❗ Error logging to backend:", e)
+    trace = {"detect": engine.timings.get("last_detect"), "ocr": engine.timings.get("last_ocr")}
+    event_client.submit(cleaned_plate_text, lane=args.lane, image=snapshot.name, trace=trace)
+    print(f"✅ Queued for backend: {cleaned_plate_text}")
 
     cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
     cv2.putText(
@@ -72,3 +117,6 @@ for box in results[0].boxes.xyxy:
     plt.title("Detected")
     plt.axis("off")
     plt.show()
+
+event_client.close()
+print(f"✅ Backend events: {event_client.stats()}")
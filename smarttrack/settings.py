@@ -64,11 +64,64 @@ WSGI_APPLICATION = "smarttrack.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+DATABASE_PATH = os.environ.get("SMARTTRACK_DB_PATH", BASE_DIR / "db.sqlite3")
+
+# SQLite production profile, opted into with SMARTTRACK_SQLITE_PROFILE=production
+# (the default, "dev", is Django's stock SQLite setup): WAL so readers never wait for the writer, a busy timeout instead
+# of failing with "database is locked", write transactions that take the
+# lock up front (BEGIN IMMEDIATE) so they queue rather than deadlock, and
+# persistent connections. Reads outside transactions go to the query-only
+# "reader" alias (parking.routers), and plate events are committed in
+# batches by one writer thread per process (parking.writer).
+SQLITE_PROFILE = os.environ.get("SMARTTRACK_SQLITE_PROFILE", "dev")
+
+if SQLITE_PROFILE == "production":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": DATABASE_PATH,
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "timeout": 20,
+                "transaction_mode": "IMMEDIATE",
+                "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL",
+            },
+        },
+        "reader": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": DATABASE_PATH,
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"timeout": 20, "init_command": "PRAGMA query_only=1"},
+            "TEST": {"MIRROR": "default"},
+        },
+    }
+    DATABASE_ROUTERS = ["parking.routers.ReaderRouter"]
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": DATABASE_PATH,
+        }
     }
+
+# Plate events from concurrent requests and upload workers are handed to one
+# writer thread, which commits everything that queued up while it was busy
+# (up to DATABASE_WRITER_MAX_BATCH events) at once. A non-zero
+# DATABASE_WRITER_MAX_WAIT_MS also holds each batch open that long for more.
+DATABASE_SINGLE_WRITER = SQLITE_PROFILE == "production"
+DATABASE_WRITER_MAX_BATCH = 64
+DATABASE_WRITER_MAX_WAIT_MS = 0
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "open_sessions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "open-sessions",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
+    },
 }
 
 
@@ -116,3 +169,131 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+
+# Plate recognition
+PLATE_MODEL_PATH = BASE_DIR / "runs" / "detect" / "train3" / "weights" / "best.pt"
+PLATE_OCR_LANGUAGES = ["en"]
+# Plate detector runtime: "torch" runs best.pt through ultralytics; "onnx" and
+# "openvino" run a CPU-optimized export made with `manage.py export_detector`.
+# DETECTOR_MODEL_PATH overrides the exported model's default location.
+DETECTOR_BACKEND = os.environ.get("SMARTTRACK_DETECTOR_BACKEND", "torch")
+DETECTOR_MODEL_PATH = os.environ.get("SMARTTRACK_DETECTOR_MODEL_PATH", "")
+DETECTOR_INT8 = False
+# Input size for torch and for exports with dynamic height/width; a graph
+# exported at a fixed size always runs at that size.
+DETECTOR_IMGSZ = 640
+# Inference threads per engine (0 lets the runtime decide).
+DETECTOR_THREADS = 0
+# Plate OCR: "easyocr" runs EasyOCR's text detector and recognizer on each
+# crop; "recognizer" skips the detector and reads the YOLO crop as one line.
+OCR_BACKEND = os.environ.get("SMARTTRACK_OCR_BACKEND", "easyocr")
+# Valid plate layouts (L = letter, D = digit, e.g. "LLLDDDD"). OCR output is
+# snapped to the closest one, fixing look-alikes such as 0/O and 8/B. Empty
+# keeps OCR output as read.
+PLATE_FORMATS = []
+# Load and warm up YOLO/EasyOCR when the app starts instead of on the first upload.
+RECOGNITION_WARMUP = os.environ.get("SMARTTRACK_RECOGNITION_WARMUP", "0") == "1"
+# Images per YOLO call (and plate crops per EasyOCR call) in batch recognition.
+RECOGNITION_BATCH_SIZE = 16
+# Allow large backfill uploads to the batch recognition endpoint.
+DATA_UPLOAD_MAX_NUMBER_FILES = 1000
+
+# Live camera pipeline (stream.py). 0 means "as fast as possible".
+STREAM_TARGET_FPS = 0
+STREAM_INFERENCE_FPS = 0
+STREAM_DISPLAY_FPS = 30
+# Capture in a child process that decodes straight into a shared-memory ring
+# of STREAM_RING_SLOTS frames (stream.py and `gate --shared-memory`).
+STREAM_SHARED_MEMORY = os.environ.get("SMARTTRACK_STREAM_SHARED_MEMORY", "0") == "1"
+STREAM_RING_SLOTS = 6
+
+# Camera sources for the headless `manage.py gate` service: device indices,
+# stream URLs or video files, one lane per entry.
+GATE_SOURCES = []
+
+# Skip YOLO on frames where nothing moved inside the ROI (x1, y1, x2, y2 as
+# fractions of the frame, None for the whole frame).
+MOTION_GATE_ENABLED = True
+MOTION_GATE_ROI = None
+MOTION_GATE_THRESHOLD = 25
+MOTION_GATE_MIN_AREA = 0.01
+# Reuse OCR results for plate crops that match one read recently: same
+# perceptual hash and a near-identical thumbnail (see parking.gating.OcrCache).
+# Off by default (0); set e.g. 256 to enable.
+OCR_CACHE_SIZE = 0
+
+# Where camera clients send plate events.
+PARKING_LOG_URL = "http://127.0.0.1:8000/parking/log/"
+PARKING_BULK_LOG_URL = "http://127.0.0.1:8000/parking/log/bulk/"
+BULK_LOG_MAX_EVENTS = 5000
+# Events that can't be delivered are kept here and replayed when the backend is back.
+EVENT_SPOOL_PATH = BASE_DIR / "spool" / "events.jsonl"
+EVENT_TIMEOUT = 5
+EVENT_MAX_RETRIES = 4
+EVENT_BATCH_SIZE = 50
+
+# Per-stage latency histograms (capture, YOLO, OCR, event delivery, DB
+# transaction, ...) served at /parking/metrics/ in Prometheus format. Off by
+# default; when off every timer is a no-op.
+METRICS_ENABLED = os.environ.get("SMARTTRACK_METRICS", "0") == "1"
+
+# Camera snapshots: sharded by date/plate, named by content hash, with small
+# thumbnails for the admin under SNAPSHOT_ROOT/thumbs.
+SNAPSHOT_ROOT = BASE_DIR / "entries"
+SNAPSHOT_URL = "/entries/"
+SNAPSHOT_THUMBNAIL_HEIGHT = 64
+
+# Uploads up to FILE_UPLOAD_MAX_MEMORY_SIZE are decoded from memory; larger
+# ones are streamed to a temporary file by Django and moved into the snapshot
+# storage (a rename when FILE_UPLOAD_TEMP_DIR is on the same disk as
+# SNAPSHOT_ROOT). Video clips are sampled every UPLOAD_VIDEO_FRAME_STEP frames.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024
+UPLOAD_VIDEO_FRAME_STEP = 5
+UPLOAD_VIDEO_MAX_FRAMES = 300
+UPLOAD_VIDEO_MIN_READS = 2
+
+# Rows per page of a vehicle's history; pages are fetched by keyset, so deep
+# pages cost the same as the first.
+VEHICLE_HISTORY_PAGE_SIZE = 50
+
+# Admin changelists over tables at least this large page with an estimated
+# row count (catalog statistics, or the highest primary key on SQLite)
+# instead of COUNT(*), unless a filter or search is applied.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100_000
+
+# upload_image spools files here and returns a job ID at once; recognition
+# runs on UPLOAD_WORKERS background threads per server process (0 runs it in
+# the request). Beyond UPLOAD_QUEUE_LIMIT waiting or running jobs in a process,
+# new uploads are turned away with a 503. Uploads Django kept in memory stay in
+# memory; larger ones are moved into UPLOAD_JOB_SPOOL_DIR. Each process
+# renews a lease on its jobs every third of UPLOAD_JOB_LEASE_SECONDS; with
+# UPLOAD_JOB_RECOVERY, jobs whose lease ran out (their process died) are
+# requeued if still queued with their files on disk, and failed otherwise.
+UPLOAD_JOB_SPOOL_DIR = BASE_DIR / "spool" / "uploads"
+UPLOAD_WORKERS = 2
+UPLOAD_QUEUE_LIMIT = 32
+UPLOAD_JOB_LEASE_SECONDS = 60
+UPLOAD_JOB_RECOVERY = True
+
+# Shared recognition server (`manage.py inference_server`). When
+# INFERENCE_SERVER is set (a Unix socket path, unix:/path, or host:port),
+# upload workers, stream.py, plateLogger.py and the gate command send frames to
+# it instead of loading YOLO and EasyOCR themselves. Requests arriving within
+# INFERENCE_MAX_WAIT_MS of each other are run as one batch of up to
+# INFERENCE_MAX_BATCH images. The server drops any client whose request is
+# larger than INFERENCE_MAX_MESSAGE_BYTES.
+INFERENCE_SERVER = os.environ.get("SMARTTRACK_INFERENCE_SERVER", "")
+INFERENCE_SERVER_DEFAULT = str(BASE_DIR / "spool" / "inference.sock")
+INFERENCE_MAX_BATCH = 16
+INFERENCE_MAX_WAIT_MS = 5
+INFERENCE_MAX_MESSAGE_BYTES = 256 * 1024 * 1024
+INFERENCE_TIMEOUT = 30
+
+# log_plate keeps plate -> (vehicle, open log) in the OPEN_SESSION_CACHE cache
+# alias, written through on every entry and exit and warmed from the open logs
+# on first use. A stale entry is caught by the write it leads to, so the cache
+# may be per process (locmem) or shared (file, Redis). Check it with
+# `manage.py check_open_sessions`.
+OPEN_SESSION_CACHE_ENABLED = os.environ.get("SMARTTRACK_OPEN_SESSION_CACHE", "1") == "1"
+OPEN_SESSION_CACHE = "open_sessions"
+OPEN_SESSION_CACHE_WARMUP = True
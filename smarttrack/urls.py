@@ -11,7 +11,7 @@ urlpatterns = [
 
 # Serve files from entries directory in development
 if settings.DEBUG:
-    entries_dir = os.path.join(settings.BASE_DIR, 'entries')
+    entries_dir = settings.SNAPSHOT_ROOT
     if not os.path.exists(entries_dir):
         os.makedirs(entries_dir)
-    urlpatterns += static('/entries/', document_root=entries_dir)
+    urlpatterns += static(settings.SNAPSHOT_URL, document_root=entries_dir)
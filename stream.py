@@ -5,13 +5,9 @@ import re
 import tkinter as tk
 from tkinter import messagebox
 from PIL import Image, ImageTk
-from ultralytics import YOLO
 from pathlib import Path
 from django.utils import timezone
-import easyocr
-import requests
 import time
-import datetime
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "smarttrack.settings")
@@ -19,23 +15,60 @@ import django
 
 django.setup()
 
+from django.conf import settings
 from parking.models import Vehicle, EntryExitLog
+from parking.recognition import get_engine, clean_plate_text
+from parking.events import get_event_client
+from parking.snapshots import save_frame
+from parking.framering import SharedFrameSource
+from parking.gating import MotionGate
+from parking.pipeline import FramePipeline
+from parking.tracking import PlateTracker, track_frame
 
-model_path = "./runs/detect/train3/weights/best.pt"
-model_exists = os.path.exists(model_path)
+engine = get_engine()
+model_exists = engine.model_available
 
 if model_exists:
-    model = YOLO(model_path)
-    print(f"YOLO model loaded from {model_path}")
+    timings = engine.warm_up()
+    print(f"YOLO model loaded from {engine.model_path} (timings: {timings})")
 else:
-    print(f"YOLO model not found at {model_path}. Running in manual entry mode.")
+    print(f"YOLO model not found at {engine.model_path}. Running in manual entry mode.")
 
-reader = easyocr.Reader(["en"])
 
-entries_dir = Path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'entries'))
-entries_dir.mkdir(exist_ok=True)
+if settings.STREAM_SHARED_MEMORY:
+    # Capture and decode in a separate process; frames arrive as views of a
+    # shared-memory ring instead of being copied through a queue.
+    cap = SharedFrameSource(0, slots=settings.STREAM_RING_SLOTS, target_fps=settings.STREAM_TARGET_FPS)
+else:
+    cap = cv2.VideoCapture(0)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+
+tracker = PlateTracker()
 
-cap = cv2.VideoCapture(0)
+
+def recognize_frame(frame):
+    # Show the plate voted across recent frames rather than this frame's read,
+    # so the label doesn't flicker between slightly different OCR strings.
+    if not model_exists:
+        return None
+    track_frame(engine, tracker, frame, min_conf=0.5)
+    plate, _ = tracker.best_reading()
+    return plate
+
+
+pipeline = FramePipeline(
+    cap,
+    recognize_frame,
+    target_fps=settings.STREAM_TARGET_FPS,
+    inference_fps=settings.STREAM_INFERENCE_FPS,
+    gate=MotionGate(
+        roi=settings.MOTION_GATE_ROI,
+        threshold=settings.MOTION_GATE_THRESHOLD,
+        min_area=settings.MOTION_GATE_MIN_AREA,
+    ) if settings.MOTION_GATE_ENABLED else None,
+)
+display_interval_ms = max(1, int(1000 / settings.STREAM_DISPLAY_FPS))
 
 root = tk.Tk()
 root.title("SmartTrack Snapshot")
@@ -49,56 +82,70 @@ video_panel.pack()
 plate_display = tk.Label(root, textvariable=detected_plate, font=("Arial", 16))
 plate_display.pack(pady=5)
 
+stats_text = tk.StringVar(value="")
+stats_display = tk.Label(root, textvariable=stats_text, font=("Arial", 9), fg="gray")
+stats_display.pack()
 
-def clean_plate_text(text):
-    return re.sub(r"[^A-Z0-9]", "", text.upper())
-
-def detect_plate_live(frame):
-    if not model_exists:
-        detected_plate.set("📛 Manual Entry Mode (No YOLO model)")
-        return None
-    
-    try:
-        results = model(frame)[0]
-        for box in results.boxes:
-            if box.conf < 0.5:
-                continue
-            x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-            cropped = frame[y1:y2, x1:x2]
-            ocr_result = reader.readtext(cropped)
-            plate = clean_plate_text(ocr_result[0][1]) if ocr_result else None
-            if plate:
-                detected_plate.set(f"Plate Detected: {plate}")
-                return plate
-        detected_plate.set("Plate Detected: ---")
-        return None
-    except Exception as e:
-        print(f"Error in detection: {e}")
-        detected_plate.set("Detection Error")
-        return None
 
 def show_stream():
-    ret, frame = cap.read()
-    if not ret:
+    if not pipeline.running:
         return
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    img = Image.fromarray(frame_rgb)
-    imgtk = ImageTk.PhotoImage(image=img)
-
-    video_panel.configure(image=imgtk)
-    video_panel.image = imgtk
-    detect_plate_live(frame)
-
-    root.after(500, show_stream)
+    started = time.perf_counter()
+    packet = pipeline.latest_frame()
+    if packet is not None:
+        frame_rgb = cv2.cvtColor(packet.frame, cv2.COLOR_BGR2RGB)
+        img = Image.fromarray(frame_rgb)
+        imgtk = ImageTk.PhotoImage(image=img)
+
+        video_panel.configure(image=imgtk)
+        video_panel.image = imgtk
+        pipeline.timers["display"].record(time.perf_counter() - started)
+
+    detection = pipeline.latest_result()
+    if detection is not None:
+        if not model_exists:
+            detected_plate.set("📛 Manual Entry Mode (No YOLO model)")
+        elif detection.result:
+            detected_plate.set(f"Plate Detected: {detection.result}")
+        else:
+            detected_plate.set("Plate Detected: ---")
+
+    root.after(display_interval_ms, show_stream)
+
+def show_stats():
+    if not pipeline.running:
+        return
+    stats = pipeline.stats()
+    stages = stats["stages"]
+    text = (
+        f"camera {stages['capture']['fps']} fps | "
+        f"detect {stages['inference']['fps']} fps, {stages['inference']['avg_ms']} ms | "
+        f"frame age {stages['frame_age']['avg_ms']} ms"
+    )
+    if stats["gate"]:
+        text += f" | idle skipped {stats['gate']['skip_rate']:.0%}"
+    if engine.ocr_cache is not None:
+        text += f" | OCR cache hits {engine.ocr_cache.stats()['hit_rate']:.0%}"
+    stats_text.set(text)
+    root.after(1000, show_stats)
 
 def capture_snapshot():
-    ret, frame = cap.read()
-    if not ret:
+    # Reuse what the inference thread already read rather than running the
+    # models here, which would stall the UI (and wait on the engine lock).
+    # last_result survives show_stream draining the results queue.
+    detection = pipeline.last_result
+    if detection is not None and detection.result:
+        packet = detection.packet
+    else:
+        packet = pipeline.last_packet
+    if packet is None:
         messagebox.showerror("Capture Error", "Could not read from camera.")
         return
+    frame = packet.frame.copy()
+    trace = pipeline.trace()
     
     if model_exists:
-        plate = detect_plate_live(frame)
+        plate = detection.result if detection is not None else None
         if not plate:
             manual_entry = messagebox.askyesno("No Plate", "No license plate detected. Would you like to enter it manually?")
             if not manual_entry:
@@ -107,9 +154,9 @@ def capture_snapshot():
     else:
         plate = ""
     
-    show_confirmation_window(frame, plate)
+    show_confirmation_window(frame, plate, packet.correlation_id, trace)
 
-def show_confirmation_window(frame, plate):
+def show_confirmation_window(frame, plate, correlation_id=None, trace=None):
     confirm_window = tk.Toplevel(root)
     confirm_window.title("Confirm Plate")
     confirm_window.geometry("")  # Let window auto-fit content
@@ -151,21 +198,13 @@ def show_confirmation_window(frame, plate):
             return
 
         cleaned_plate_text = clean_plate_text(new_plate)
-        url = f"http://127.0.0.1:8000/parking/log/?plate={cleaned_plate_text}"
-
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                print(f"✅ Logged to backend: {response.json()}")
-            else:
-                print(f"❌ Failed to log: {response.text}")
-        except Exception as e:
-            print(f"❗ Error logging to backend: {e}")
-
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = entries_dir / f"{cleaned_plate_text}_{timestamp}.jpg"
-        cv2.imwrite(str(filename), frame)
-        print(f"✅ Image saved as: {filename}")
+        snapshot = save_frame(frame, cleaned_plate_text)
+        print(f"✅ Image saved as: {snapshot.name}")
+
+        get_event_client().submit(
+            cleaned_plate_text, lane="stream", image=snapshot.name, correlation_id=correlation_id, trace=trace
+        )
+        print(f"✅ Queued for backend: {cleaned_plate_text}")
 
         confirm_window.destroy()
         messagebox.showinfo("Success", f"✅ Plate logged: {new_plate}")
@@ -192,8 +231,10 @@ tk.Button(btn_frame, text="📸 Capture", width=20, command=capture_snapshot).pa
     side=tk.LEFT, padx=10
 )
 tk.Button(
-    btn_frame, text="❌ Exit", width=20, command=lambda: (cap.release(), root.destroy())
+    btn_frame, text="❌ Exit", width=20, command=lambda: (pipeline.stop(), get_event_client().close(), root.destroy())
 ).pack(side=tk.LEFT, padx=10)
 
+pipeline.start()
 show_stream()
+show_stats()
 root.mainloop()